@@ -0,0 +1,460 @@
+"""
+Benchmarks for the IAS engines.
+
+python IAS_Benchmark.py engines                         time of IAS.fetch, FastIAS.fetch and BlockIAS on two loops
+python IAS_Benchmark.py run -o results.json             workload suite: instructions/s, latency percentiles, peak memory
+python IAS_Benchmark.py compare old.json new.json       flags workloads that got slower than the threshold
+python IAS_Benchmark.py peephole                        handler dispatches saved by the peephole optimizer (IAS cycles are unchanged)
+python IAS_Benchmark.py construct                       cost of a new machine plus a short run, fresh and from a MachinePool
+python IAS_Benchmark.py load [address]                  requests/s and latency percentiles of a simulation server
+python IAS_Benchmark.py multicore                       cycles/s of 1..N cores, round robin and one process per core
+"""
+
+
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from IASopcodes import IAS
+from IASfast import FastIAS
+from IASblocks import BlockIAS
+from IASpeephole import PeepholeIAS, report
+from IASassembler import assemble
+from IASprofile import Profiler
+from IASscheduler import MachinePool
+from IASserver import Server, startThread
+from IASclient import Client
+from IASmulticore import Multicore
+
+
+
+ENGINES = {'IAS': IAS, 'FastIAS': FastIAS, 'BlockIAS': BlockIAS, 'PeepholeIAS': PeepholeIAS}
+
+
+
+def word(leftOpcode, leftAddress, rightOpcode=0, rightAddress=0) :
+    """
+    builds a 40 bit instruction string from two opcode/address pairs
+    """
+    return format(leftOpcode, '08b') + format(leftAddress, '012b') + format(rightOpcode, '08b') + format(rightAddress, '012b')
+
+
+def addRoutine() :
+    """
+    M(4) = M(2) + M(3), two words, the run that is dwarfed by building the machine
+    """
+    return [word(0b00000001, 2, 0b00000101, 3),
+            word(0b00100001, 4)]
+
+
+def countdownLoop(counter=1) :
+    """
+    M(counter) counts down by M(2) until it is negative: LOAD, SUB, STOR, JUMP+ per pass
+    """
+    return [word(0b00000001, counter, 0b00000110, 2),
+            word(0b00100001, counter, 0b00001111, 0),
+            word(0b00000000, 0)]
+
+
+def straightLineLoop(bodyWords) :
+    """
+    countdown loop whose body adds M(3) and subtracts M(4) into M(5) bodyWords times before the counter update
+    """
+    program = [word(0b00000001, 5, 0b00000101, 3)]
+    for index in range(bodyWords) :
+        program.append(word(0b00000110, 4, 0b00000101, 3))
+    program.append(word(0b00100001, 5, 0b00000001, 1))
+    program.append(word(0b00000110, 2, 0b00100001, 1))
+    program.append(word(0b00001111, 0))
+    return program
+
+
+ARITHMETIC_KERNEL = """
+        .data count 1000
+        .data one 1
+        .data x 12345
+        .data y 678
+        .data product
+        .data quotient
+top:    LOAD MQ,M(x)
+        MUL M(y)
+        STOR M(product)
+        DIV M(y)
+        LOAD MQ
+        STOR M(quotient)
+        LOAD M(count)
+        SUB M(one)
+        STOR M(count)
+        JUMP+ M(top)
+"""
+
+ARRAY_COPY = """
+        .data count 399
+        .data one 1
+        .data source 100
+        .data target 500
+top:    LOAD M(source)
+        STOR M(copy,8:19)
+        LOAD M(target)
+        STOR M(copy,28:39)
+copy:   LOAD M(0)
+        STOR M(0)
+        LOAD M(source)
+        ADD M(one)
+        STOR M(source)
+        LOAD M(target)
+        ADD M(one)
+        STOR M(target)
+        LOAD M(count)
+        SUB M(one)
+        STOR M(count)
+        JUMP+ M(top)
+"""
+
+
+def assembled(source, extra=None) :
+    """
+    program and inputs of an assembler source, extra adds more {address: value} inputs
+    """
+    program = assemble(source)
+    inputs = dict(program.data)
+    inputs.update(extra or {})
+    return program.instructions, inputs
+
+
+WORKLOADS = {
+    'countdown' : lambda : (countdownLoop(), {1: 5000, 2: 1}),
+    'straightLine' : lambda : (straightLineLoop(16), {1: 500, 2: 1, 3: 7, 4: 2}),
+    'mulDiv' : lambda : assembled(ARITHMETIC_KERNEL),
+    'arrayWalk' : lambda : assembled(ARRAY_COPY, {100 + index: index * 3 for index in range(400)}),
+    'construct' : None,                                         #cost of building a fresh machine
+}
+
+
+def prepare(engine, program, inputs) :
+    """
+    fresh machine with inputs stored and program loaded
+    """
+    machine = engine()
+    for address, value in inputs.items() :
+        machine.appendInput(format(address, '012b'), value)
+    machine.memory.setInstructionsMemory(list(program))
+    return machine
+
+
+def countInstructions(program, inputs, engine=FastIAS) :
+    """
+    half instructions executed by program, counted once with the profiler.
+    on PeepholeIAS a superinstruction counts once, so this is the number of handler dispatches.
+    """
+    profiler = Profiler()
+    profiler.run(prepare(engine, program, inputs))
+    return sum(profiler.opcodes.values())
+
+
+def peepholeSavings(workloads=None) :
+    """
+    {workload: (PeepholeReport, half instructions run by FastIAS, dispatches run by PeepholeIAS)}
+    """
+    savings = {}
+    for name in workloads or [name for name, builder in WORKLOADS.items() if builder is not None] :
+        program, inputs = WORKLOADS[name]()
+        savings[name] = (report(program), countInstructions(program, inputs), countInstructions(program, inputs, PeepholeIAS))
+    return savings
+
+
+def constructionCost(engines=(IAS, FastIAS, BlockIAS), repeat=2000) :
+    """
+    {engine name: (seconds per add routine run on a new machine, seconds per run on a machine from a MachinePool)}
+    """
+    program = addRoutine()
+    def fresh(engine) :
+        machine = engine()
+        machine.appendInput('000000000010', 63)
+        machine.appendInput('000000000011', 20)
+        machine.memory.setInstructionsMemory(list(program))
+        machine.fetch()
+    def pooled(pool) :
+        with pool.checkout(program) as machine :
+            machine.appendInput('000000000010', 63)
+            machine.appendInput('000000000011', 20)
+            machine.fetch()
+    costs = {}
+    for engine in engines :
+        pool = MachinePool(engine)
+        timings = []
+        for run, argument in ((fresh, engine), (pooled, pool)) :
+            start = time.perf_counter()
+            for index in range(repeat) :
+                run(argument)
+            timings.append((time.perf_counter() - start) / repeat)
+        costs[engine.__name__] = tuple(timings)
+    return costs
+
+
+def percentile(values, share) :
+    """
+    nearest rank percentile of values
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share * len(ordered)) - 1)]
+
+
+def measure(engine, workload, repeat) :
+    """
+    runs one workload repeat times on engine and returns its statistics
+    """
+    latencies = []
+    builder = WORKLOADS[workload]
+    if builder is None :
+        for run in range(repeat) :
+            start = time.perf_counter()
+            engine()
+            latencies.append(time.perf_counter() - start)
+        tracemalloc.start()
+        engine()
+        instructions = None
+    else :
+        program, inputs = builder()
+        for run in range(repeat) :
+            machine = prepare(engine, program, inputs)
+            start = time.perf_counter()
+            machine.fetch()
+            latencies.append(time.perf_counter() - start)
+        instructions = countInstructions(program, inputs)
+        machine = prepare(engine, program, inputs)
+        tracemalloc.start()
+        machine.fetch()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'instructions' : instructions,
+        'instructionsPerSecond' : None if instructions is None else instructions / percentile(latencies, 0.5),
+        'p50' : percentile(latencies, 0.5),
+        'p90' : percentile(latencies, 0.9),
+        'p99' : percentile(latencies, 0.99),
+        'peakBytes' : peak,
+        'runs' : repeat,
+    }
+
+
+def loadTest(address=None, connections=4, requests=200, batch=16, workers=None) :
+    """
+    sends requests batches of batch add routine jobs to the server at address over connections reused
+    connections at once and returns the throughput and the latency percentiles of whole requests.
+    without an address a Server with workers worker processes is started in this process.
+    """
+    stop = None
+    if address is None :
+        address, stop = startThread(Server(workers=workers))
+    programs = [addRoutine()]
+    jobs = [{'inputs': {2: index, 3: 1}, 'outputs': [4]} for index in range(batch)]
+
+    def connection(count) :
+        latencies = []
+        errors = 0
+        with Client(address) as client :
+            for request in range(count) :
+                start = time.perf_counter()
+                errors += sum('error' in response for response in client.run(programs, jobs))
+                latencies.append(time.perf_counter() - start)
+        return latencies, errors
+
+    try :
+        shares = [requests // connections + (index < requests % connections) for index in range(connections)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(connections) as threads :
+            results = list(threads.map(connection, shares))
+        elapsed = time.perf_counter() - start
+    finally :
+        if stop is not None :
+            stop()
+    latencies = [latency for connectionLatencies, errors in results for latency in connectionLatencies]
+    return {
+        'requests' : requests,
+        'jobs' : requests * batch,
+        'errors' : sum(errors for connectionLatencies, errors in results),
+        'requestsPerSecond' : requests / elapsed,
+        'jobsPerSecond' : requests * batch / elapsed,
+        'p50' : percentile(latencies, 0.5),
+        'p99' : percentile(latencies, 0.99),
+    }
+
+
+def multicoreScaling(counts=(1, 2, 4), passes=100000, repeat=3) :
+    """
+    {cores: (round robin cycles/s, parallel cycles/s)} for cores counting down passes times each, every
+    core on a counter of its own in the shared memory, best of repeat runs. parallel cycles/s are counted
+    from the moment all core processes are started, so process start up is left out.
+    """
+    scaling = {}
+    for cores in counts :
+        rates = []
+        for parallel in (False, True) :
+            best = 0
+            for run in range(repeat) :
+                machine = Multicore([countdownLoop(10 + core) for core in range(cores)])
+                machine.appendInput(format(2, '012b'), 1)
+                for core in range(cores) :
+                    machine.appendInput(format(10 + core, '012b'), passes)
+                result = machine.runParallel() if parallel else machine.run()
+                best = max(best, sum(result.cycles) / result.seconds)
+            rates.append(best)
+        scaling[cores] = tuple(rates)
+    return scaling
+
+
+def runSuite(engines, workloads, repeat) :
+    """
+    measures every workload on every engine, returns the results as a dict ready for json
+    """
+    results = {}
+    for name in engines :
+        results[name] = {}
+        for workload in workloads :
+            results[name][workload] = measure(ENGINES[name], workload, repeat)
+    return {'python' : platform.python_version(), 'platform' : platform.platform(),
+            'time' : time.strftime('%Y-%m-%dT%H:%M:%S'), 'results' : results}
+
+
+def compareResults(old, new, threshold) :
+    """
+    list of (engine, workload, old, new) for workloads that lost more than threshold of their
+    instructions per second, or for construct whose median latency grew by more than threshold
+    """
+    regressions = []
+    for engine, workloads in new['results'].items() :
+        for workload, result in workloads.items() :
+            before = old['results'].get(engine, {}).get(workload)
+            if before is None :
+                continue
+            if result['instructionsPerSecond'] is None :
+                if result['p50'] > before['p50'] * (1 + threshold) :
+                    regressions.append((engine, workload, before['p50'], result['p50']))
+            elif result['instructionsPerSecond'] < before['instructionsPerSecond'] * (1 - threshold) :
+                regressions.append((engine, workload, before['instructionsPerSecond'], result['instructionsPerSecond']))
+    return regressions
+
+
+def printResults(suite) :
+    print("{:<10}{:<14}{:>14}{:>12}{:>12}{:>12}{:>12}".format('engine', 'workload', 'instr/s', 'p50 ms', 'p90 ms', 'p99 ms', 'peak KiB'))
+    for engine, workloads in suite['results'].items() :
+        for workload, result in workloads.items() :
+            rate = result['instructionsPerSecond']
+            print("{:<10}{:<14}{:>14}{:>12.3f}{:>12.3f}{:>12.3f}{:>12.1f}".format(engine, workload,
+                  '-' if rate is None else '{:.0f}'.format(rate), result['p50'] * 1e3, result['p90'] * 1e3,
+                  result['p99'] * 1e3, result['peakBytes'] / 1024))
+
+
+def timeRun(engine, program, inputs, repeat=3) :
+    """
+    best wall time of repeat runs of program on a fresh engine
+    """
+    best = None
+    for run in range(repeat) :
+        machine = prepare(engine, program, inputs)
+        start = time.perf_counter()
+        machine.fetch()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def compareEngines(engines=(IAS, FastIAS, BlockIAS)) :
+    """
+    prints the time of every engine on two loops and its speedup over IAS.fetch
+    """
+    workloads = {'countdown' : (countdownLoop(), {1: 20000, 2: 1}),
+                 'straightLine' : (straightLineLoop(16), {1: 2000, 2: 1, 3: 7, 4: 2})}
+    for name, (program, inputs) in workloads.items() :
+        baseline = None
+        for engine in engines :
+            elapsed = timeRun(engine, program, inputs)
+            baseline = baseline or elapsed
+            print("{:<14}{:<10}{:>10.4f}s{:>9.1f}x".format(name, engine.__name__, elapsed, baseline / elapsed))
+
+
+def main(arguments) :
+    parser = argparse.ArgumentParser(description="IAS engine benchmarks")
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('engines', help="compare IAS, FastIAS and BlockIAS")
+    commands.add_parser('peephole', help="handler dispatches saved by the peephole optimizer on the workloads. "
+                        "fused words still take one IAS cycle each, so dispatches are reported instead of cycles")
+    commands.add_parser('construct', help="new machine plus a short run, fresh and pooled")
+    load = commands.add_parser('load', help="load test a simulation server")
+    load.add_argument('address', nargs='?', help="host:port or unix socket path, a local server is started without one")
+    load.add_argument('--connections', type=int, default=4)
+    load.add_argument('--requests', type=int, default=200)
+    load.add_argument('--batch', type=int, default=16, help="jobs per request")
+    load.add_argument('--workers', type=int, default=None, help="worker processes of the local server")
+    multicore = commands.add_parser('multicore', help="throughput of 1..N cores sharing one data memory")
+    multicore.add_argument('--cores', type=int, nargs='+', default=[1, 2, 4])
+    multicore.add_argument('--passes', type=int, default=100000, help="countdown passes per core")
+    run = commands.add_parser('run', help="run the workload suite, the default without a command")
+    run.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+    run.add_argument('--workloads', nargs='+', default=list(WORKLOADS), choices=list(WORKLOADS))
+    run.add_argument('--repeat', type=int, default=10)
+    run.add_argument('-o', '--output', help="write the results to this json file")
+    compare = commands.add_parser('compare', help="compare two result files")
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--threshold', type=float, default=0.1, help="allowed slowdown, 0.1 is 10%%")
+    options = parser.parse_args(arguments)
+    if options.command is None :
+        options = parser.parse_args(['run'])
+
+    if options.command == 'engines' :
+        compareEngines()
+    elif options.command == 'peephole' :
+        print("{:<14}{:>7}{:>7}{:>9}{:>12}{:>12}{:>8}".format('workload', 'words', 'fused', 'dropped', 'halves', 'dispatches', 'saved'))
+        for name, (static, halves, dispatches) in peepholeSavings().items() :
+            print("{:<14}{:>7}{:>7}{:>9}{:>12}{:>12}{:>7.1%}".format(name, static.words, static.fused, static.dropped,
+                  halves, dispatches, 1 - dispatches / halves))
+        print("IAS cycles (words fetched) are the same with and without the optimizer, saved counts handler dispatches")
+    elif options.command == 'construct' :
+        print("{:<14}{:>12}{:>12}".format('engine', 'fresh us', 'pooled us'))
+        for name, (fresh, pooled) in constructionCost().items() :
+            print("{:<14}{:>12.1f}{:>12.1f}".format(name, fresh * 1e6, pooled * 1e6))
+    elif options.command == 'load' :
+        result = loadTest(options.address, options.connections, options.requests, options.batch, options.workers)
+        print("{} requests of {} jobs on {} connections, {} errors".format(result['requests'], options.batch,
+              options.connections, result['errors']))
+        print("{:>12.1f} requests/s{:>12.1f} jobs/s".format(result['requestsPerSecond'], result['jobsPerSecond']))
+        print("p50 {:.2f} ms   p99 {:.2f} ms".format(result['p50'] * 1e3, result['p99'] * 1e3))
+    elif options.command == 'multicore' :
+        print("{} cpus".format(os.cpu_count()))
+        print("{:<8}{:>16}{:>16}{:>10}".format('cores', 'round robin/s', 'parallel/s', 'speedup'))
+        scaling = multicoreScaling(options.cores, options.passes)
+        base = scaling[min(scaling)][1]
+        for cores, (interleaved, parallel) in scaling.items() :
+            print("{:<8}{:>16.0f}{:>16.0f}{:>9.2f}x".format(cores, interleaved, parallel, parallel / base))
+    elif options.command == 'run' :
+        suite = runSuite(options.engines, options.workloads, options.repeat)
+        printResults(suite)
+        if options.output :
+            with open(options.output, 'w') as handle :
+                json.dump(suite, handle, indent=2)
+    else :
+        with open(options.old) as handle :
+            old = json.load(handle)
+        with open(options.new) as handle :
+            new = json.load(handle)
+        regressions = compareResults(old, new, options.threshold)
+        for engine, workload, before, after in regressions :
+            print("SLOWER {:<10}{:<14}{:>14.6g} -> {:.6g}".format(engine, workload, before, after))
+        print("{} regression(s) beyond {:.0%}".format(len(regressions), options.threshold))
+        return 1 if regressions else 0
+    return 0
+
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -10,9 +10,39 @@ def test_testname(self) :
 
 
 
+import asyncio
+import itertools
+import os
+import tempfile
+import time
 import unittest
+from unittest import mock
 from unittest.main import main
-from IASopcodes import IAS
+from IASopcodes import IAS, HALTED, BUDGET
+from IASfast import FastIAS, parseWord
+from IASblocks import BlockIAS, interpretWord
+from IASparallel import run_many
+from IASmemory import SparseMemory, SparseWords, UnifiedMemory
+from IASimage import writeImage, packImage
+from IASassembler import assemble
+from IASprofile import Profiler
+from IASscheduler import MachinePool, Scheduler
+from IAScache import ResultCache
+from IASanalysis import analyze, modifiedWords
+from IASpeephole import PeepholeIAS, PeepholeReport, report, simplify
+from IASstream import StreamIAS, WindowError
+from IAStiming import CycleCounter, Timing, TimingModel
+from IASserver import Server, startThread
+from IASclient import Client, ServerError
+from IASmulticore import Multicore
+from IASreplay import Recorder
+from IAStrace import TraceBuffer, firstDivergence, traceRuns, LEFT, RIGHT
+import IAS_Benchmark
+try :
+    import numpy
+    from IASbatch import runBatch
+except ImportError :
+    numpy = None
 from bitstring import BitStream
 
 
@@ -26,6 +56,7 @@ vuat = ['0000100100000000001000001011000000000011','0000010100000000000100100001
 jumpRout1 = ['0000000100000000000100000101000000000010','0000111100000000001100100001000000000101','0000000000000000000000000000000000000000','0000010100000000011100100001000000000101','0000000000000000000000000000000000000000']
 jumpRout2 = ['0000000100000000000100000101000000000010','0000110100000000001100100001000000000101','0000000000000000000000000000000000000000','0000010100000000011100100001000000000101','0000000000000000000000000000000000000000']
 mainprogram = ['0000000100000000001000000110000000000011','0000111100000000010000000101000000000011','0000010100000000001100100001000000000001','0000000000000000000000000000000000000000','0010000100000000000100000000000000000000']
+arraySum = ['0000000100000000001100010010000000000001','0000000100000000101000000101000000000100','0010000100000000010000000001000000000011','0000010100000000001000100001000000000011','0000000100000000010100000110000000000010','0010000100000000010100001111000000000000','0000000000000000000000000000000000000000']
 
 
 class TestALU(unittest.TestCase) :
@@ -111,7 +142,6 @@ class TestALU(unittest.TestCase) :
         Test to check halt functionality
         """
         ias_halt = IAS()
-        ias_halt.data_memory = haltroutine
         ias_halt.fetch()
         self.assertEqual(ias_halt.getAccumulator(),0)
         self.assertEqual(ias_halt.getProgramCounter(),0)
@@ -204,6 +234,1241 @@ class TestALU(unittest.TestCase) :
         self.assertEqual(ias_main.getStoredValue('000000000001'),20)
 
 
+class TestFastIAS(unittest.TestCase) :
+    """
+    The integer engine and its compiled blocks have to give the same results as IAS on the programs above
+    """
+
+    programs = [
+        (addRoutine, {'000000000011': 20, '000000000010': 63}, ['000000000100']),
+        (multiplicationRoutine, {'000000000011': 51, '000000000010': 3}, ['000000000101']),
+        (multiplicationRoutine, {'000000000011': -51, '000000000010': 2**30}, ['000000000101']),
+        (divisionRoutine, {'000000000011': 3, '000000000010': 26}, ['000000000101', '000000000110']),
+        (subtractionRoutine, {'000000000011': 56, '000000000010': 35}, ['000000000100']),
+        (vuat, {'000000000001': 2, '000000000010': 3, '000000000011': 4}, ['000000000100']),
+        (jumpRout1, {'000000000001': 1, '000000000010': 5, '000000000011': -1, '000000000111': 1000}, ['000000000101']),
+        (jumpRout1, {'000000000001': 1, '000000000010': -2, '000000000011': -1, '000000000111': 1000}, ['000000000101']),
+        (jumpRout2, {'000000000001': 1, '000000000010': -2, '000000000011': -1, '000000000111': 1000}, ['000000000101']),
+        (mainprogram, {'000000000010': 15, '000000000011': 5}, ['000000000001']),
+        (mainprogram, {'000000000010': 5, '000000000011': 15}, ['000000000001']),
+    ]
+
+    def test_matchesIAS(self) :
+        for program, inputs, outputs in self.programs :
+            engines = [IAS(), FastIAS(), BlockIAS()]
+            for engine in engines :
+                for address, value in inputs.items() :
+                    engine.appendInput(address, value)
+                engine.memory.setInstructionsMemory(list(program))
+                engine.fetch()
+            for engine in engines[1:] :
+                for address in outputs :
+                    self.assertEqual(engine.getStoredValue(address), engines[0].getStoredValue(address))
+                self.assertEqual(engine.getAccumulator(), engines[0].getAccumulator())
+                self.assertEqual(engine.getMultiplierQuotient(), engines[0].getMultiplierQuotient())
+                self.assertEqual(engine.getProgramCounter(), engines[0].getProgramCounter())
+
+
+    def test_shifts(self) :
+        ias_shift = FastIAS()
+        ias_shift.appendInput('000000000010',-4)
+        ias_shift.decode('00000001','000000000010')
+        ias_shift.decode('00010100','000000000010')
+        self.assertEqual(ias_shift.getAccumulator(),-8)
+        ias_shift.decode('00010101','000000000010')
+        self.assertEqual(ias_shift.getAccumulator(),(2**40 - 8) >> 1)
+
+
+    def test_wraparound(self) :
+        ias_wrap = FastIAS()
+        ias_wrap.appendInput('000000000010', 2**39 - 1)
+        ias_wrap.appendInput('000000000011', 1)
+        ias_wrap.memory.setInstructionsMemory(addRoutine)
+        ias_wrap.fetch()
+        self.assertEqual(ias_wrap.getStoredValue('000000000100'), -2**39)
+
+
+    def test_jumpRight(self) :
+        """
+        JUMP M(X,20:39) continues with the right half of M(X) and then M(X+1)
+        """
+        program = ['0000111000000000001000000000000000000000',          #JUMP M(2,20:39) ; HALT
+                   '0000000100000000000100100001000000000100',          #LOAD M(1) ; STOR M(4)
+                   '0000000100000000001000000101000000000001',          #LOAD M(2) ; ADD M(1)
+                   '0010000100000000010100000000000000000000']          #STOR M(5) ; HALT
+        for engine in (IAS(), FastIAS(), BlockIAS()) :
+            engine.appendInput('000000000001', 7)
+            engine.memory.setInstructionsMemory(list(program))
+            engine.fetch()
+            self.assertEqual(engine.getStoredValue('000000000101'), 7)
+            self.assertEqual(engine.getStoredValue('000000000100'), 0)
+
+
+    def test_storeLeft(self) :
+        """
+        STOR M(X,8:19) rewrites the address of the instruction at X
+        """
+        program = ['0000000100000000000100010010000000000001',          #LOAD M(1) ; STOR M(1,8:19)
+                   '0000000100000000000000100001000000000100',          #LOAD M(0) ; STOR M(4)
+                   '0'*40]
+        for engine in (IAS(), FastIAS(), BlockIAS()) :
+            engine.appendInput('000000000001', 3)
+            engine.appendInput('000000000011', 99)
+            engine.memory.setInstructionsMemory(list(program))
+            engine.fetch()
+            self.assertEqual(engine.getStoredValue('000000000100'), 99)
+
+
+    def test_selfModifyingLoop(self) :
+        """
+        arraySum walks M(10)..M(14) by rewriting the address of its LOAD, the predecoded word has to follow
+        """
+        for engine in (IAS(), FastIAS(), BlockIAS()) :
+            engine.appendInput('000000000010', 1)
+            engine.appendInput('000000000011', 10)
+            engine.appendInput('000000000101', 4)
+            for offset, value in enumerate([3, 5, 7, 11, 13]) :
+                engine.appendInput(format(10 + offset, '012b'), value)
+            engine.memory.setInstructionsMemory(list(arraySum))
+            engine.fetch()
+            self.assertEqual(engine.getStoredValue('000000000100'), 39)
+
+
+    def test_newProgramAfterFetch(self) :
+        """
+        setting a new instructions_memory drops the predecoded words of the old one
+        """
+        for engine in (IAS(), FastIAS(), BlockIAS()) :
+            engine.appendInput('000000000011', 56)
+            engine.appendInput('000000000010', 35)
+            engine.memory.setInstructionsMemory(list(addRoutine))
+            engine.fetch()
+            self.assertEqual(engine.getStoredValue('000000000100'), 91)
+            engine.memory.setInstructionsMemory(list(subtractionRoutine))
+            engine.decode('00001101','000000000000')
+            engine.fetch()
+            self.assertEqual(engine.getStoredValue('000000000100'), -21)
+
+
+    def test_blockRecompiled(self) :
+        """
+        a block containing a word rewritten by STOR M(X,8:19) is compiled again, a stale one would add M(10) twice
+        """
+        ias_block = BlockIAS()
+        ias_block.appendInput('000000000010', 1)
+        ias_block.appendInput('000000000011', 10)
+        ias_block.appendInput('000000000101', 1)
+        ias_block.appendInput('000000001010', 4)
+        ias_block.appendInput('000000001011', 6)
+        ias_block.memory.setInstructionsMemory(list(arraySum))
+        ias_block.fetch()
+        self.assertEqual(ias_block.getStoredValue('000000000100'), 10)
+
+
+@unittest.skipIf(numpy is None, "numpy is not installed")
+class TestBatchIAS(unittest.TestCase) :
+    """
+    Every lane of a batch has to end up like a FastIAS run on the same data memory
+    """
+
+    def runLanes(self, program, dataMemories) :
+        result = runBatch(program, dataMemories)
+        for lane, dataMemory in enumerate(dataMemories) :
+            ias_lane = FastIAS()
+            ias_lane.memory.setDataMemory(list(dataMemory) + [0] * (1000 - len(dataMemory)))
+            ias_lane.memory.setInstructionsMemory(list(program))
+            ias_lane.fetch()
+            self.assertEqual(result.data[lane].tolist(), list(ias_lane.memory.data_memory[:len(dataMemory)]))
+            self.assertEqual(result.AC[lane], ias_lane.getAccumulator())
+            self.assertEqual(result.MQ[lane], ias_lane.getMultiplierQuotient())
+            self.assertEqual(result.PC[lane], ias_lane.getProgramCounter())
+        return result
+
+
+    def test_divergingLanes(self) :
+        """
+        mainprogram takes the conditional jump in some lanes and not in others
+        """
+        result = self.runLanes(mainprogram, [[0, 0, 15, 5], [0, 0, 5, 15], [0, 0, 7, 7], [0, 0, -3, 4]])
+        self.assertEqual(result.data[:, 1].tolist(), [10, 20, 0, 1])
+        self.assertTrue(result.halted.all())
+
+
+    def test_multiplyWide(self) :
+        """
+        products wider than 64 bits are split the same way as FastIAS.multiply
+        """
+        self.runLanes(multiplicationRoutine, [[0, 0, 2**39 - 1, 2**39 - 1, 0, 0], [0, 0, -2**39, 2**39 - 1, 0, 0],
+                                              [0, 0, -12345678901, 98765432, 0, 0], [0, 0, 51, -3, 0, 0]])
+
+
+    def test_selfModifyingLanes(self) :
+        """
+        each lane walks its own array through STOR M(X,8:19)
+        """
+        lanes = []
+        for length in range(1, 5) :
+            lanes.append([0, 0, 1, 10, 0, length - 1, 0, 0, 0, 0, 3, 5, 7, 11, 13])
+        result = self.runLanes(arraySum, lanes)
+        self.assertEqual(result.data[:, 4].tolist(), [3, 8, 15, 26])
+
+
+    def test_maxSteps(self) :
+        result = runBatch(jumpRout2, [[0, 1, 5, -1, 0, 0, 0, 1000]], maxSteps=2)
+        self.assertFalse(result.halted[0])
+
+
+    def test_failingLane(self) :
+        """
+        a lane dividing by zero fails on its own, the other lanes finish like FastIAS
+        """
+        program = assemble("LOAD M(2)\nDIV M(3)\nSTOR M(4)\nLOAD MQ\nSTOR M(5)").instructions
+        lanes = [[0, 0, 17, 5, 0, 0], [0, 0, 17, 0, 0, 0], [0, 0, -9, 2, 0, 0]]
+        result = runBatch(program, lanes)
+        self.assertEqual(result.failed.tolist(), [False, True, False])
+        self.assertEqual(result.halted.tolist(), [True, False, True])
+        self.assertEqual(result.data[1].tolist(), lanes[1])
+        with self.assertRaises(ZeroDivisionError) :
+            self.runLanes(program, lanes[1:2])
+        self.runLanes(program, lanes[0:1] + lanes[2:3])
+        self.assertTrue(runBatch(['1111111100000000000000000000000000000000'], [[0]]).failed[0])
+
+
+class TestRunMany(unittest.TestCase) :
+    """
+    run_many has to give the same values as running the jobs one after another
+    """
+
+    def test_runMany(self) :
+        jobs = [(mainprogram, {'000000000010': value, '000000000011': 5}, ['000000000001']) for value in range(-3, 9)]
+        jobs.append((addRoutine, {'000000000011': 20, '000000000010': 63}, ['000000000100']))
+        ordered = list(run_many(jobs, workers=2, chunksize=5))
+        self.assertEqual(ordered[0], {'000000000001': 2})
+        self.assertEqual(ordered[-1], {'000000000100': 83})
+        completed = dict(run_many(iter(jobs), workers=2, chunksize=3, ordered=False))
+        self.assertEqual([completed[index] for index in range(len(jobs))], ordered)
+
+
+class TestSparseMemory(unittest.TestCase) :
+    """
+    SparseMemory has to work with the handlers of both engines and keep snapshots apart
+    """
+
+    def test_engines(self) :
+        for engine in (IAS(SparseMemory()), FastIAS(SparseMemory(zero=0)), BlockIAS(SparseMemory(zero=0))) :
+            engine.appendInput('000000000010',15)
+            engine.appendInput('000000000011',5)
+            engine.memory.setInstructionsMemory(list(mainprogram))
+            engine.fetch()
+            self.assertEqual(engine.getStoredValue('000000000001'),10)
+            self.assertEqual(engine.getStoredValue('000000100000'),0)
+
+
+    def test_snapshot(self) :
+        parent = SparseMemory(zero=0)
+        parent.data_memory[2] = 15
+        parent.data_memory[3] = 5
+        parent.setInstructionsMemory(list(mainprogram))
+        child = parent.snapshot()
+        child.data_memory[3] = 25
+        ias_parent = FastIAS(parent)
+        ias_child = FastIAS(child)
+        ias_parent.fetch()
+        ias_child.fetch()
+        self.assertEqual(ias_parent.getStoredValue('000000000001'),10)
+        self.assertEqual(ias_child.getStoredValue('000000000001'),40)
+        self.assertEqual(parent.data_memory[3],5)
+        self.assertIsNone(child.data_memory.pages[5])
+
+
+    def test_restore(self) :
+        """
+        restore and loadImage keep the data memory sparse, so snapshot and reset still work afterwards
+        """
+        for engine, zero in ((IAS, None), (FastIAS, 0)) :
+            ias_source = engine()
+            ias_source.appendInput('000000000010',15)
+            ias_source.appendInput('000000000011',5)
+            ias_source.memory.setInstructionsMemory(list(mainprogram))
+            ias_sparse = engine(SparseMemory(zero=zero))
+            ias_sparse.restore(ias_source.snapshot())
+            self.assertIsInstance(ias_sparse.memory.data_memory, SparseWords)
+            self.assertEqual(sum(page is not None for page in ias_sparse.memory.data_memory.pages), 1)
+            child = engine(ias_sparse.memory.snapshot())
+            child.fetch()
+            self.assertEqual(child.getStoredValue('000000000001'),10)
+            self.assertEqual(ias_sparse.getStoredValue('000000000001'),0)
+            ias_sparse.loadImage(packImage(mainprogram, {2: 7, 3: 2}))
+            ias_sparse.fetch()
+            self.assertEqual(ias_sparse.getStoredValue('000000000001'),5)
+            ias_sparse.memory.reset()
+            self.assertEqual(ias_sparse.getStoredValue('000000000001'),0)
+
+
+class TestSnapshot(unittest.TestCase) :
+    """
+    A restored machine has to carry on exactly like the one the snapshot was taken from
+    """
+
+    def pausedMachine(self, engine) :
+        """
+        machine that has executed JUMP M(1,20:39) of jumpRout2 and holds the right half of word 1 in its IBR
+        """
+        ias_paused = engine()
+        ias_paused.appendInput('000000000001', 1)
+        ias_paused.appendInput('000000000010', 5)
+        ias_paused.appendInput('000000000011', -1)
+        ias_paused.appendInput('000000000111', 1000)
+        ias_paused.memory.setInstructionsMemory(list(jumpRout2))
+        ias_paused.decode('00000001','000000000001')
+        ias_paused.decode('00001110','000000000001')
+        return ias_paused
+
+
+    def test_restore(self) :
+        for source, target in ((FastIAS, FastIAS), (IAS, IAS), (IAS, FastIAS), (FastIAS, IAS)) :
+            ias_paused = self.pausedMachine(source)
+            snapshot = ias_paused.snapshot()
+            ias_paused.fetch()
+            ias_restored = target()
+            ias_restored.restore(snapshot)
+            ias_restored.fetch()
+            self.assertEqual(ias_restored.getStoredValue('000000000101'), ias_paused.getStoredValue('000000000101'))
+            self.assertEqual(ias_restored.getProgramCounter(), ias_paused.getProgramCounter())
+            self.assertEqual(ias_restored.getStoredValue('000000000101'), 1)
+
+
+    def test_restoreFile(self) :
+        """
+        a memory mapped snapshot is copy-on-write, running the machine leaves the file as it was
+        """
+        path = os.path.join(tempfile.mkdtemp(), 'paused.iass')
+        payload = self.pausedMachine(FastIAS).snapshot(path)
+        ias_restored = FastIAS()
+        ias_restored.restore(path)
+        ias_restored.fetch()
+        self.assertEqual(ias_restored.getStoredValue('000000000101'), 1)
+        with open(path, 'rb') as handle :
+            self.assertEqual(handle.read(), payload)
+        self.assertEqual(len(payload), 16 + 5 * (7 + len(jumpRout2) + 1000))
+
+
+class TestImage(unittest.TestCase) :
+    """
+    Program images have to run like the string-list programs they were written from
+    """
+
+    def test_image(self) :
+        path = os.path.join(tempfile.mkdtemp(), 'velocity.iasp')
+        writeImage(path, vuat, {1: 2, 2: 3, 3: 4})
+        for engine in (IAS(), FastIAS(), BlockIAS()) :
+            engine.loadImage(path)
+            engine.fetch()
+            self.assertEqual(engine.getStoredValue('000000000100'),14)
+        ias_image = FastIAS()
+        ias_image.loadImage(packImage(arraySum, [0, 0, 1, 10, 0, 2, 0, 0, 0, 0, 3, 5, 7]))
+        ias_image.fetch()
+        self.assertEqual(ias_image.getStoredValue('000000000100'),15)
+        self.assertEqual(len(ias_image.memory.data_memory),1000)
+
+
+class TestAssembler(unittest.TestCase) :
+    """
+    Assembled programs have to match the hand written words above
+    """
+
+    def test_mainprogram(self) :
+        program = assemble("""
+                LOAD M(2)
+                SUB M(3)
+                JUMP+ M(4,0:19)     ; taken when M(2) >= M(3)
+                ADD M(3)
+                ADD M(3)
+                STOR M(1)
+                HALT
+                HALT
+                STOR M(1)
+                """)
+        self.assertEqual(program.instructions, mainprogram)
+        self.assertEqual(assemble("LOAD MQ,M(2)\nMUL M(3)\nSTOR M(5)", encoding='int').instructions,
+                         [int(word, 2) for word in multiplicationRoutine])
+
+
+    def test_symbols(self) :
+        program = assemble("""
+                .data counter 3
+                .data one 1
+                .data pointer 10
+                .data sum
+                .equ array 10
+                top:    LOAD M(pointer)
+                        STOR M(patch,8:19)
+                patch:  LOAD M(array)
+                        ADD M(sum)
+                        STOR M(sum)
+                        LOAD M(pointer)
+                        ADD M(one)
+                        STOR M(pointer)
+                        LOAD M(counter)
+                        SUB M(one)
+                        STOR M(counter)
+                        JUMP+ M(top)
+                """)
+        self.assertEqual(program.symbols['patch'], 1)
+        ias_asm = FastIAS()
+        for address, value in program.data.items() :
+            ias_asm.appendInput(format(address, '012b'), value)
+        for offset, value in enumerate([3, 5, 7, 11, 13]) :
+            ias_asm.appendInput(format(10 + offset, '012b'), value)
+        ias_asm.memory.setInstructionsMemory(program.instructions)
+        ias_asm.fetch()
+        self.assertEqual(ias_asm.getStoredValue(format(program.symbols['sum'], '012b')), 26)
+
+
+    def test_errors(self) :
+        with self.assertRaises(ValueError) :
+            assemble("LOAD M(nowhere)")
+        with self.assertRaises(ValueError) :
+            assemble("FETCH M(1)")
+        with self.assertRaises(ValueError) :
+            assemble("JUMP M(5)")
+        for source in (".data table 1,x2", ".equ size 0x", "HALT\n.data table 1,,2") :
+            with self.assertRaisesRegex(ValueError, "^line [12]: ") :
+                assemble(source)
+
+
+    def test_numbers(self) :
+        program = assemble(".data table 010,-0x10,0b11\nLOAD M(010)\nADD M(0x0A)", encoding='int')
+        self.assertEqual(program.data, {1: 10, 2: -16, 3: 3})
+        self.assertEqual(program.instructions, [(0b00000001 << 32) | (10 << 20) | (0b00000101 << 12) | 10])
+
+
+class TestProfiler(unittest.TestCase) :
+    """
+    The profiled loop has to run programs like fetch and count what it executed
+    """
+
+    def test_profile(self) :
+        for ias_prof in (IAS(), FastIAS()) :
+            ias_prof.appendInput('000000000010', 1)
+            ias_prof.appendInput('000000000011', 10)
+            ias_prof.appendInput('000000000101', 4)
+            for offset, value in enumerate([3, 5, 7, 11, 13]) :
+                ias_prof.appendInput(format(10 + offset, '012b'), value)
+            ias_prof.memory.setInstructionsMemory(list(arraySum))
+            profiler = Profiler()
+            self.assertEqual(profiler.run(ias_prof).status, HALTED)
+            self.assertEqual(ias_prof.getStoredValue('000000000100'), 39)
+            report = profiler.report()
+            self.assertEqual(report['instructions'], 12 * 5 + 1)
+            self.assertEqual(report['opcodes']['storeLeft']['count'], 5)
+            self.assertEqual(report['addresses']['1L'], 5)
+            self.assertEqual(report['branches']['5R'], {'taken': 4, 'notTaken': 1})
+            self.assertIn('conditionalJumpLeft (taken 4, not taken 1)', profiler.table(top=12))
+
+
+class TestBenchmark(unittest.TestCase) :
+    """
+    The benchmark workloads have to run and compare has to flag slowdowns only
+    """
+
+    def test_workloads(self) :
+        self.assertEqual(IAS_Benchmark.countInstructions(*IAS_Benchmark.WORKLOADS['arrayWalk']()), 16 * 400)
+        suite = IAS_Benchmark.runSuite(['FastIAS'], ['mulDiv', 'construct'], 2)
+        self.assertEqual(suite['results']['FastIAS']['mulDiv']['instructions'], 10 * 1001)
+        self.assertIsNone(suite['results']['FastIAS']['construct']['instructionsPerSecond'])
+
+
+    def test_compare(self) :
+        old = {'results': {'FastIAS': {'countdown': {'instructionsPerSecond': 1000.0, 'p50': 1.0},
+                                       'construct': {'instructionsPerSecond': None, 'p50': 1.0}}}}
+        new = {'results': {'FastIAS': {'countdown': {'instructionsPerSecond': 950.0, 'p50': 1.0},
+                                       'construct': {'instructionsPerSecond': None, 'p50': 1.5}}}}
+        self.assertEqual(IAS_Benchmark.compareResults(old, new, 0.1), [('FastIAS', 'construct', 1.0, 1.5)])
+        self.assertEqual(len(IAS_Benchmark.compareResults(old, new, 0.01)), 2)
+
+
+    def test_defaultCommand(self) :
+        with mock.patch.object(IAS_Benchmark, 'runSuite') as runSuite, mock.patch.object(IAS_Benchmark, 'printResults') :
+            self.assertEqual(IAS_Benchmark.main([]), 0)
+        runSuite.assert_called_once_with(list(IAS_Benchmark.ENGINES), list(IAS_Benchmark.WORKLOADS), 10)
+
+
+class TestBoundedRun(unittest.TestCase) :
+    """
+    fetch(max_cycles, deadline) stops a run that would not halt and can carry on from there
+    """
+
+    spin = ['0000110100000000000000000000000000000000']           #JUMP M(0,0:19) ; HALT
+
+    def test_budget(self) :
+        for engine in (IAS(), FastIAS(), BlockIAS()) :
+            engine.memory.setInstructionsMemory(list(self.spin))
+            result = engine.fetch(max_cycles=5000)
+            self.assertEqual(result.status, 'budget')
+            self.assertGreaterEqual(result.cycles, 5000)
+            self.assertFalse(engine.isHalted())
+
+
+    def test_deadline(self) :
+        for engine in (IAS(), FastIAS(), BlockIAS()) :
+            engine.memory.setInstructionsMemory(list(self.spin))
+            self.assertEqual(engine.fetch(deadline=time.monotonic() + 0.01).status, 'timeout')
+
+
+    def test_resume(self) :
+        """
+        a countdown run in slices of 7 cycles ends like a run in one go
+        """
+        program = IAS_Benchmark.countdownLoop()
+        for engine in (IAS(), FastIAS(), BlockIAS()) :
+            engine.appendInput('000000000001', 50)
+            engine.appendInput('000000000010', 1)
+            engine.memory.setInstructionsMemory(list(program))
+            slices = 0
+            result = engine.fetch(max_cycles=7)
+            while result.status == 'budget' :
+                slices += 1
+                result = engine.fetch(max_cycles=7)
+            self.assertEqual(result.status, 'halted')
+            self.assertGreater(slices, 5)
+            self.assertTrue(engine.isHalted())
+            self.assertEqual(engine.getStoredValue('000000000001'), -1)
+            self.assertEqual(engine.fetch(), (HALTED, 0))
+
+
+    def test_rightHalfJumps(self) :
+        """
+        a right half jumped to by a right half is a cycle of its own on every engine
+        """
+        for jump in ("JUMP+ M(back)", "JUMP M(back)") :
+            program = assemble("""
+                    .data counter 10
+                    .data one 1
+                    LOAD M(one)
+            back:   LOAD M(counter)
+                    SUB M(one)
+                    STOR M(counter)
+                    ADD M(one)
+                    """ + jump + """
+                    HALT
+                    """)
+            results = []
+            for engine in (IAS(), FastIAS(), BlockIAS(), PeepholeIAS()) :
+                for address, value in program.data.items() :
+                    engine.appendInput(format(address, '012b'), value)
+                engine.memory.setInstructionsMemory(list(program.instructions))
+                results.append(engine.fetch(max_cycles=None if jump.startswith("JUMP+") else 40).cycles)
+            self.assertEqual(len(set(results)), 1, results)
+
+class TestScheduler(unittest.TestCase) :
+    """
+    async run and the round robin scheduler have to finish programs like fetch does
+    """
+
+    def test_asyncRun(self) :
+        for engine in (IAS(), FastIAS(), BlockIAS()) :
+            engine.appendInput('000000000001', 50)
+            engine.appendInput('000000000010', 1)
+            engine.memory.setInstructionsMemory(IAS_Benchmark.countdownLoop())
+            result = asyncio.run(engine.run(yield_every=16))
+            self.assertEqual(result.status, HALTED)
+            self.assertEqual(engine.getStoredValue('000000000001'), -1)
+            with self.assertRaises(ValueError) :
+                asyncio.run(engine.run(yield_every=0))
+
+
+    def test_reset(self) :
+        for engine in (IAS(), FastIAS(), BlockIAS()) :
+            for run in range(2) :
+                engine.appendInput('000000000011', 56)
+                engine.appendInput('000000000010', 35)
+                engine.memory.setInstructionsMemory(list(addRoutine))
+                engine.fetch()
+                self.assertEqual(engine.getStoredValue('000000000100'), 91)
+                engine.reset()
+                self.assertEqual(engine.getStoredValue('000000000011'), 0)
+                self.assertEqual(engine.getProgramCounter(), 0)
+
+
+    def test_noStarving(self) :
+        """
+        short jobs finish while a program that never halts is still running, it ends on its cycle budget
+        """
+        scheduler = Scheduler(slots=4, quantum=64)
+        spinner = scheduler.submit(TestBoundedRun.spin, max_cycles=100000)
+        jobs = [scheduler.submit(addRoutine, {'000000000011': value, '000000000010': 1}, ['000000000100'])
+                for value in range(20)]
+        order = []
+        async def collect() :
+            async for result in scheduler.results() :
+                order.append(result)
+        asyncio.run(collect())
+        self.assertEqual([result.job for result in order][-1], spinner)
+        self.assertEqual(order[-1].status, BUDGET)
+        self.assertEqual(order[-1].cycles, 100000)
+        results = {result.job: result for result in order}
+        for value, job in enumerate(jobs) :
+            self.assertEqual(results[job].outputs, {'000000000100': value + 1})
+        self.assertLessEqual(len(scheduler.pool.free), 4)
+
+class TestTrace(unittest.TestCase) :
+    """
+    every engine has to record the same trace, the ring buffer keeps the last records
+    """
+
+    def test_enginesAgree(self) :
+        for program, inputs, outputs in TestFastIAS.programs :
+            inputs = {int(address, 2): value for address, value in inputs.items()}
+            traces = traceRuns(program, inputs, (IAS, FastIAS, BlockIAS))
+            self.assertGreater(traces[0].count, 0)
+            for trace in traces[1:] :
+                self.assertIsNone(firstDivergence(traces[0], trace))
+                self.assertEqual(list(trace), list(traces[0]))
+
+
+    def test_ring(self) :
+        """
+        a small ring holds the last records whatever the slices the run was split into
+        """
+        program = IAS_Benchmark.countdownLoop()
+        whole, = traceRuns(program, {1: 30, 2: 1}, (FastIAS,))
+        for capacity in (1, 2, 7, 8) :
+            machine = IAS_Benchmark.prepare(FastIAS, program, {1: 30, 2: 1})
+            trace = TraceBuffer(capacity)
+            while machine.fetch(max_cycles=3, trace=trace).status != HALTED :
+                pass
+            self.assertEqual(trace.count, whole.count)
+            self.assertEqual(list(trace), list(whole)[-capacity:])
+        last = whole[whole.count - 1]
+        self.assertEqual((last.pc, last.half, last.opcode), (2, LEFT, 0))
+
+
+    def test_divergence(self) :
+        program = IAS_Benchmark.countdownLoop()
+        first, = traceRuns(program, {1: 30, 2: 1}, (IAS,))
+        second, = traceRuns(program, {1: 30, 2: 2}, (FastIAS,))
+        step, left, right = firstDivergence(first, second)
+        self.assertEqual((step, left.pc, left.half, left.opcode, left.operand), (1, 0, RIGHT, 0b00000110, 2))
+        self.assertEqual((left.ac, right.ac), (29, 28))
+        with tempfile.TemporaryDirectory() as directory :
+            path = os.path.join(directory, 'second.trace')
+            second.save(path)
+            self.assertEqual(list(TraceBuffer.load(path)), list(second))
+
+class TestResultCache(unittest.TestCase) :
+    """
+    a cache hit has to leave the machine like a real run without running fetch
+    """
+
+    def machine(self, program, inputs, engine=FastIAS) :
+        machine = engine()
+        for address, value in inputs.items() :
+            machine.appendInput(address, value)
+        machine.memory.setInstructionsMemory(list(program))
+        return machine
+
+
+    def test_hit(self) :
+        cache = ResultCache()
+        for program, inputs, outputs in TestFastIAS.programs :
+            expected = self.machine(program, inputs)
+            expected.fetch()
+            for engine in (FastIAS, BlockIAS) :
+                machine = self.machine(program, inputs, engine)
+                cache.run(machine)
+                self.assertEqual(machine.memory.data_memory, expected.memory.data_memory)
+                self.assertEqual(machine.getAccumulator(), expected.getAccumulator())
+                self.assertEqual(machine.getMultiplierQuotient(), expected.getMultiplierQuotient())
+                self.assertEqual(machine.getProgramCounter(), expected.getProgramCounter())
+        self.assertEqual(cache.hits, len(TestFastIAS.programs))
+
+        machine = self.machine(addRoutine, {'000000000011': 20, '000000000010': 63})
+        with mock.patch.object(FastIAS, 'fetch', None) :
+            self.assertEqual(cache.run(machine).status, HALTED)
+        self.assertEqual(machine.getStoredValue('000000000100'), 83)
+
+
+    def test_unreadWords(self) :
+        """
+        words the program never reads are not part of the key, changed inputs it reads are
+        """
+        cache = ResultCache()
+        cache.run(self.machine(addRoutine, {'000000000011': 20, '000000000010': 63}))
+        cache.run(self.machine(addRoutine, {'000000000011': 20, '000000000010': 63, '000000001001': 5}))
+        machine = self.machine(addRoutine, {'000000000011': 21, '000000000010': 63})
+        cache.run(machine)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+        self.assertEqual(machine.getStoredValue('000000000100'), 84)
+
+
+    def test_selfModifying(self) :
+        cache = ResultCache()
+        inputs = {'000000000010': 1, '000000000011': 10, '000000000101': 4, '000000001010': 3, '000000001011': 5,
+                  '000000001100': 7, '000000001101': 11, '000000001110': 13}
+        for run in range(2) :
+            machine = self.machine(arraySum, inputs)
+            cache.run(machine)
+            self.assertEqual(machine.getStoredValue('000000000100'), 39)
+        self.assertEqual((cache.hits, len(cache)), (0, 0))
+
+
+    def test_eviction(self) :
+        cache = ResultCache(maxWords=40)
+        for value in range(10) :
+            cache.run(self.machine(addRoutine, {'000000000011': value, '000000000010': 1}))
+        self.assertLessEqual(cache.words, 40)
+        self.assertLess(len(cache), 10)
+        cache.run(self.machine(addRoutine, {'000000000011': 9, '000000000010': 1}))
+        cache.run(self.machine(addRoutine, {'000000000011': 0, '000000000010': 1}))
+        self.assertEqual((cache.hits, cache.misses), (1, 11))
+
+class TestAnalysis(unittest.TestCase) :
+    """
+    control flow and data flow facts of the test programs
+    """
+
+    def test_deadHalves(self) :
+        analysis = analyze(jumpRout2)
+        self.assertEqual(analysis.deadHalves, [(1, 'R'), (2, 'L'), (2, 'R'), (4, 'R')])
+        self.assertEqual(analysis.inputs, {1, 2, 7})
+        self.assertEqual(analysis.writes, {5})
+        self.assertEqual(analysis.loops, [])
+        self.assertTrue(analysis.exact)
+
+
+    def test_inputs(self) :
+        """
+        a word the program writes before reading it is not an input
+        """
+        program = assemble("""
+                LOAD M(7)
+                STOR M(8)
+                LOAD M(8)
+                ADD M(9)
+                STOR M(10)
+                HALT
+        """).instructions
+        analysis = analyze(program)
+        self.assertEqual(analysis.inputs, {7, 9})
+        self.assertEqual(analysis.reads, {7, 8, 9})
+
+
+    def test_loops(self) :
+        analysis = analyze(assemble(IAS_Benchmark.ARITHMETIC_KERNEL).instructions)
+        loop, = analysis.loops
+        self.assertEqual(loop.header, 0)
+        self.assertEqual(loop.writes, {1, 5, 6})
+        self.assertEqual(loop.invariantLoads, [(0, 'L'), (0, 'R'), (1, 'R'), (3, 'R')])
+
+
+    def test_selfModifying(self) :
+        analysis = analyze(arraySum)
+        self.assertEqual(analysis.modifiedWords, {1})
+        self.assertFalse(analysis.exact)
+        self.assertIsNone(analysis.inputs)
+        self.assertEqual(modifiedWords(arraySum), {1})
+        ias_block = BlockIAS()
+        for address, value in [(2, 1), (3, 10), (5, 4), (10, 3), (11, 5), (12, 7), (13, 11), (14, 13)] :
+            ias_block.appendInput(format(address, '012b'), value)
+        ias_block.memory.setInstructionsMemory(list(arraySum))
+        ias_block.fetch()
+        self.assertEqual(ias_block.getStoredValue('000000000100'), 39)
+        self.assertIs(ias_block._blocks[1], interpretWord)
+
+
+    def test_rewrittenModifier(self) :
+        """
+        the STOR M(X,28:39) of word 1 is itself rewritten to aim at word 2, whose LOAD then reads word 121
+        """
+        program = assemble("""
+                LOAD M(10)
+                STOR M(1,28:39)
+                LOAD M(11)
+                STOR M(5,28:39)
+                LOAD M(20)
+                LOAD M(30)
+                STOR M(4)
+                HALT
+                HALT
+                HALT
+                HALT
+                LOAD M(7)
+                """).instructions
+        machine = FastIAS()
+        for address, value in ((10, 2), (11, 121), (121, 77)) :
+            machine.appendInput(format(address, '012b'), value)
+        machine.memory.setInstructionsMemory(list(program))
+        machine.fetch()
+        self.assertEqual(machine.getStoredValue('000000000100'), 77)
+        analysis = analyze(program)
+        self.assertFalse(analysis.exact)
+        self.assertIsNone(analysis.inputs)
+        self.assertTrue({1, 2, 3, 5} <= analysis.modifiedWords)
+
+
+    def test_largeProgram(self) :
+        program = IAS_Benchmark.straightLineLoop(4090)
+        analysis = analyze(program)
+        self.assertEqual(len(analysis.loops), 1)
+        self.assertEqual(len(analysis.blocks), 2)
+        self.assertEqual(analysis.deadHalves, [])
+
+class TestPeephole(unittest.TestCase) :
+    """
+    superinstructions have to leave every program where FastIAS leaves it
+    """
+
+    def assertSameRun(self, program, inputs) :
+        engines = [FastIAS(), PeepholeIAS()]
+        results = []
+        for engine in engines :
+            for address, value in inputs.items() :
+                engine.appendInput(address, value)
+            engine.memory.setInstructionsMemory(list(program))
+            results.append(engine.fetch())
+        self.assertEqual(results[1], results[0])
+        self.assertEqual(list(engines[1].memory.data_memory), list(engines[0].memory.data_memory))
+        self.assertEqual(engines[1].memory.instructions_memory, engines[0].memory.instructions_memory)
+        self.assertEqual((engines[1].getAccumulator(), engines[1].getMultiplierQuotient(), engines[1].getProgramCounter()),
+                         (engines[0].getAccumulator(), engines[0].getMultiplierQuotient(), engines[0].getProgramCounter()))
+
+
+    def test_programs(self) :
+        for program, inputs, outputs in TestFastIAS.programs :
+            self.assertSameRun(program, inputs)
+        self.assertSameRun(arraySum, {'000000000010': 1, '000000000011': 10, '000000000101': 4, '000000001010': 3})
+        for name in ('straightLine', 'mulDiv', 'arrayWalk') :
+            program, inputs = IAS_Benchmark.WORKLOADS[name]()
+            self.assertSameRun(program, {format(address, '012b'): value for address, value in inputs.items()})
+
+
+    def test_rules(self) :
+        """
+        no-op halves are dropped, a jump into the right half of a fused word still runs that half
+        """
+        program = assemble("""
+                LOAD M(7)
+                STOR M(8)
+                STOR M(9)
+                LOAD M(9)
+                LOAD M(7)
+                LOAD -M(8)
+                LOAD MQ,M(7)
+                LOAD MQ,M(8)
+                JUMP M(skip)
+                HALT
+                HALT
+                HALT
+                LOAD M(7)
+        skip:   ADD M(8)
+                STOR M(10)
+        """).instructions
+        self.assertEqual(report(program), PeepholeReport(8, 5, 3))
+        self.assertSameRun(program, {'000000000111': 6})
+        engine = PeepholeIAS()
+        engine.appendInput('000000000111', 6)
+        engine.memory.setInstructionsMemory(list(program))
+        engine.fetch()
+        self.assertEqual(engine.getStoredValue('000000001010'), -6 + 6)
+        self.assertEqual(simplify((0b00000001, 1200), (0b00000001, 3), 1000), [(0b00000001, 1200), (0b00000001, 3)])
+
+
+class TestUnifiedMemory(unittest.TestCase) :
+    """
+    one address space for code and data: split memory programs still run, STOR M(X) can rewrite the program
+    """
+
+    # counts M(20) down from 2, word 3 adds M(23) to M(22) and is then overwritten with M(24) (subtract)
+    rewriting = [IAS_Benchmark.word(0b00000001, 20, 0b00000110, 21),
+                 IAS_Benchmark.word(0b00100001, 20, 0b00001111, 3),
+                 IAS_Benchmark.word(0b00000000, 0),
+                 IAS_Benchmark.word(0b00000001, 22, 0b00000101, 23),
+                 IAS_Benchmark.word(0b00100001, 22, 0b00000001, 24),
+                 IAS_Benchmark.word(0b00100001, 3, 0b00001101, 0)]
+
+    def engines(self, codeBase) :
+        return [IAS(UnifiedMemory(codeBase)), FastIAS(UnifiedMemory(codeBase, ints=True)),
+                BlockIAS(UnifiedMemory(codeBase, ints=True)), PeepholeIAS(UnifiedMemory(codeBase, ints=True))]
+
+
+    def test_splitPrograms(self) :
+        for program, inputs, outputs in TestFastIAS.programs :
+            reference = IAS()
+            for address, value in inputs.items() :
+                reference.appendInput(address, value)
+            reference.memory.setInstructionsMemory(list(program))
+            reference.fetch()
+            for engine in self.engines(1000) :
+                for address, value in inputs.items() :
+                    engine.appendInput(address, value)
+                engine.memory.setInstructionsMemory(list(program))
+                engine.fetch()
+                for address in outputs :
+                    self.assertEqual(engine.getStoredValue(address), reference.getStoredValue(address))
+                self.assertEqual(engine.getProgramCounter(), reference.getProgramCounter())
+                self.assertEqual(engine.memory.instructions_memory[0], parseWord(program[0]) if engine.memory.ints else program[0])
+                self.assertEqual(engine.getStoredValue('001111101000'), parseWord(program[0]))
+
+
+    def test_rewritingProgram(self) :
+        for engine in self.engines(0) :
+            engine.appendInput('000000010100', 2)
+            engine.appendInput('000000010101', 1)
+            engine.appendInput('000000010110', 100)
+            engine.appendInput('000000010111', 5)
+            engine.appendInput('000000011000', int(IAS_Benchmark.word(0b00000001, 22, 0b00000110, 23), 2))
+            engine.memory.setInstructionsMemory(list(self.rewriting))
+            self.assertEqual(engine.fetch().status, HALTED)
+            self.assertEqual(engine.getStoredValue('000000010110'), 100 + 5 - 5)
+            self.assertEqual(engine.getStoredValue('000000000011'), engine.getStoredValue('000000011000'))
+
+
+    def test_addressFields(self) :
+        memory = UnifiedMemory(ints=True)
+        memory.setInstructionsMemory([IAS_Benchmark.word(0b00000001, 0xABC, 0b00000110, 0x123)])
+        machine = FastIAS(memory)
+        machine.predecode(0)
+        self.assertEqual((memory.getAddressField(0, 0), memory.getAddressField(0, 1)), (0xABC, 0x123))
+        memory.setAddressField(0, 1, 0xFED)
+        memory.setAddressField(0, 0, 7)
+        self.assertEqual(memory.instructions_memory[0], parseWord(IAS_Benchmark.word(0b00000001, 7, 0b00000110, 0xFED)))
+        self.assertEqual(machine._decoded, {})
+        self.assertEqual(bytes(memory.word(0)), memory.instructions_memory[0].to_bytes(5, 'big'))
+        memory.reset()
+        self.assertEqual((len(memory.instructions_memory), memory.data_memory[0]), (0, 0))
+
+
+class TestInstantiation(unittest.TestCase) :
+    """
+    class level dispatch tables, reset(program) and the machine pool
+    """
+
+    def test_dispatchTables(self) :
+        class Counting(FastIAS) :
+            def add(self, address) :
+                FastIAS.add(self, address)
+                self.adds = getattr(self, 'adds', 0) + 1
+        self.assertIs(IAS.OPERATIONS['00000101'], IAS.add)
+        self.assertIs(IAS().handler('00000101').__func__, IAS.add)
+        self.assertIs(IAS().operations['00000101'].__func__, IAS.add)
+        self.assertIs(FastIAS().operations[0b00000101].__func__, FastIAS.add)
+        with self.assertRaises(AttributeError) :
+            IAS().operations = {}
+        self.assertFalse(hasattr(IAS(), '__dict__') or hasattr(FastIAS(), '__dict__'))
+        self.assertIs(FastIAS.OPERATIONS[0b00000101], FastIAS.add)
+        engine = Counting()
+        engine.appendInput('000000000011', 20)
+        engine.appendInput('000000000010', 63)
+        engine.memory.setInstructionsMemory(list(addRoutine))
+        engine.fetch()
+        self.assertEqual((engine.getStoredValue('000000000100'), engine.adds), (83, 1))
+        with self.assertRaises(ValueError) :
+            FastIAS().appendInput('000000000001', 1 << 39)
+
+
+    def test_resetProgram(self) :
+        for engine in (IAS(), FastIAS(), BlockIAS()) :
+            engine.memory.setInstructionsMemory(list(TestBoundedRun.spin))
+            engine.fetch(max_cycles=10)
+            engine.reset(addRoutine)
+            engine.appendInput('000000000011', 56)
+            engine.appendInput('000000000010', 35)
+            self.assertEqual(engine.fetch(), (HALTED, 2))
+            self.assertEqual(engine.getStoredValue('000000000100'), 91)
+
+
+    def test_pool(self) :
+        pool = MachinePool(IAS, limit=1)
+        with pool.checkout(addRoutine) as machine :
+            machine.appendInput('000000000011', 1)
+            machine.appendInput('000000000010', 2)
+            machine.fetch()
+            self.assertEqual(machine.getStoredValue('000000000100'), 3)
+        with pool.checkout() as again :
+            self.assertIs(again, machine)
+            self.assertEqual((again.getStoredValue('000000000100'), again.getProgramCounter()), (0, 0))
+            self.assertEqual(again.memory.instructions_memory, [])
+
+
+class TestStream(unittest.TestCase) :
+    """
+    streamed programs run like loaded ones with a bounded window, jumps past the first 4096 words included
+    """
+
+    def stream(self, filler, loop) :
+        """
+        AC counts up by 2 per filler word into M(5), then M(1) counts down to -1 in a loop starting at word loop,
+        after the HALT the stream goes on forever
+        """
+        word = IAS_Benchmark.word
+        yield word(0b00000001, 3, 0b00000001, 3)
+        for index in range(filler) :
+            yield word(0b00000101, 4, 0b00000101, 4)
+        yield word(0b00100001, 5, 0b00000001, 4)
+        for index in range(loop - filler - 2) :
+            yield word(0b00000001, 4, 0b00000001, 4)
+        yield word(0b00000001, 1, 0b00000110, 2)
+        yield word(0b00100001, 1, 0b00001111, loop % 4096)
+        yield word(0b00000000, 0)
+        yield from itertools.repeat(word(0b00000101, 4, 0b00000101, 4))
+
+
+    def test_longStream(self) :
+        for filler, loop in ((10, 20), (9000, 10000)) :
+            machine = StreamIAS()
+            for address, value in ((1, 5), (2, 1), (4, 1)) :
+                machine.appendInput(format(address, '012b'), value)
+            machine.feed(self.stream(filler, loop), window=128, lookahead=32)
+            self.assertEqual(machine.fetch().status, HALTED)
+            self.assertEqual(machine.getStoredValue('000000000101'), 2 * filler)
+            self.assertEqual(machine.getStoredValue('000000000001'), -1)
+            self.assertLessEqual(len(machine._decoded), 128)
+            self.assertLessEqual(len(machine.memory.instructions_memory), loop + 3 + 32)
+
+
+    def test_window(self) :
+        word = IAS_Benchmark.word
+        machine = StreamIAS()
+        machine.feed([word(0b00000001, 3, 0b00000001, 3)] * 200 + [word(0b00001101, 10)], window=64, lookahead=16)
+        with self.assertRaises(WindowError) :
+            machine.fetch()
+        with tempfile.TemporaryDirectory() as folder :
+            path = os.path.join(folder, 'program.txt')
+            with open(path, 'w') as handle :
+                handle.write("\n".join(addRoutine + ['']))
+            machine = StreamIAS()
+            machine.appendInput('000000000011', 20)
+            machine.appendInput('000000000010', 63)
+            machine.feed(path)
+            self.assertEqual(machine.fetch(), (HALTED, 2))
+            self.assertEqual(machine.getStoredValue('000000000100'), 83)
+
+
+class TestTiming(unittest.TestCase) :
+    """
+    cycle counts follow the cost tables and are the same on every engine
+    """
+
+    def timed(self, engine, program, inputs, model=None) :
+        machine = engine()
+        for address, value in inputs.items() :
+            machine.appendInput(address, value)
+        machine.memory.setInstructionsMemory(list(program))
+        counter = CycleCounter(model)
+        machine.fetch(timing=counter)
+        return counter.timing()
+
+
+    def test_costs(self) :
+        inputs = {'000000000011': 20, '000000000010': 63}
+        self.assertEqual(self.timed(FastIAS, addRoutine, inputs), Timing(15, 4, 4, 4, 3, 2, 4, 2))
+        self.assertEqual(self.timed(IAS, addRoutine, inputs, TimingModel(readLatency=5)), Timing(31, 12, 4, 4, 11, 2, 4, 2))
+        slow = self.timed(FastIAS, multiplicationRoutine, {'000000000011': 51, '000000000010': 3})
+        self.assertEqual(slow.execute, 39 + 3)
+        jumpRight = [IAS_Benchmark.word(0b00001110, 1, 0b00000001, 5), IAS_Benchmark.word(0b00000000, 0, 0b00000001, 5)]
+        self.assertEqual(self.timed(FastIAS, jumpRight, {}), Timing(9, 4, 2, 2, 1, 2, 2, 0))
+
+
+    def test_enginesAgree(self) :
+        for name in ('countdown', 'mulDiv', 'arrayWalk') :
+            program, inputs = IAS_Benchmark.WORKLOADS[name]()
+            inputs = {format(address, '012b'): value for address, value in inputs.items()}
+            engines = (IAS, FastIAS, BlockIAS, PeepholeIAS) if name == 'countdown' else (FastIAS, BlockIAS, PeepholeIAS)
+            timings = [self.timed(engine, program, inputs) for engine in engines]
+            self.assertEqual(len(set(timings)), 1)
+            self.assertEqual(timings[0].halves, IAS_Benchmark.countInstructions(program, {int(address, 2): value
+                                                                                          for address, value in inputs.items()}))
+        with self.assertRaises(ValueError) :
+            FastIAS().fetch(trace=TraceBuffer(), timing=CycleCounter())
+
+class TestServer(unittest.TestCase) :
+    """
+    batches sent through the client come back with the results fetch gives, on one reused connection
+    """
+
+    def test_batch(self) :
+        address, stop = startThread(Server(workers=0, chunk=4))
+        try :
+            with Client(address) as client :
+                jobs = [{'inputs': {3: value, '000000000010': 1}, 'outputs': [4, '000000000011']} for value in range(10)]
+                responses = client.runAll([addRoutine], jobs)
+                self.assertEqual([response['outputs'] for response in responses], [[value + 1, value] for value in range(10)])
+                connection = client.socket
+                responses = client.runAll([addRoutine, TestBoundedRun.spin],
+                                          [{'program': 1, 'max_cycles': 500}, {'inputs': {3: 1 << 40}}, {}])
+                self.assertIs(client.socket, connection)
+                self.assertEqual((responses[0]['status'], responses[0]['cycles']), (BUDGET, 500))
+                self.assertIn('error', responses[1])
+                self.assertEqual(responses[2]['status'], HALTED)
+                with self.assertRaises(ServerError) :
+                    client.runAll([addRoutine], [{'program': 2}])
+                self.assertEqual(client.runAll([addRoutine], [{'outputs': [4]}])[0]['outputs'], [0])
+        finally :
+            stop()
+
+
+    def test_maxCycles(self) :
+        address, stop = startThread(Server(workers=0, max_cycles=300))
+        try :
+            with Client(address) as client :
+                responses = client.runAll([TestBoundedRun.spin], [{}, {'max_cycles': 100}, {'max_cycles': 10 ** 9}])
+                self.assertEqual([(response['status'], response['cycles']) for response in responses],
+                                 [(BUDGET, 300), (BUDGET, 100), (BUDGET, 300)])
+        finally :
+            stop()
+
+
+    def test_workers(self) :
+        with tempfile.TemporaryDirectory() as directory :
+            address, stop = startThread(Server(workers=2, chunk=3), os.path.join(directory, 'ias.sock'))
+            try :
+                with Client(address) as client :
+                    jobs = [{'program': value % 2, 'inputs': {3: value, 2: 51}, 'outputs': [4, 5]} for value in range(10)]
+                    responses = client.runAll([addRoutine, multiplicationRoutine], jobs)
+                    for value, response in enumerate(responses) :
+                        machine = FastIAS()
+                        machine.appendInput('000000000011', value)
+                        machine.appendInput('000000000010', 51)
+                        machine.memory.setInstructionsMemory(list((addRoutine, multiplicationRoutine)[value % 2]))
+                        machine.fetch()
+                        self.assertEqual(response['outputs'], [machine.getStoredValue('000000000100'),
+                                                              machine.getStoredValue('000000000101')])
+            finally :
+                stop()
+
+
+class TestMulticore(unittest.TestCase) :
+    """
+    cores share the data memory, round robin runs repeat exactly and the parallel mode ends in the same memory
+    """
+
+    def cores(self, quantum=7) :
+        word = IAS_Benchmark.word
+        program = IAS_Benchmark.countdownLoop(10) + [word(0b00000001, 11, 0b00000110, 2),
+                                                     word(0b00100001, 11, 0b00001111, 3)]
+        machine = Multicore([program, program, IAS_Benchmark.countdownLoop(12)], entries=[0, 3, 0], quantum=quantum)
+        machine.appendInput('000000000010', 1)
+        for address, value in ((10, 300), (11, 500), (12, 40)) :
+            machine.appendInput(format(address, '012b'), value)
+        return machine
+
+
+    def test_roundRobin(self) :
+        first = self.cores()
+        result = first.run()
+        self.assertEqual(result.statuses, [HALTED] * 3)
+        self.assertEqual([first.getStoredValue(format(address, '012b')) for address in (10, 11, 12)], [-1, -1, -1])
+        second = self.cores()
+        self.assertEqual(second.run().cycles, result.cycles)
+        self.assertEqual(list(second.data_memory), list(first.data_memory))
+        budget = self.cores().run(max_cycles=100)
+        self.assertEqual(budget.statuses, [BUDGET, BUDGET, HALTED])
+
+
+    def test_parallel(self) :
+        interleaved = self.cores()
+        expected = interleaved.run()
+        parallel = self.cores()
+        result = parallel.runParallel()
+        self.assertEqual(result.statuses, [HALTED] * 3)
+        self.assertEqual(list(parallel.data_memory), list(interleaved.data_memory))
+        self.assertEqual(result.cycles, expected.cycles)
+
+
+class TestReplay(unittest.TestCase) :
+    """
+    seek has to give the state a fresh run reaches after the same number of cycles
+    """
+
+    def arraySumMachine(self, engine) :
+        machine = engine()
+        machine.appendInput('000000000010', 1)
+        machine.appendInput('000000000011', 10)
+        machine.appendInput('000000000101', 4)
+        for offset, value in enumerate([3, 5, 7, 11, 13]) :
+            machine.appendInput(format(10 + offset, '012b'), value)
+        machine.memory.setInstructionsMemory(list(arraySum))
+        return machine
+
+
+    def assertSameState(self, machine, expected) :
+        self.assertEqual(list(machine.memory.data_memory), list(expected.memory.data_memory))
+        self.assertEqual(list(machine.memory.instructions_memory), list(expected.memory.instructions_memory))
+        self.assertEqual((machine._PC, machine._AC, machine._MQ, machine._IBR is None),
+                         (expected._PC, expected._AC, expected._MQ, expected._IBR is None))
+
+
+    def test_seek(self) :
+        for engine in (FastIAS, BlockIAS, PeepholeIAS) :
+            machine = self.arraySumMachine(engine)
+            recorder = Recorder(machine, interval=4)
+            result = recorder.record()
+            self.assertEqual(machine.getStoredValue('000000000100'), 39)
+            for cycle in (result.cycles, 0, 7, 3, 12, result.cycles - 1) :
+                recorder.seek(cycle)
+                expected = self.arraySumMachine(FastIAS)
+                expected.fetch(max_cycles=cycle)
+                self.assertSameState(machine, expected)
+            self.assertEqual(recorder.step_back(), result.cycles - 2)
+            with self.assertRaises(ValueError) :
+                recorder.seek(result.cycles + 1)
+            recorder.seek(5)
+            machine.fetch()
+            self.assertEqual(machine.getStoredValue('000000000100'), 39)
+
+
+    def test_seekRightHalfJumps(self) :
+        """
+        a loop closed by a right half jumping to a right half, recorded on every integer engine
+        """
+        program = assemble("""
+                .data counter 10
+                .data one 1
+                LOAD M(one)
+        back:   LOAD M(counter)
+                SUB M(one)
+                STOR M(counter)
+                ADD M(one)
+                JUMP+ M(back)
+                HALT
+                """)
+
+        def loaded(engine) :
+            machine = engine()
+            for address, value in program.data.items() :
+                machine.appendInput(format(address, '012b'), value)
+            machine.memory.setInstructionsMemory(list(program.instructions))
+            return machine
+
+        for engine in (FastIAS, BlockIAS, PeepholeIAS) :
+            machine = loaded(engine)
+            recorder = Recorder(machine, interval=5)
+            end = recorder.record().cycles
+            for cycle in range(end, -1, -1) :
+                recorder.seek(cycle)
+                expected = loaded(FastIAS)
+                expected.fetch(max_cycles=cycle)
+                self.assertSameState(machine, expected)
+        with self.assertRaises(TypeError) :
+            Recorder(IAS())
+
+
+    def test_budget(self) :
+        machine = FastIAS()
+        machine.appendInput('000000000001', 5000)
+        machine.appendInput('000000000010', 1)
+        machine.memory.setInstructionsMemory(IAS_Benchmark.countdownLoop())
+        recorder = Recorder(machine, interval=16, budget=3000)
+        self.assertEqual(recorder.record(max_cycles=6000).status, BUDGET)
+        self.assertEqual(recorder.record().cycles, 4003)
+        self.assertLessEqual(recorder.words, 3000)
+        self.assertGreater(recorder.interval, 16)
+        for cycle in (9999, 4000, 10003, 0, 1) :
+            recorder.seek(cycle)
+            self.assertEqual(machine.getStoredValue('000000000001'), 5000 - cycle // 2 if cycle < 10002 else -1)
+
+
 
 
 
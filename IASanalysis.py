@@ -0,0 +1,341 @@
+# static control flow and data flow analysis of ias programs.
+
+from collections import namedtuple
+import sys
+from IASfast import parseWord
+
+
+
+# opcodes by what they do, see IAS.OPERATIONS
+READS = frozenset([0b00000001, 0b00001001, 0b00000010, 0b00000011, 0b00000100, 0b00000101, 0b00000111,
+                   0b00000110, 0b00001000, 0b00001011, 0b00001100])  #read M(X)
+WRITES = frozenset([0b00100001])                                #STOR M(X)
+JUMPS = {0b00001101: (0, False),                                #JUMP M(X,0:19)   -> (half of the target, conditional)
+         0b00001110: (1, False),                                #JUMP M(X,20:39)
+         0b00001111: (0, True),                                 #JUMP+ M(X,0:19)
+         0b00010000: (1, True)}                                 #JUMP+ M(X,20:39)
+MODIFIES = {0b00010010: 0, 0b00010011: 1}                       #STOR M(X,8:19) / STOR M(X,28:39) -> half they rewrite
+HALT = 0b00000000
+OTHERS = frozenset([0b00001010, 0b00010100, 0b00010101])       #LOAD MQ, LSH, RSH
+VALID = READS | WRITES | OTHERS | frozenset(JUMPS) | frozenset(MODIFIES) | frozenset([HALT])
+
+Block = namedtuple('Block', ['start', 'end', 'successors', 'reads', 'writes'])
+Block.__doc__ = """
+basic block of the halves start..end-1 (half index = 2 * word address + 0 for left, 1 for right),
+start halves of its successor blocks and the data addresses it reads and writes
+"""
+
+Loop = namedtuple('Loop', ['header', 'blocks', 'writes', 'invariantLoads'])
+Loop.__doc__ = """
+loop (a strongly connected group of blocks): start half of its header block, start halves of its blocks,
+data addresses written in it and the halves reading a word nothing in the loop writes (the same value on every pass)
+"""
+
+Analysis = namedtuple('Analysis', ['opcodes', 'operands', 'reachable', 'deadHalves', 'blocks', 'loops',
+                                   'reads', 'writes', 'inputs', 'modifiedWords', 'exact'])
+Analysis.__doc__ = """
+result of analyze: opcode and operand per half, reachable flag per half, (word, 'L'/'R') of the halves that
+can never run, blocks by start half, loops, every data address read / written by reachable code, inputs
+(the addresses that can be read before the program writes them, the words the result depends on), the
+words STOR M(X,8:19) / STOR M(X,28:39) rewrite and exact, False when a rewritten half made the analysis
+fall back to conservative guesses (a rewritten jump may go to any half of its side, inputs is then None
+when a rewritten half reads memory).
+"""
+
+
+
+def position(half) :
+    """
+    (word address, 'L' or 'R') of a half index, the form IASprofile uses
+    """
+    return half >> 1, 'LR'[half & 1]
+
+
+def modifiedWords(instructions, codeBase=None) :
+    """
+    addresses of the words whose address fields are rewritten by STOR M(X,8:19) / STOR M(X,28:39),
+    a single pass over the program without building the graph. with codeBase (see Memory.codeBase)
+    the words a STOR M(X) overwrites are included as well.
+    """
+    modified = set()
+    for word in instructions :
+        word = parseWord(word)
+        for half in ((word >> 20) & 0xFFFFF, word & 0xFFFFF) :
+            if half >> 12 in MODIFIES :
+                modified.add(half & 0xFFF)
+            elif codeBase is not None and half >> 12 in WRITES and 0 <= (half & 0xFFF) - codeBase < len(instructions) :
+                modified.add((half & 0xFFF) - codeBase)
+    return modified
+
+
+def analyze(instructions) :
+    """
+    builds the control flow graph of instructions (strings or ints) from the jumps and runs the data
+    flow passes over it. the graph passes are linear in the number of halves, the must-write pass
+    repeats over the blocks until nothing changes, a few rounds for ordinary programs.
+    """
+    words = [parseWord(word) for word in instructions]
+    count = 2 * len(words)
+    opcodes = [0] * count
+    operands = [0] * count
+    for address, word in enumerate(words) :
+        opcodes[2 * address] = (word >> 32) & 0xFF
+        operands[2 * address] = (word >> 20) & 0xFFF
+        opcodes[2 * address + 1] = (word >> 12) & 0xFF
+        operands[2 * address + 1] = word & 0xFFF
+
+    rewritten = rewrittenHalves(opcodes, operands, count)
+    exact = not any(opcodes[half] in JUMPS or opcodes[half] in READS or opcodes[half] in WRITES for half in rewritten)
+
+    successors = [successorsOf(half, opcodes, operands, count, half in rewritten) for half in range(count)]
+    reachable = reachableHalves(successors, count)
+    blocks = buildBlocks(opcodes, operands, successors, reachable, rewritten, count)
+    loops = findLoops(blocks, opcodes, operands, rewritten)
+
+    reads = set()
+    writes = set()
+    for block in blocks.values() :
+        reads |= block.reads
+        writes |= block.writes
+    unknownReads = any(reachable[half] and opcodes[half] in READS for half in rewritten)
+    inputs = None if unknownReads else exposedReads(blocks, opcodes, operands, rewritten)
+    return Analysis(opcodes, operands, reachable, [position(half) for half in range(count) if not reachable[half]],
+                    blocks, loops, reads, writes, inputs, {half >> 1 for half in rewritten}, exact)
+
+
+def rewrittenHalves(opcodes, operands, count) :
+    """
+    halves whose operand is rewritten at run time, the operand read from the program can not be trusted.
+    a STOR M(X,8:19) / STOR M(X,28:39) that is rewritten itself can rewrite every half of its side,
+    repeated until no modifier is added.
+    """
+    modifiers = [half for half in range(count) if opcodes[half] in MODIFIES]
+    rewritten = set()
+    wholeSides = set()                                          #sides every half of which is rewritten already
+    changed = True
+    while changed :
+        changed = False
+        for half in modifiers :
+            side = MODIFIES[opcodes[half]]
+            if half in rewritten :
+                if side in wholeSides :
+                    continue
+                wholeSides.add(side)
+                targets = range(side, count, 2)
+            else :
+                targets = [2 * operands[half] + side] if 2 * operands[half] < count else []
+            for target in targets :
+                if target not in rewritten :
+                    rewritten.add(target)
+                    changed = True
+    return rewritten
+
+
+def successorsOf(half, opcodes, operands, count, rewritten) :
+    """
+    halves that can run after half, a jump past the end of the program ends it like running off the end
+    """
+    opcode = opcodes[half]
+    if opcode in JUMPS :
+        side, conditional = JUMPS[opcode]
+        if rewritten :
+            targets = list(range(side, count, 2))
+        else :
+            target = 2 * operands[half] + side
+            targets = [target] if target < count else []
+        if conditional and half + 1 < count :
+            targets.append(half + 1)
+        return targets
+    if opcode == HALT or opcode not in VALID or half + 1 >= count :
+        return []
+    return [half + 1]
+
+
+def reachableHalves(successors, count) :
+    """
+    bytearray with a 1 for every half reachable from the left half of word 0
+    """
+    reachable = bytearray(count)
+    if not count :
+        return reachable
+    reachable[0] = 1
+    stack = [0]
+    while stack :
+        for target in successors[stack.pop()] :
+            if not reachable[target] :
+                reachable[target] = 1
+                stack.append(target)
+    return reachable
+
+
+def buildBlocks(opcodes, operands, successors, reachable, rewritten, count) :
+    """
+    splits the reachable halves into basic blocks, a block ends at a jump, a halt, an invalid opcode,
+    before a jump target and before a rewritten half (whose operand is only known at run time)
+    """
+    leaders = set([0]) if count else set()
+    for half in range(count) :
+        if not reachable[half] :
+            continue
+        targets = successors[half]
+        if targets != [half + 1] :
+            leaders.update(targets)
+            leaders.add(half + 1)
+        if half in rewritten :
+            leaders.update((half, half + 1))
+    blocks = {}
+    for start in sorted(leader for leader in leaders if leader < count and reachable[leader]) :
+        reads = set()
+        writes = set()
+        half = start
+        while True :
+            opcode = opcodes[half]
+            if half not in rewritten :
+                if opcode in READS :
+                    reads.add(operands[half])
+                elif opcode in WRITES :
+                    writes.add(operands[half])
+            if successors[half] != [half + 1] or half + 1 in leaders :
+                break
+            half += 1
+        blocks[start] = Block(start, half + 1, successors[half], reads, writes)
+    return blocks
+
+
+def exposedReads(blocks, opcodes, operands, rewritten) :
+    """
+    addresses that can be read before they are written: a forward must-write pass gives the words every
+    path into a block has written, a read of any other word before the block writes it is an input
+    """
+    predecessors = {start: [] for start in blocks}
+    for block in blocks.values() :
+        for target in block.successors :
+            predecessors[target].append(block.start)
+    written = {start: None for start in blocks}                #words written on every path out of a block, None is all
+    order = sorted(blocks)
+    changed = True
+    while changed :
+        changed = False
+        for start in order :
+            incoming = set() if start == 0 else intersect([written[source] for source in predecessors[start]])
+            outgoing = incoming | blocks[start].writes if incoming is not None else None
+            if outgoing != written[start] :
+                written[start] = outgoing
+                changed = True
+    inputs = set()
+    for start in order :
+        known = set() if start == 0 else intersect([written[source] for source in predecessors[start]]) or set()
+        for half in range(start, blocks[start].end) :
+            if half in rewritten :
+                continue
+            if opcodes[half] in READS and operands[half] not in known :
+                inputs.add(operands[half])
+            elif opcodes[half] in WRITES :
+                known = known | {operands[half]}
+    return inputs
+
+
+def intersect(sets) :
+    """
+    intersection of sets where None stands for every address, None when all of them are None
+    """
+    result = None
+    for words in sets :
+        if words is not None :
+            result = set(words) if result is None else result & words
+    return result
+
+
+def findLoops(blocks, opcodes, operands, rewritten) :
+    """
+    loops as the strongly connected components of the block graph (Tarjan, iterative), linear in the blocks.
+    a loop nested in another one is part of the outer component, so invariant loads are the ones invariant
+    over the whole outer loop. the header is the first block of a component entered from outside it.
+    """
+    index = {}
+    lowlink = {}
+    stack = []
+    onStack = set()
+    components = []
+    for root in sorted(blocks) :
+        if root in index :
+            continue
+        walk = [(root, iter(blocks[root].successors))]
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        onStack.add(root)
+        while walk :
+            start, pending = walk[-1]
+            target = next(pending, None)
+            if target is not None :
+                if target not in index :
+                    index[target] = lowlink[target] = len(index)
+                    stack.append(target)
+                    onStack.add(target)
+                    walk.append((target, iter(blocks[target].successors)))
+                elif target in onStack :
+                    lowlink[start] = min(lowlink[start], index[target])
+                continue
+            walk.pop()
+            if walk :
+                lowlink[walk[-1][0]] = min(lowlink[walk[-1][0]], lowlink[start])
+            if lowlink[start] == index[start] :
+                component = []
+                while True :
+                    node = stack.pop()
+                    onStack.discard(node)
+                    component.append(node)
+                    if node == start :
+                        break
+                if len(component) > 1 or start in blocks[start].successors :
+                    components.append(frozenset(component))
+
+    outside = {}                                                #block -> blocks jumping or falling into it
+    for block in blocks.values() :
+        for target in block.successors :
+            outside.setdefault(target, []).append(block.start)
+    loops = []
+    for body in sorted(components, key=min) :
+        entries = [start for start in body if start == 0 or any(source not in body for source in outside.get(start, ()))]
+        writes = set()
+        for start in body :
+            writes |= blocks[start].writes
+        halves = [half for start in sorted(body) for half in range(start, blocks[start].end)]
+        if any(half in rewritten and opcodes[half] in WRITES for half in halves) :
+            invariant = []                                      #a STOR with a rewritten address can write any word
+        else :
+            invariant = [position(half) for half in halves
+                         if opcodes[half] in READS and half not in rewritten and operands[half] not in writes]
+        loops.append(Loop(min(entries or body), body, writes, invariant))
+    return loops
+
+
+
+
+
+def summary(analysis) :
+    """
+    readable report of an Analysis
+    """
+    lines = ["{} blocks, {} loops, {} dead halves{}".format(len(analysis.blocks), len(analysis.loops),
+             len(analysis.deadHalves), "" if analysis.exact else " (conservative, the program rewrites jumps or operands)")]
+    lines.append("reads   {}".format(sorted(analysis.reads)))
+    lines.append("writes  {}".format(sorted(analysis.writes)))
+    lines.append("inputs  {}".format("unknown" if analysis.inputs is None else sorted(analysis.inputs)))
+    if analysis.modifiedWords :
+        lines.append("rewritten words {}".format(sorted(analysis.modifiedWords)))
+    for loop in analysis.loops :
+        lines.append("loop at {}{}: {} blocks, invariant loads {}".format(*position(loop.header), len(loop.blocks),
+                     ["%d%s" % load for load in loop.invariantLoads]))
+    if analysis.deadHalves :
+        lines.append("dead    {}".format(["%d%s" % half for half in analysis.deadHalves]))
+    return "\n".join(lines)
+
+
+
+
+
+if __name__ == "__main__":
+    # python IASanalysis.py program.txt analyses a text file with one 40 bit instruction per line
+    with open(sys.argv[1]) as handle :
+        print(summary(analyze([line.strip() for line in handle if line.strip()])))
@@ -0,0 +1,189 @@
+"""
+Two pass assembler for IAS programs.
+
+Source format, one instruction per line, two instructions are packed into every 40 bit word:
+
+    ; comments start with ; or #
+    .data  a 15                 data symbol at the next free data address, with its initial value
+    .data  v 1, 2, 3            consecutive data words, v is the address of the first one
+    .equ   limit 100            constant symbol
+    loop:  LOAD M(a)            labels name the half word they are on
+           SUB M(limit)
+           JUMP+ M(loop,0:19)   JUMP M(label) / JUMP+ M(label) pick the half of the label
+           .align               start the next instruction on a left half (a HALT fills the gap)
+           HALT
+
+Mnemonics are mapped to the opcodes of IAS.OPERATIONS through the handler they name.
+"""
+
+
+
+from collections import namedtuple
+import re
+import sys
+from IASopcodes import IAS
+
+
+
+# mnemonic with X for the address -> name of the IAS handler implementing it
+MNEMONICS = {
+    'LOAD MQ' : 'loadToAC',
+    'LOAD MQ,M(X)' : 'loadToMQ',
+    'STOR M(X)' : 'store',
+    'LOAD M(X)' : 'load',
+    'LOAD -M(X)' : 'loadNegative',
+    'LOAD |M(X)|' : 'loadAbsolute',
+    'LOAD -|M(X)|' : 'loadNegativeAbsolute',
+    'JUMP M(X,0:19)' : 'jumpLeftInstruction',
+    'JUMP M(X,20:39)' : 'jumpRightInstruction',
+    'JUMP+ M(X,0:19)' : 'conditionalJumpLeft',
+    'JUMP+ M(X,20:39)' : 'conditionalJumpRight',
+    'ADD M(X)' : 'add',
+    'ADD |M(X)|' : 'addAbsolute',
+    'SUB M(X)' : 'sub',
+    'SUB |M(X)|' : 'subAbsolute',
+    'MUL M(X)' : 'multiply',
+    'DIV M(X)' : 'divide',
+    'LSH' : 'leftShift',
+    'RSH' : 'rightShift',
+    'STOR M(X,8:19)' : 'storeLeft',
+    'STOR M(X,28:39)' : 'storeRight',
+    'HALT' : 'halt',
+}
+
+HANDLER_OPCODES = {handler.__name__: int(opcode, 2) for opcode, handler in IAS.OPERATIONS.items()}
+OPCODES = {mnemonic: HANDLER_OPCODES[handler] for mnemonic, handler in MNEMONICS.items()}
+# JUMP M(label) and JUMP+ M(label) without a half, resolved with the half of the label
+JUMPS = {'JUMP M(X)': ('JUMP M(X,0:19)', 'JUMP M(X,20:39)'), 'JUMP+ M(X)': ('JUMP+ M(X,0:19)', 'JUMP+ M(X,20:39)')}
+
+OPERAND = re.compile(r'M\(([^,)|]+)')
+LABEL = re.compile(r'^([A-Za-z_][\w.]*)\s*:\s*')
+NUMBER = re.compile(r'^-?(0x[0-9a-fA-F]+|0b[01]+|\d+)$')
+
+Program = namedtuple('Program', ['instructions', 'data', 'symbols'])
+Program.__doc__ = """
+assembled words ('0'/'1' strings or ints), initial data {address: value} and the symbol table
+"""
+
+
+
+
+def parseNumber(text, number) :
+    """
+    decimal, 0x hexadecimal or 0b binary literal on line number. decimals are base 10 even with leading
+    zeros, so M(010) is word 10.
+    """
+    literal = NUMBER.match(text)
+    if not literal :
+        raise ValueError("line {}: {} is not a number".format(number, text))
+    digits = literal.group(1)
+    value = int(digits, 0) if digits[:2] in ('0x', '0b') else int(digits, 10)
+    return -value if text.startswith('-') else value
+
+
+def assemble(source, encoding='bits', dataStart=1) :
+    """
+    assembles source (a string or a list of lines) into a Program.
+    encoding 'bits' gives 40 character strings like the lists in IAS_Test_Suite.py, 'int' gives integer words.
+    data symbols are given addresses from dataStart on.
+    """
+    lines = source.splitlines() if isinstance(source, str) else source
+    symbols = {}
+    halves = []                                                 #(key, operand text, line number) per half word
+    data = {}
+    dataAddress = dataStart
+
+    # first pass, lay out the half words and collect labels and data symbols
+    for number, line in enumerate(lines, 1) :
+        line = line.split(';', 1)[0].split('#', 1)[0].strip()
+        label = LABEL.match(line)
+        while label :
+            defineSymbol(symbols, label.group(1), len(halves), number)
+            line = line[label.end():]
+            label = LABEL.match(line)
+        if not line :
+            continue
+        if line[0] == '.' :
+            directive, _, arguments = line.partition(' ')
+            if directive == '.align' :
+                if len(halves) % 2 :
+                    halves.append(('HALT', None, number))
+            elif directive == '.data' :
+                name, _, values = arguments.strip().partition(' ')
+                defineSymbol(symbols, name, ('data', dataAddress), number)
+                for value in values.split(',') if values.strip() else ['0'] :
+                    data[dataAddress] = parseNumber(value.strip(), number)
+                    dataAddress += 1
+            elif directive == '.equ' :
+                name, _, value = arguments.strip().partition(' ')
+                defineSymbol(symbols, name, ('data', parseNumber(value.strip(), number)), number)
+            else :
+                raise ValueError("line {}: unknown directive {}".format(number, directive))
+            continue
+        mnemonic, _, rest = line.partition(' ')
+        rest = rest.replace(' ', '')
+        operand = OPERAND.search(rest)
+        if operand :
+            rest = rest[:operand.start(1)] + 'X' + rest[operand.end(1):]
+            operand = operand.group(1)
+        key = (mnemonic.upper() + ' ' + rest.upper()).strip()
+        if key not in OPCODES and key not in JUMPS :
+            raise ValueError("line {}: unknown instruction {}".format(number, line))
+        halves.append((key, operand, number))
+
+    if len(halves) % 2 :
+        halves.append(('HALT', None, len(lines)))
+
+    # second pass, resolve the operands and pack two halves into every word
+    codes = []
+    for key, operand, number in halves :
+        address = 0
+        if operand is not None :
+            address = resolve(symbols, operand, number)
+            if key in JUMPS :
+                target = symbols.get(operand)
+                if not isinstance(target, int) :
+                    raise ValueError("line {}: {} needs a label, use M(X,0:19) or M(X,20:39)".format(number, key))
+                key = JUMPS[key][target % 2]
+            if not 0 <= address <= 0xFFF :
+                raise ValueError("line {}: address {} out of range".format(number, address))
+        codes.append((OPCODES[key] << 12) | address)
+
+    words = [(codes[index] << 20) | codes[index + 1] for index in range(0, len(codes), 2)]
+    if encoding == 'bits' :
+        words = [format(word, '040b') for word in words]
+    elif encoding != 'int' :
+        raise ValueError("encoding has to be 'bits' or 'int'")
+    table = {name: value[1] if isinstance(value, tuple) else value // 2 for name, value in symbols.items()}
+    return Program(words, data, table)
+
+
+def defineSymbol(symbols, name, value, number) :
+    """
+    labels are stored as their half word index, data symbols and constants as ('data', address)
+    """
+    if name in symbols :
+        raise ValueError("line {}: {} is defined twice".format(number, name))
+    symbols[name] = value
+
+
+def resolve(symbols, operand, number) :
+    """
+    address of an operand: a number, a label (its word) or a data symbol
+    """
+    if NUMBER.match(operand) :
+        return parseNumber(operand, number)
+    if operand not in symbols :
+        raise ValueError("line {}: undefined symbol {}".format(number, operand))
+    value = symbols[operand]
+    return value[1] if isinstance(value, tuple) else value // 2
+
+
+
+
+
+if __name__ == "__main__":
+    # python IASassembler.py program.ias prints the assembled words, one per line
+    with open(sys.argv[1]) as handle :
+        for word in assemble(handle.read()).instructions :
+            print(word)
@@ -0,0 +1,254 @@
+# batched execution of one ias program over many data memories with numpy lanes.
+
+from collections import namedtuple
+import numpy as np
+from IASfast import parseWord, WORD_MASK, SIGN_BIT, ADDRESS_MASK, HALF_MASK
+
+
+
+BatchResult = namedtuple('BatchResult', ['data', 'AC', 'MQ', 'PC', 'halted', 'failed'])
+BatchResult.__doc__ = """
+final data memories (lanes x words) and AC, MQ, PC per lane, halted is False for lanes stopped by maxSteps
+or by an error, failed is True for lanes stopped where FastIAS would raise (division by zero, invalid opcode)
+"""
+
+
+LOW_MASK = (1 << 20) - 1                                        #lower 20 bits, used to split words for MUL
+
+
+def wrap(values) :
+    """
+    wraps int64 values to 40 bit two's complement, same as IASfast.toSigned
+    """
+    return ((values + SIGN_BIT) & WORD_MASK) - SIGN_BIT
+
+
+def multiplyWords(x, y) :
+    """
+    MUL for int64 vectors, same split as FastIAS.multiply: the low 40 bits of the product go to AC and
+    product >> 41 to MQ. The 80 bit product does not fit an int64 so it is built from 20 bit pieces.
+    """
+    negative = (x < 0) ^ (y < 0)
+    x = np.abs(x)
+    y = np.abs(y)
+    x1, x0 = x >> 20, x & LOW_MASK
+    y1, y0 = y >> 20, y & LOW_MASK
+    middle = x1 * y0 + x0 * y1
+    low = x0 * y0 + ((middle & LOW_MASK) << 20)
+    high = x1 * y1 + (middle >> 20) + (low >> 40)
+    low &= WORD_MASK
+    # two's complement of the 80 bit magnitude, high keeps the sign
+    high = np.where(negative, -high - (low != 0), high)
+    low = np.where(negative, (-low) & WORD_MASK, low)
+    return wrap(low), high >> 1
+
+
+
+
+class BatchIAS :
+    '''
+    Runs one instructions_memory over many initial data memories at once.
+    Every lane has its own PC, IBR, AC, MQ and data memory, each step executes one half instruction in every
+    running lane, grouped by opcode so each opcode is one vectorised numpy operation.
+    Lanes that branch differently simply end up at different PCs. Arithmetic wraps like FastIAS.
+    A lane that divides by zero or reaches an invalid opcode stops there and is marked failed, the other
+    lanes carry on as if every lane ran on a machine of its own.
+    '''
+    def __init__(self,instructions,dataMemories) :
+        '''
+        instructions is a list of 40 bit instruction strings (or ints), dataMemories a 2-D array lanes x words.
+        '''
+        words = np.array([parseWord(word) for word in instructions], dtype=np.int64)
+        self.data = np.array(dataMemories, dtype=np.int64)
+        if self.data.ndim != 2 :
+            raise ValueError("dataMemories has to be a 2-D array of lanes x words")
+        lanes = self.data.shape[0]
+        opcodes = set((words >> 32).tolist()) | set(((words >> 12) & 0xFF).tolist())
+        if opcodes & {0b00010010, 0b00010011} :
+            self.code = np.tile(words, (lanes, 1))                  #self-modifying, every lane needs its own copy
+        else :
+            self.code = np.broadcast_to(words, (lanes, len(words)))
+        self.length = len(words)
+        self.PC = np.zeros(lanes, dtype=np.int64)
+        self.AC = np.zeros(lanes, dtype=np.int64)
+        self.MQ = np.zeros(lanes, dtype=np.int64)
+        self.IBR = np.full(lanes, -1, dtype=np.int64)               #pending right half, -1 when empty
+        self.running = np.ones(lanes, dtype=bool)
+        self.failed = np.zeros(lanes, dtype=bool)
+
+        self.operations = {
+            0b00000001: self.load,
+            0b00001010: self.loadToAC,
+            0b00001001: self.loadToMQ,
+            0b00000010: self.loadNegative,
+            0b00000011: self.loadAbsolute,
+            0b00100001: self.store,
+            0b00000100: self.loadNegativeAbsolute,
+            0b00000101: self.add,
+            0b00000111: self.addAbsolute,
+            0b00000110: self.sub,
+            0b00001000: self.subAbsolute,
+            0b00001011: self.multiply,
+            0b00001100: self.divide,
+            0b00001101: self.jumpLeftInstruction,
+            0b00001110: self.jumpRightInstruction,
+            0b00001111: self.conditionalJumpLeft,
+            0b00010000: self.conditionalJumpRight,
+            0b00010100: self.leftShift,
+            0b00010101: self.rightShift,
+            0b00010010: self.storeLeft,
+            0b00010011: self.storeRight,
+            0b00000000: self.halt,
+        }
+
+
+    def step(self) :
+        """
+        executes one half instruction in every running lane, returns False once all lanes have stopped
+        """
+        lanes = np.flatnonzero(self.running)
+        fetching = lanes[self.IBR[lanes] < 0]
+        finished = fetching[self.PC[fetching] >= self.length]
+        self.running[finished] = False
+        fetching = fetching[self.PC[fetching] < self.length]
+        lanes = np.flatnonzero(self.running)
+        if len(lanes) == 0 :
+            return False
+
+        # lanes without a pending right half fetch the word at PC and execute its left half
+        halves = np.empty(len(self.PC), dtype=np.int64)
+        words = self.code[fetching, self.PC[fetching]]
+        halves[fetching] = words >> 20
+        pending = lanes[self.IBR[lanes] >= 0]
+        halves[pending] = self.IBR[pending]
+        self.IBR[pending] = -1
+        self.IBR[fetching] = words & HALF_MASK
+        self.PC[fetching] += 1
+
+        halves = halves[lanes]
+        opcodes = halves >> 12
+        addresses = halves & ADDRESS_MASK
+        for opcode in np.unique(opcodes).tolist() :
+            selected = opcodes == opcode
+            if opcode not in self.operations :
+                self.fail(lanes[selected])
+                continue
+            self.operations[opcode](lanes[selected], addresses[selected])
+        return True
+
+
+    def fail(self,lanes) :
+        """
+        stops lanes where a machine of their own would raise, their registers stay as they were before
+        """
+        self.running[lanes] = False
+        self.failed[lanes] = True
+
+
+    def run(self,maxSteps=None) :
+        """
+        steps until every lane has halted or maxSteps half instructions were executed
+        """
+        steps = 0
+        while (maxSteps is None or steps < maxSteps) and self.step() :
+            steps += 1
+        return BatchResult(self.data, self.AC, self.MQ, self.PC, ~self.running & ~self.failed, self.failed)
+
+
+    def load(self,lanes,addresses) :
+        self.AC[lanes] = self.data[lanes, addresses]
+
+    def loadToAC(self,lanes,addresses) :
+        self.AC[lanes] = self.MQ[lanes]
+
+    def loadToMQ(self,lanes,addresses) :
+        self.MQ[lanes] = self.data[lanes, addresses]
+
+    def loadNegative(self,lanes,addresses) :
+        self.AC[lanes] = wrap(-self.data[lanes, addresses])
+
+    def loadAbsolute(self,lanes,addresses) :
+        self.AC[lanes] = wrap(np.abs(self.data[lanes, addresses]))
+
+    def loadNegativeAbsolute(self,lanes,addresses) :
+        self.AC[lanes] = -np.abs(self.data[lanes, addresses])
+
+    def store(self,lanes,addresses) :
+        self.data[lanes, addresses] = self.AC[lanes]
+
+    def add(self,lanes,addresses) :
+        self.AC[lanes] = wrap(self.AC[lanes] + self.data[lanes, addresses])
+
+    def addAbsolute(self,lanes,addresses) :
+        self.AC[lanes] = wrap(self.AC[lanes] + np.abs(self.data[lanes, addresses]))
+
+    def sub(self,lanes,addresses) :
+        self.AC[lanes] = wrap(self.AC[lanes] - self.data[lanes, addresses])
+
+    def subAbsolute(self,lanes,addresses) :
+        self.AC[lanes] = wrap(self.AC[lanes] - np.abs(self.data[lanes, addresses]))
+
+    def multiply(self,lanes,addresses) :
+        self.AC[lanes], self.MQ[lanes] = multiplyWords(self.MQ[lanes], self.data[lanes, addresses])
+
+    def divide(self,lanes,addresses) :
+        divisor = self.data[lanes, addresses]
+        zero = divisor == 0
+        if zero.any() :
+            self.fail(lanes[zero])
+            lanes, divisor = lanes[~zero], divisor[~zero]
+        quotient = wrap(self.AC[lanes] // divisor)
+        self.AC[lanes] = wrap(self.AC[lanes] % divisor)
+        self.MQ[lanes] = quotient
+
+    def jumpLeftInstruction(self,lanes,addresses) :
+        self.IBR[lanes] = -1
+        self.PC[lanes] = addresses
+
+    def jumpRightInstruction(self,lanes,addresses) :
+        self.IBR[lanes] = self.code[lanes, addresses] & HALF_MASK
+        self.PC[lanes] = addresses + 1
+
+    def conditionalJumpLeft(self,lanes,addresses) :
+        taken = self.AC[lanes] >= 0
+        self.jumpLeftInstruction(lanes[taken], addresses[taken])
+
+    def conditionalJumpRight(self,lanes,addresses) :
+        taken = self.AC[lanes] >= 0
+        self.jumpRightInstruction(lanes[taken], addresses[taken])
+
+    def leftShift(self,lanes,addresses) :
+        self.AC[lanes] = wrap(self.AC[lanes] << 1)
+
+    def rightShift(self,lanes,addresses) :
+        self.AC[lanes] = wrap((self.AC[lanes] & WORD_MASK) >> 1)
+
+    def storeLeft(self,lanes,addresses) :
+        fields = (self.AC[lanes] & ADDRESS_MASK) << 20
+        self.code[lanes, addresses] = (self.code[lanes, addresses] & ~(ADDRESS_MASK << 20)) | fields
+
+    def storeRight(self,lanes,addresses) :
+        fields = self.AC[lanes] & ADDRESS_MASK
+        self.code[lanes, addresses] = (self.code[lanes, addresses] & ~ADDRESS_MASK) | fields
+
+    def halt(self,lanes,addresses) :
+        self.AC[lanes] = 0
+        self.MQ[lanes] = 0
+        self.PC[lanes] = self.length + 63                           #same sentinel as IAS.halt
+        self.IBR[lanes] = -1
+
+
+
+
+def runBatch(instructions,dataMemories,maxSteps=None) :
+    """
+    runs instructions over every row of dataMemories and returns a BatchResult
+    """
+    return BatchIAS(instructions, dataMemories).run(maxSteps)
+
+
+
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,168 @@
+# basic block compiler for the integer ias engine.
+
+from IASfast import FastIAS, WORD_MASK, SIGN_BIT
+from IASanalysis import modifiedWords
+
+
+
+MAX_BLOCK_WORDS = 256                                           #longest straight line run compiled into one block
+
+
+def wrap(expression) :
+    """
+    source for wrapping an expression to a 40 bit two's complement value, same as toSigned
+    """
+    return "(((" + expression + ") + " + str(SIGN_BIT) + ") & " + str(WORD_MASK) + ") - " + str(SIGN_BIT)
+
+
+def interpretWord(machine) :
+    """
+    runs the word at PC with the FastIAS loop, stands in for a block at words rewritten at run time
+    """
+    return FastIAS.runCycles(machine, 1)
+
+
+# source templates of the straight line opcodes, {X} is replaced by the operand.
+# everything missing here (jumps, halt, storeLeft, storeRight, invalid opcodes) ends a block.
+TEMPLATES = {
+    0b00000001: ["AC = M[{X}]"],                                                        #LOAD M(X)
+    0b00001010: ["AC = MQ"],                                                            #LOAD MQ
+    0b00001001: ["MQ = M[{X}]"],                                                        #LOAD MQ,M(X)
+    0b00000010: ["AC = " + wrap("-M[{X}]")],                                            #LOAD -M(X)
+    0b00000011: ["AC = " + wrap("abs(M[{X}])")],                                        #LOAD |M(X)|
+    0b00100001: ["M[{X}] = AC"],                                                        #STOR M(X)
+    0b00000100: ["AC = -abs(M[{X}])"],                                                  #LOAD -|M(X)|
+    0b00000101: ["AC = " + wrap("AC + M[{X}]")],                                        #ADD M(X)
+    0b00000111: ["AC = " + wrap("AC + abs(M[{X}])")],                                   #ADD |M(X)|
+    0b00000110: ["AC = " + wrap("AC - M[{X}]")],                                        #SUB M(X)
+    0b00001000: ["AC = " + wrap("AC - abs(M[{X}])")],                                   #SUB |M(X)|
+    0b00001011: ["P = MQ * M[{X}]", "AC = " + wrap("P"), "MQ = P >> 41"],               #MUL M(X)
+    0b00001100: ["D = M[{X}]", "Q = " + wrap("AC // D"), "AC = " + wrap("AC % D"), "MQ = Q"],    #DIV M(X)
+    0b00010100: ["AC = " + wrap("AC << 1")],                                            #LSH
+    0b00010101: ["AC = " + wrap("(AC & " + str(WORD_MASK) + ") >> 1")],                 #RSH
+}
+
+
+
+
+class BlockIAS(FastIAS) :
+    '''
+    FastIAS that runs instructions_memory as compiled basic blocks.
+    A block starts at the left half of a word and runs straight line code up to the next jump, halt,
+    storeLeft or storeRight. Each block is turned into Python source once and passed through compile(),
+    the terminating instruction is handed to the normal handler so jumps behave exactly as in FastIAS.
+    Words rewritten by storeLeft / storeRight or overwritten by a STOR into a unified memory
+    (found by IASanalysis.modifiedWords) are never compiled, they
+    are interpreted so a self-modifying loop does not recompile its blocks on every pass.
+    '''
+    __slots__ = ('_blocks', '_blockWords', '_modified')
+
+    def __init__(self, memory=None) -> None :
+        super().__init__(memory)
+        self._blocks = {}                                           #compiled blocks by start address
+        self._blockWords = {}                                       #word address -> start addresses of blocks using it
+        self._modified = set()                                      #words rewritten by the program, kept out of blocks
+
+
+    def runCycles(self,limit) :
+        """
+        runs compiled blocks wrt the PC, a right half left in the IBR by a jump is executed by its handler.
+        every word of a block counts as a cycle and limit is only checked between blocks, so a run can go
+        up to MAX_BLOCK_WORDS cycles over it. a block runs the right half of its last word itself, whatever
+        it leaves in the IBR (a right half jumped to by a right half) takes a cycle of its own as in FastIAS.
+        """
+        instructions = self.memory.instructions_memory
+        blocks = self._blocks
+        cycles = 0
+        while cycles < limit :
+            if self._IBR is None :
+                if self._PC >= len(instructions) :
+                    break
+                cycles += (blocks.get(self._PC) or self.compileBlock(self._PC))(self)
+            else :
+                handler, address, half = self._IBR
+                self._IBR = None
+                handler(address)
+                cycles += 1
+        return cycles
+
+
+    def compileBlock(self,start) :
+        """
+        compiles the straight line run of words from start into one function and caches it.
+        AC and MQ live in locals inside the block and are written back before it returns the words it ran.
+        a block stops before a rewritten word, which gets interpretWord instead of a block.
+        a block ending on a left half runs the right half that half leaves in the IBR, in the same cycle.
+        """
+        instructions = self.memory.instructions_memory
+        if start in self._modified :
+            self._blocks[start] = interpretWord
+            return interpretWord
+        namespace = {}
+        lines = ["def block(machine) :",
+                 "    M = machine.memory.data_memory",
+                 "    AC = machine._AC",
+                 "    MQ = machine._MQ"]
+        address = start
+        words = []
+        while address < len(instructions) and len(words) < MAX_BLOCK_WORDS and address not in self._modified :
+            word, left, leftOperand, right = self.predecode(address)
+            words.append(address)
+            halves = [((word >> 32) & 0xFF, leftOperand, left, right), ((word >> 12) & 0xFF, right[1], right[0], None)]
+            for opcode, operand, handler, pending in halves :
+                if opcode in TEMPLATES :
+                    lines.extend("    " + line.format(X=operand) for line in TEMPLATES[opcode])
+                    continue
+                # a control instruction, leave the machine as the interpreter would and call its handler
+                namespace["H%d" % address] = handler
+                namespace["R%d" % address] = pending
+                lines.extend(["    machine._AC = AC",
+                              "    machine._MQ = MQ",
+                              "    machine._PC = %d" % (address + 1),
+                              "    machine._MBR = %d" % word,
+                              "    machine._IBR = R%d" % address,
+                              "    H%d(%d)" % (address, operand)])
+                if pending is not None :
+                    lines.extend(["    if machine._IBR is not None :",
+                                  "        handler, operand, half = machine._IBR",
+                                  "        machine._IBR = None",
+                                  "        handler(operand)"])
+                lines.append("    return %d" % len(words))
+                break
+            else :
+                address += 1
+                continue
+            break
+        else :
+            lines.extend(["    machine._AC = AC",
+                          "    machine._MQ = MQ",
+                          "    machine._PC = %d" % address,
+                          "    machine._MBR = %d" % word,
+                          "    return %d" % len(words)])
+        exec(compile("\n".join(lines), "<IAS block %d>" % start, "exec"), namespace)
+        block = namespace["block"]
+        self._blocks[start] = block
+        for address in words :
+            self._blockWords.setdefault(address, set()).add(start)
+        return block
+
+
+    def invalidate(self,address=None) :
+        """
+        drops predecoded words like FastIAS.invalidate and every compiled block that contains them
+        """
+        super().invalidate(address)
+        if address is None :
+            self._blocks = {}
+            self._blockWords = {}
+            self._modified = modifiedWords(self.memory.instructions_memory, self.memory.codeBase)
+        else :
+            for start in self._blockWords.pop(address, ()) :
+                self._blocks.pop(start, None)
+
+
+
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,173 @@
+# memoized whole program runs for the integer engines.
+
+from collections import OrderedDict, namedtuple
+import hashlib
+from IASopcodes import RunResult, HALTED
+from IASimage import packWords
+from IASanalysis import modifiedWords
+
+
+
+MAX_SHAPES = 16                                                 #read address sets remembered per program
+ENTRY_WORDS = 8                                                 #words counted for an entry on top of its read and written words
+
+CachedRun = namedtuple('CachedRun', ['delta', 'registers', 'cycles', 'words'])
+CachedRun.__doc__ = """
+result of one run: {address: value} of every data word written, final (PC, AC, MQ, MBR, IR, MAR),
+cycles of the run and the words the entry is counted as for eviction
+"""
+
+
+
+def programKey(instructions) :
+    """
+    content hash of an instructions_memory, strings, ints and BitStreams of the same words hash alike
+    """
+    return hashlib.blake2b(packWords(instructions), digest_size=16).digest()
+
+
+
+
+class RecordingWords :
+    """
+    data_memory wrapper for a recorded run: reads of words the run has not written yet are kept with
+    their value, writes go through to the wrapped memory and their addresses are kept.
+    """
+
+    def __init__(self, words) :
+        self.words = words
+        self.reads = {}                                         #address -> value read before any write
+        self.written = set()
+
+    def __len__(self) :
+        return len(self.words)
+
+    def __getitem__(self, address) :
+        value = self.words[address]
+        if address not in self.written and address not in self.reads :
+            self.reads[address] = value
+        return value
+
+    def __setitem__(self, address, value) :
+        self.words[address] = value
+        self.written.add(address)
+
+
+
+
+class ResultCache :
+    """
+    Opt-in LRU cache of whole FastIAS / BlockIAS runs, use cache.run(machine) instead of machine.fetch().
+    A run is keyed on the program hash, AC and MQ and the values of the data words it read before
+    writing them. Those words decide every branch, so a run that finds the same values at the same
+    addresses does the same thing and a hit applies the written words and final registers without fetch.
+    The read addresses are only known after a run, so every program keeps the address sets of its
+    recorded runs and a lookup tries each of them.
+    Only runs from a fresh machine (PC 0, no pending right half) are cached. A program containing
+    STOR M(X,8:19) or STOR M(X,28:39) (see IASanalysis.modifiedWords), or that changed instructions_memory
+    in a run, is marked as uncacheable and always runs.
+    Entries are evicted least recently used first once they hold more than maxWords words.
+    """
+
+    def __init__(self, maxWords=1 << 20) :
+        self.maxWords = maxWords
+        self.words = 0                                          #words held by all entries
+        self.entries = OrderedDict()                            #(program, addresses, values, AC, MQ) -> CachedRun
+        self.shapes = {}                                        #program -> list of read address tuples
+        self.uncacheable = set()                                #programs that modified their instructions
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) :
+        return len(self.entries)
+
+    def run(self, machine) :
+        """
+        runs machine to the end like machine.fetch() and returns a RunResult, from the cache when it can
+        """
+        instructions = machine.memory.instructions_memory
+        if machine._PC != 0 or machine._IBR is not None :
+            return machine.fetch()
+        program = programKey(instructions)
+        if program not in self.shapes and program not in self.uncacheable and modifiedWords(instructions, machine.memory.codeBase) :
+            self.uncacheable.add(program)
+        if program in self.uncacheable :
+            return machine.fetch()
+        data = machine.memory.data_memory
+        for addresses in self.shapes.get(program, ()) :
+            key = (program, addresses, tuple([data[address] for address in addresses]), machine._AC, machine._MQ)
+            entry = self.entries.get(key)
+            if entry is not None :
+                self.entries.move_to_end(key)
+                self.hits += 1
+                self.apply(machine, entry)
+                return RunResult(HALTED, entry.cycles)
+
+        self.misses += 1
+        registers = (machine._AC, machine._MQ)
+        original = list(instructions)
+        recording = RecordingWords(data)
+        machine.memory.data_memory = recording
+        try :
+            result = machine.fetch()
+        finally :
+            machine.memory.data_memory = data
+        if machine.memory.instructions_memory is not instructions or list(instructions) != original :
+            self.forget(program)
+            return result
+        self.store(program, recording, registers, machine, result.cycles)
+        return result
+
+    def store(self, program, recording, registers, machine, cycles) :
+        """
+        adds the entry of a recorded run and evicts old entries over maxWords
+        """
+        addresses = tuple(sorted(recording.reads))
+        delta = {address: recording.words[address] for address in recording.written}
+        entry = CachedRun(delta, (machine._PC, machine._AC, machine._MQ, machine._MBR, machine._IR, machine._MAR),
+                          cycles, ENTRY_WORDS + len(addresses) + 2 * len(delta))
+        key = (program, addresses, tuple([recording.reads[address] for address in addresses])) + registers
+        if key in self.entries :
+            self.words -= self.entries.pop(key).words
+        self.entries[key] = entry
+        self.words += entry.words
+        shapes = self.shapes.setdefault(program, [])
+        if addresses in shapes :
+            shapes.remove(addresses)
+        shapes.insert(0, addresses)
+        del shapes[MAX_SHAPES:]
+        while self.words > self.maxWords and self.entries :
+            key, evicted = self.entries.popitem(last=False)
+            self.words -= evicted.words
+
+    def apply(self, machine, entry) :
+        """
+        writes the data words and registers of a cached run into machine
+        """
+        data = machine.memory.data_memory
+        for address, value in entry.delta.items() :
+            data[address] = value
+        machine._PC, machine._AC, machine._MQ, machine._MBR, machine._IR, machine._MAR = entry.registers
+        machine._IBR = None
+
+    def forget(self, program) :
+        """
+        drops every entry of program and never caches it again, used when it modified its instructions
+        """
+        self.uncacheable.add(program)
+        self.shapes.pop(program, None)
+        for key in [key for key in self.entries if key[0] == program] :
+            self.words -= self.entries.pop(key).words
+
+    def clear(self) :
+        self.entries.clear()
+        self.shapes.clear()
+        self.uncacheable.clear()
+        self.words = 0
+
+
+
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,124 @@
+# client of the ias simulation server, standard library only so callers do not import the simulator.
+
+import json
+import socket
+import sys
+
+
+
+class ServerError(Exception) :
+    """
+    raised when the server rejects a whole request, jobs that fail come back with an 'error' entry instead
+    """
+
+
+
+
+class Client :
+    """
+    Blocking connection to an IASserver.Server, opened on first use and kept for every later request.
+    run() sends one request and yields the responses of its jobs as the server streams them:
+        with Client('127.0.0.1:8642') as client :
+            for response in client.run([program], [{'inputs': {3: 56, 2: 35}, 'outputs': [4]}]) :
+                ...
+    A connection that was dropped while idle is opened again once before a request is given up.
+    One Client is one connection, use a Client per thread.
+    """
+
+    def __init__(self, address, timeout=None) :
+        self.address = address
+        self.timeout = timeout
+        self.socket = None
+        self.lines = None
+        self.identifiers = 0
+
+    def __enter__(self) :
+        return self
+
+    def __exit__(self, *exception) :
+        self.close()
+
+    def connect(self) :
+        """
+        opens the connection, 'host:port' for tcp or the path of a unix socket
+        """
+        if ':' in self.address :
+            host, port = self.address.rsplit(':', 1)
+            self.socket = socket.create_connection((host, int(port)), self.timeout)
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else :
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.socket.settimeout(self.timeout)
+            self.socket.connect(self.address)
+        self.lines = self.socket.makefile('rb')
+
+    def close(self) :
+        if self.socket is not None :
+            self.lines.close()
+            self.socket.close()
+            self.socket = self.lines = None
+
+    def send(self, request) :
+        """
+        writes one request line, reconnecting once when the kept connection turns out to be closed
+        """
+        line = json.dumps(request, separators=(',', ':')).encode() + b"\n"
+        for attempt in range(2) :
+            if self.socket is None :
+                self.connect()
+            try :
+                self.socket.sendall(line)
+                return
+            except OSError :
+                self.close()
+                if attempt :
+                    raise
+
+    def run(self, programs, jobs) :
+        """
+        runs jobs (dicts with program, inputs, outputs and max_cycles, see IASserver.Server) of programs
+        (lists of 40 bit words) and yields the response of every job in the order they finish
+        """
+        self.identifiers += 1
+        identifier = self.identifiers
+        request = {'id': identifier, 'programs': [list(program) for program in programs], 'jobs': list(jobs)}
+        self.send(request)
+        answered = retried = False
+        while True :
+            line = self.lines.readline()
+            if not line :
+                self.close()
+                if answered or retried :
+                    raise ConnectionError("the server closed the connection during request {}".format(identifier))
+                retried = True                                  #closed while idle, the request never arrived
+                self.send(request)
+                continue
+            answered = True
+            response = json.loads(line)
+            if response.get('id') != identifier :
+                continue
+            if 'done' in response :
+                return
+            if 'job' not in response :
+                raise ServerError(response.get('error'))
+            yield response
+
+    def runAll(self, programs, jobs) :
+        """
+        responses of all jobs, in job order
+        """
+        responses = list(self.run(programs, jobs))
+        responses.sort(key=lambda response : response['job'])
+        return responses
+
+
+
+
+
+if __name__ == "__main__":
+    # python IASclient.py address program.txt runs a text file with one 40 bit instruction per line on a server
+    with open(sys.argv[2]) as handle :
+        program = [line.strip() for line in handle if line.strip()]
+    with Client(sys.argv[1]) as client :
+        for response in client.run([program], [{}]) :
+            print(response)
@@ -0,0 +1,724 @@
+# integer backed implementation of the ias architecture.
+
+from array import array
+import asyncio
+import time
+from bitstring import BitStream
+from IASopcodes import Memory, RunResult, HANDLERS, HALTED, BUDGET, TIMEOUT, CHECK_INTERVAL, JUMP_RIGHT, RIGHT_JUMPS, WORD_ENDS
+from IAStrace import RECORD, RECORDS
+from IASimage import packSnapshot, unpackSnapshot, unpackImage, openBuffer, writeFile
+
+
+
+WORD_LENGTH = 40                                                #width of a memory word / AC / MQ
+WORD_MASK = (1 << WORD_LENGTH) - 1                              #40 ones, used to wrap results
+SIGN_BIT = 1 << (WORD_LENGTH - 1)                               #bit 39, the sign of a two's complement word
+ADDRESS_MASK = 0xFFF                                            #12 bit address field
+HALF_MASK = 0xFFFFF                                             #20 bit half word (opcode + address)
+DATA_WORDS = 1000                                               #same size as Memory.data_memory
+ZERO_DATA = array('q', bytes(8 * DATA_WORDS))                   #copied into data memories by IntMemory.reset
+
+
+
+def toSigned(value) :
+    """
+    wraps an integer to a 40 bit two's complement value
+    """
+    return ((value + SIGN_BIT) & WORD_MASK) - SIGN_BIT
+
+
+def parseWord(word) :
+    """
+    converts a 40 character '0'/'1' instruction string to an integer, integers are returned unchanged
+    """
+    if isinstance(word, str) :
+        return int(word, 2)
+    return word
+
+
+def formatWord(word) :
+    """
+    converts an integer word to the 40 character '0'/'1' format used by instructions_memory
+    """
+    return format(word & WORD_MASK, '040b')
+
+
+
+
+class IntMemory(Memory) :
+    """
+    Memory class for the integer engine.
+    data_memory holds plain 40 bit two's complement ints in an array('q') instead of BitStreams.
+    """
+    __slots__ = ()
+
+    def __init__(self) :
+        self.instructions_memory = []
+        self.data_memory = array('q', bytes(8 * DATA_WORDS))
+
+    def setDataMemory(self,elDM) :
+        """
+        lists (of ints or BitStreams) are converted, any other sequence of ints is used as it is
+        """
+        if isinstance(elDM, list) :
+            elDM = array('q', [toSigned(getattr(word, 'int', word)) for word in elDM])
+        self.data_memory = elDM
+
+    def reset(self) :
+        """
+        empties the instructions and zeroes the data words, an array of the right size is zeroed in place
+        """
+        self.instructions_memory = []
+        if isinstance(self.data_memory, array) and len(self.data_memory) == DATA_WORDS :
+            self.data_memory[:] = ZERO_DATA
+        else :
+            self.data_memory = array('q', ZERO_DATA)
+
+
+
+
+
+class FastIAS :
+    '''
+    Integer engine for the IAS computer.
+    Same fetch, decode and execute cycle as IASopcodes.IAS but AC, MQ, PC and data memory are plain ints,
+    BitStream is only used at the API edges. Arithmetic wraps to 40 bits instead of raising on overflow.
+    '''
+    __slots__ = ('memory', '_PC', '_AC', '_MQ', '_MBR', '_IR', '_MAR', '_IBR', '_decoded', '_decodedFor')
+
+    def __init__(self, memory=None) -> None :
+        '''
+        constructor for :
+        memory, Accumualtor, ProgramCounter, MultiplierQuotient, MBR, MAR, IR and IBR.
+        memory defaults to a new IntMemory, a memory holding ints (e.g. IASmemory.SparseMemory(zero=0)) can be passed in.
+        '''
+        self.memory = IntMemory() if memory is None else memory
+        self._PC  = 0                                               #Program counter
+        self._AC  = 0                                               #Accumulator
+        self._MQ  = 0                                               #Multiplier Quotient
+        self._MBR = 0                                               #Memory buffer register, last fetched word
+        self._IR  = 0                                               #8 bit opcode being executed
+        self._MAR = 0                                               #12 bit memory address
+        self._IBR = None                                            #pending right hand instruction, a predecoded half or None
+        self._decoded = {}                                          #predecoded words by address, see predecode
+        self._decodedFor = None                                     #instructions_memory the cache was built for
+        self.memory.watch(self.invalidate)
+
+
+    def __init_subclass__(cls, **kwargs) :
+        """
+        gives every subclass its own dispatch table so overridden handlers are used
+        """
+        super().__init_subclass__(**kwargs)
+        cls.OPERATIONS = dispatchTable(cls)
+
+
+    @property
+    def operations(self) :
+        """
+        read only list of bound handlers by integer opcode, like IAS.operations built on every read.
+        the engine itself dispatches through OPERATIONS and handler()
+        """
+        return [function.__get__(self) for function in self.OPERATIONS]
+
+
+    def handler(self,opcode) :
+        """
+        handler of an integer opcode bound to this machine
+        """
+        return self.OPERATIONS[opcode].__get__(self)
+
+
+    def appendInstructions(self,inputInstruction) :
+        """
+        appends a 40 bit instruction to the memory and executes both halves of it straight away.
+        """
+        self.memory.instructions_memory.append(inputInstruction)
+        self.executeWord(parseWord(inputInstruction))
+        self._PC += 1
+
+
+    def instructionRoutine(self) :
+        """
+        Instructions exexuted wrt to elements in instructions_memory size
+        """
+        for inputInstruction in self.memory.instructions_memory :
+            self.executeWord(parseWord(inputInstruction))
+            self._PC += 1
+
+
+    def executeWord(self,word) :
+        """
+        executes left and right half of a word one after the other, jumps are not followed
+        """
+        self._MBR = word
+        self._IR = word >> 32
+        self._MAR = (word >> 20) & ADDRESS_MASK
+        self.handler(self._IR)(self._MAR)
+        self._IR = (word >> 12) & 0xFF
+        self._MAR = word & ADDRESS_MASK
+        self.handler(self._IR)(self._MAR)
+        self._IBR = None
+
+
+    def fetch(self,max_cycles=None,deadline=None,trace=None,timing=None,profile=None) :
+        """
+        Executes the fetch cycle wrt the PC and calls the corresponding execute.
+        Runs until the program halts, max_cycles cycles have run or time.monotonic() has passed deadline and
+        returns a RunResult. The limits are checked every CHECK_INTERVAL cycles, a stopped machine carries on
+        where it left off on the next call. Every executed half instruction is recorded in trace when an
+        IAStrace.TraceBuffer is given, memory fetches and executed opcodes are counted in timing when an
+        IAStiming.CycleCounter is given, and every half is handed to profile when an IASprofile.Profiler
+        is given (one of the three at a time).
+        """
+        if (trace is not None) + (timing is not None) + (profile is not None) > 1 :
+            raise ValueError("only one of trace, timing and profile can be used in a run")
+        if self._decodedFor is not self.memory.instructions_memory :
+            self.invalidate()
+        cycles = 0
+        while not self.isHalted() :
+            limit = CHECK_INTERVAL if max_cycles is None else min(CHECK_INTERVAL, max_cycles - cycles)
+            if limit <= 0 :
+                return RunResult(BUDGET, cycles)
+            if deadline is not None and time.monotonic() >= deadline :
+                return RunResult(TIMEOUT, cycles)
+            if trace is not None :
+                cycles += self.traceCycles(limit, trace)
+            elif timing is not None :
+                cycles += self.timedCycles(limit, timing)
+            elif profile is not None :
+                cycles += self.profileCycles(limit, profile)
+            else :
+                cycles += self.runCycles(limit)
+        return RunResult(HALTED, cycles)
+
+
+    def isHalted(self) :
+        """
+        True once the PC is past the program (end reached or HALT) and no right half is pending
+        """
+        return self._IBR is None and self._PC >= len(self.memory.instructions_memory)
+
+
+    def runCycles(self,limit) :
+        """
+        runs at most limit cycles and returns how many ran, one cycle fetches a word and executes it or
+        executes the right half a jump left in the IBR
+        """
+        instructions = self.memory.instructions_memory
+        decoded = self._decoded
+        for cycle in range(limit) :
+            if self._IBR is None :
+                if self._PC >= len(instructions) :
+                    return cycle
+                entry = decoded.get(self._PC) or self.predecode(self._PC)
+                self._MBR = entry[0]
+                self._PC += 1
+                self._IBR = entry[3]
+                entry[1](entry[2])
+
+            if self._IBR is not None :
+                handler, address, half = self._IBR
+                self._IBR = None
+                handler(address)
+        return limit
+
+
+    def traceCycles(self,limit,trace) :
+        """
+        runCycles that also packs PC, opcode, operand, AC and MQ of every half into the ring buffer of trace.
+        records are packed here instead of calling trace.record: the loop runs as many cycles as fit before
+        the end of the ring, the two spare records after it take the overflow of the last cycle which is
+        then moved to the front, so the inner loop never checks for the wrap. a word that runs both halves
+        is packed once as RECORDS.
+        """
+        instructions = self.memory.instructions_memory
+        decoded = self._decoded
+        predecode = self.predecode
+        pack = RECORD.pack_into
+        packBoth = RECORDS.pack_into
+        buffer = trace.buffer
+        size = RECORD.size
+        both = RECORDS.size
+        end = trace.capacity * size
+        offset = (trace.count % trace.capacity) * size
+        written = -offset
+        cycles = 0
+        while cycles < limit :
+            room = min(limit - cycles, max(1, (end - offset) // (2 * size)))
+            for cycle in range(room) :
+                right = self._IBR
+                if right is None :
+                    address = self._PC
+                    if address >= len(instructions) :
+                        limit = cycles = cycles + cycle
+                        break
+                    entry = decoded.get(address) or predecode(address)
+                    self._MBR = word = entry[0]
+                    self._PC = address + 1
+                    self._IBR = entry[3]
+                    entry[1](entry[2])
+                    right = self._IBR
+                    if right is None :                          #left half jumped to a left half or halted
+                        pack(buffer, offset, address, word, self._AC, self._MQ)
+                        offset += size
+                        continue
+                    ac = self._AC
+                    mq = self._MQ
+                    handler, operand, half = right
+                    self._IBR = None
+                    pc = self._PC
+                    handler(operand)
+                    packBoth(buffer, offset, address, word, ac, mq, -pc, half, self._AC, self._MQ)
+                    offset += both
+                else :
+                    handler, operand, half = right
+                    self._IBR = None
+                    pc = self._PC
+                    handler(operand)
+                    pack(buffer, offset, -pc, half, self._AC, self._MQ)
+                    offset += size
+            else :
+                cycles += room
+            while offset >= end :
+                buffer[:offset - end] = buffer[end:offset]
+                offset -= end
+                written += end
+        trace.count += (written + offset) // size
+        return limit
+
+
+    def profileCycles(self,limit,profile) :
+        """
+        runCycles that hands every half to profile.execute with its position and the sign of AC before it ran
+        """
+        instructions = self.memory.instructions_memory
+        decoded = self._decoded
+        execute = profile.execute
+        for cycle in range(limit) :
+            if self._IBR is None :
+                if self._PC >= len(instructions) :
+                    return cycle
+                address = self._PC
+                entry = decoded.get(address) or self.predecode(address)
+                self._MBR = entry[0]
+                self._PC += 1
+                self._IBR = entry[3]
+                execute(entry[1], entry[2], (address, 'L'), self._AC >= 0)
+
+            if self._IBR is not None :
+                handler, operand, half = self._IBR
+                self._IBR = None
+                execute(handler, operand, (self._PC - 1, 'R'), self._AC >= 0)
+        return limit
+
+
+    def timedCycles(self,limit,timing) :
+        """
+        runCycles that counts the words fetched from memory and the halves executed per opcode in timing.
+        a right half runs from the IBR without a fetch, a taken jump to a right half fetches its word.
+        a left handler that clears the IBR without being a halt or a left jump is a superinstruction
+        (IASpeephole) and ran the right half of its word as well.
+        """
+        instructions = self.memory.instructions_memory
+        decoded = self._decoded
+        executed = timing.executed
+        fetched = 0
+        for cycle in range(limit) :
+            if self._IBR is None :
+                if self._PC >= len(instructions) :
+                    limit = cycle
+                    break
+                entry = decoded.get(self._PC) or self.predecode(self._PC)
+                self._MBR = word = entry[0]
+                self._PC += 1
+                self._IBR = entry[3]
+                entry[1](entry[2])
+                opcode = (word >> 32) & 0xFF
+                executed[opcode] += 1
+                fetched += 1
+                if opcode in RIGHT_JUMPS :
+                    fetched += opcode == JUMP_RIGHT or self._AC >= 0
+                elif self._IBR is None and opcode not in WORD_ENDS :
+                    executed[(word >> 12) & 0xFF] += 1
+
+            if self._IBR is not None :
+                handler, address, half = self._IBR
+                self._IBR = None
+                handler(address)
+                opcode = half >> 12
+                executed[opcode] += 1
+                fetched += opcode in RIGHT_JUMPS and (opcode == JUMP_RIGHT or self._AC >= 0)
+        timing.fetched += fetched
+        return limit
+
+
+    async def run(self,yield_every=CHECK_INTERVAL,max_cycles=None) :
+        """
+        asyncio version of fetch, gives the event loop a turn every yield_every cycles. returns a RunResult.
+        """
+        if yield_every < 1 :
+            raise ValueError("yield_every has to be at least 1 cycle")
+        cycles = 0
+        while True :
+            budget = yield_every if max_cycles is None else min(yield_every, max_cycles - cycles)
+            result = self.fetch(max_cycles=budget)
+            cycles += result.cycles
+            if result.status == HALTED :
+                return RunResult(HALTED, cycles)
+            if max_cycles is not None and cycles >= max_cycles :
+                return RunResult(BUDGET, cycles)
+            await asyncio.sleep(0)
+
+
+    def reset(self,program=None) :
+        """
+        puts the machine back in the state of a new one, the memory object is kept and cleared.
+        program (a list of 40 bit instructions) is loaded into the cleared memory when given.
+        """
+        self.memory.reset()
+        self._PC = self._AC = self._MQ = self._MBR = self._IR = self._MAR = 0
+        self._IBR = None
+        if program is not None :
+            self.memory.setInstructionsMemory(list(program))
+        self.invalidate()
+
+
+    def predecode(self,address) :
+        """
+        decodes the word at address once into (word, left handler, left operand, right half) and caches it,
+        the right half is a (handler, operand, 20 bit half) triple so it can be parked in the IBR as it is.
+        fetch looks words up in the cache, storeLeft and storeRight drop the entry of the word they modify.
+        """
+        word = parseWord(self.memory.instructions_memory[address])
+        entry = (word,
+                 self.handler((word >> 32) & 0xFF), (word >> 20) & ADDRESS_MASK,
+                 (self.handler((word >> 12) & 0xFF), word & ADDRESS_MASK, word & HALF_MASK))
+        self._decoded[address] = entry
+        return entry
+
+
+    def invalidate(self,address=None) :
+        """
+        drops the predecoded entry of one address, or all of them when no address is given.
+        needed when instructions_memory is changed from outside the machine.
+        """
+        if address is None :
+            self._decoded = {}
+            self._decodedFor = self.memory.instructions_memory
+        else :
+            self._decoded.pop(address, None)
+
+
+    def snapshot(self,path=None) :
+        """
+        packs PC, AC, MQ, MBR, MAR, IR, IBR and both memories into the IASimage snapshot format (5 bytes per word).
+        the snapshot is returned and also written to path when one is given.
+        """
+        registers = {'PC': self._PC, 'AC': self._AC, 'MQ': self._MQ, 'MBR': self._MBR, 'MAR': self._MAR, 'IR': self._IR,
+                     'IBR': None if self._IBR is None else self._IBR[2]}
+        payload = packSnapshot(registers, self.memory.instructions_memory, self.memory.data_memory)
+        return payload if path is None else writeFile(path, payload)
+
+
+    def restore(self,source) :
+        """
+        restores a state written by snapshot, source is the snapshot bytes or a file path.
+        files are memory mapped copy-on-write and both memories become PackedWords views into the mapping,
+        so words are only decoded when the machine reads them and the file never changes.
+        """
+        registers, instructions, data = unpackSnapshot(openBuffer(source))
+        self.memory.setInstructionsMemory(instructions)
+        self.memory.setDataMemory(data)
+        self.invalidate()
+        self._PC = registers['PC']
+        self._AC = registers['AC']
+        self._MQ = registers['MQ']
+        self._MBR = registers['MBR']
+        self._MAR = registers['MAR']
+        self._IR = registers['IR']
+        half = registers['IBR']
+        self._IBR = None if half is None else (self.handler(half >> 12), half & ADDRESS_MASK, half)
+
+
+    def loadImage(self,source) :
+        """
+        loads a program image written by IASimage.writeImage, source is the image bytes or a file path.
+        like restore, files are memory mapped and words are decoded when the fetch loop first reaches them.
+        """
+        instructions, data = unpackImage(openBuffer(source))
+        self.memory.setInstructionsMemory(instructions)
+        self.memory.setDataMemory(data)
+        self.invalidate()
+
+
+    def getStoredValue(self,address) :
+        """
+        Returns element stored at given address
+        """
+        return self.memory.data_memory[int(address,2)]
+
+
+    def appendInput(self,address,value) :
+        """
+        append one single input to the data_memory in a specific position
+        """
+        if not -SIGN_BIT <= value < SIGN_BIT :
+            raise ValueError("{} does not fit in a 40 bit word".format(value))
+        self.memory.data_memory[int(address,2)] = value
+
+
+    def input(self,address,value) :
+        self.appendInput(address,value)
+
+
+    def decode(self,opcode,address) :
+        """
+        method to decode, takes the same '0'/'1' strings as IAS.decode
+        """
+        self.handler(int(opcode,2))(int(address,2))
+
+
+    def invalid(self,address) :
+        """
+        raised for opcodes that are not part of the instruction set
+        """
+        raise ValueError("invalid opcode in the word before PC {}".format(self._PC))
+
+
+    def loadToAC(self,address) :
+        """
+        Transfer contents of register MQ to the accumulator AC
+        """
+        self._AC = self._MQ
+
+
+    def loadToMQ(self,address) :
+        """
+        Transfer contents of memory location X to MQ
+        """
+        self._MQ = self.memory.data_memory[address]
+
+
+    def load(self,address) :
+        """
+        Transfer M(X) to the accumulator
+        """
+        self._AC = self.memory.data_memory[address]
+
+
+    def store(self,address) :
+        """
+        Transfer contents of accumulator to memory location X
+        """
+        self.memory.data_memory[address] = self._AC
+
+
+    def loadNegative(self,address) :
+        """
+        LOAD -M(X) Transfer -M(X) to the accumulator
+        """
+        self._AC = toSigned(-self.memory.data_memory[address])
+
+
+    def loadAbsolute(self,address) :
+        """
+        LOAD |M(X)| Transfer absolute value of M(X) to the accumulator
+        """
+        self._AC = toSigned(abs(self.memory.data_memory[address]))
+
+
+    def loadNegativeAbsolute(self,address) :
+        """
+        Transfer -|M(X)| to the accumulator
+        """
+        self._AC = -abs(self.memory.data_memory[address])
+
+
+    def add(self,address) :
+        """
+        Add M(X) to AC; put the result in AC
+        """
+        self._AC = toSigned(self._AC + self.memory.data_memory[address])
+
+
+    def addAbsolute(self,address) :
+        """
+        Add |M(X)| to AC; put the result in AC
+        """
+        self._AC = toSigned(self._AC + abs(self.memory.data_memory[address]))
+
+
+    def sub(self,address) :
+        """
+        Subtract M(X) from AC; put the result in AC
+        """
+        self._AC = toSigned(self._AC - self.memory.data_memory[address])
+
+
+    def subAbsolute(self,address) :
+        """
+        Subtract |M(X)| from AC; put the remainder in AC
+        """
+        self._AC = toSigned(self._AC - abs(self.memory.data_memory[address]))
+
+
+    def multiply(self,address) :
+        """
+        Multiply M(X) by MQ, same split of the 80 bit product as IAS.multiply:
+        bits 40:80 go to AC and bits 0:39 to MQ.
+        """
+        product = self._MQ * self.memory.data_memory[address]
+        self._AC = toSigned(product)
+        self._MQ = product >> 41
+
+
+    def divide(self,address) :
+        """
+        Divide AC by M(X); put the quotient in MQ and the remainder in AC
+        """
+        divisor = self.memory.data_memory[address]
+        quotient = toSigned(self._AC // divisor)
+        self._AC = toSigned(self._AC % divisor)
+        self._MQ = quotient
+
+
+    def jumpLeftInstruction(self,address) :
+        """
+        Take next instruction from left half of M(X)
+        """
+        self._IBR = None
+        self._PC = address
+
+
+    def jumpRightInstruction(self,address) :
+        """
+        Take next instruction from right half of M(X)
+        """
+        self._IBR = self.predecode(address)[3]
+        self._PC = address + 1
+
+
+    def conditionalJumpLeft(self,address) :
+        """
+        If number in the accumulator is nonnegative, take next instruction from left half of M(X)
+        """
+        if self._AC >= 0 :
+            self._IBR = None
+            self._PC = address
+
+
+    def conditionalJumpRight(self,address) :
+        """
+        If number in the accumulator is nonnegative, take next instruction from right half of M(X)
+        """
+        if self._AC >= 0 :
+            self.jumpRightInstruction(address)
+
+
+    def leftShift(self,address) :
+        """
+        Multiply accumulator by 2; i.e., shift left one bit position
+        """
+        self._AC = toSigned(self._AC << 1)
+
+
+    def rightShift(self,address) :
+        """
+        shift the 40 bit accumulator right one position, a zero is shifted in like BitStream >>=
+        """
+        self._AC = toSigned((self._AC & WORD_MASK) >> 1)
+
+
+    def storeLeft(self,address) :
+        """
+        Replace left address field at M(X) by 12 rightmost bits of AC
+        """
+        word = parseWord(self.memory.instructions_memory[address])
+        word = (word & ~(ADDRESS_MASK << 20)) | ((self._AC & ADDRESS_MASK) << 20)
+        self.memory.instructions_memory[address] = formatWord(word)
+        self.invalidate(address)
+
+
+    def storeRight(self,address) :
+        """
+        Replace right address field at M(X) by 12 rightmost bits of AC
+        """
+        word = parseWord(self.memory.instructions_memory[address])
+        word = (word & ~ADDRESS_MASK) | (self._AC & ADDRESS_MASK)
+        self.memory.instructions_memory[address] = formatWord(word)
+        self.invalidate(address)
+
+
+    def getAccumulator(self) :
+        """
+        getter for accumulator
+        """
+        return self._AC
+
+
+    def setAccumulator(self,value) :
+        """
+        setter to set the value of accumulator
+        USE WITH CAUTION
+        ONLY FOR TEST PURPOSES
+        """
+        self._AC = BitStream(int=value, length=40).int
+
+
+    def getMultiplierQuotient(self) :
+        """
+        getter for multiplier quotient
+        """
+        return self._MQ
+
+
+    def setMultiplierQuotient(self,value) :
+        """
+        setter for multiplier quotient
+        USE WITH CAUTION
+        ONLY FOR TEST PURPOSES
+        """
+        self._MQ = BitStream(int=value, length=40).int
+
+
+    def getProgramCounter(self) :
+        """
+        getter for program counter.
+        """
+        return self._PC
+
+
+    def halt(self,address) :
+        """
+        Halt all the ongoing operations
+        """
+        self._AC = 0
+        self._MQ = 0
+        self._PC = len(self.memory.instructions_memory) + 63         #same sentinel as IAS.halt, breaks the fetch loop
+        self._IBR = None
+        self._IR = 0
+        self._MAR = 0
+        self._MBR = 0
+
+
+
+
+def dispatchTable(cls) :
+    """
+    handler functions of an engine class indexed by the integer opcode, unknown opcodes end up in invalid
+    """
+    table = [cls.invalid] * 256
+    for opcode, name in HANDLERS.items() :
+        table[int(opcode, 2)] = getattr(cls, name)
+    return table
+
+
+FastIAS.OPERATIONS = dispatchTable(FastIAS)
+
+
+
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,170 @@
+# packed binary format of ias words, machine snapshots and program images.
+
+import mmap
+import os
+import struct
+import sys
+
+
+
+WORD_BYTES = 5                                                  #one 40 bit word
+WORD_MASK = (1 << 40) - 1
+SNAPSHOT_MAGIC = b'IASS'
+IMAGE_MAGIC = b'IASP'
+DATA_WORDS = 1000                                               #data words written to an image by default, same as Memory
+VERSION = 1
+HEADER = struct.Struct('>4sHHII')                               #magic, version, flags, instruction words, data words
+REGISTERS = ('PC', 'AC', 'MQ', 'MBR', 'MAR', 'IR', 'IBR')       #order of the register words in a snapshot
+FLAG_IBR = 1                                                    #the IBR register holds a pending right half
+
+
+
+def wordValue(word) :
+    """
+    integer value of a word given as int, '0'/'1' string or BitStream
+    """
+    if isinstance(word, str) :
+        return int(word, 2)
+    return getattr(word, 'int', word)
+
+
+def packWords(words) :
+    """
+    packs words (ints, '0'/'1' strings or BitStreams) into 5 bytes each, big endian two's complement
+    """
+    return b''.join([(wordValue(word) & WORD_MASK).to_bytes(WORD_BYTES, 'big') for word in words])
+
+
+
+
+class PackedWords :
+    """
+    List like view of count packed 40 bit words starting at offset in buffer, nothing is decoded until it is read.
+    Reads return signed ints, or 40 character '0'/'1' strings when bits is True. Writes take ints or strings and
+    need a writable buffer (bytearray, mmap opened with ACCESS_COPY or ACCESS_WRITE).
+    """
+
+    def __init__(self, buffer, offset=0, count=None, bits=False) :
+        self.buffer = memoryview(buffer)
+        self.offset = offset
+        self.count = (len(self.buffer) - offset) // WORD_BYTES if count is None else count
+        self.bits = bits
+
+    def __len__(self) :
+        return self.count
+
+    def __getitem__(self, index) :
+        if isinstance(index, slice) :
+            return [self[position] for position in range(*index.indices(self.count))]
+        if not 0 <= index < self.count :
+            raise IndexError("word address out of range")
+        start = self.offset + index * WORD_BYTES
+        if self.bits :
+            return format(int.from_bytes(self.buffer[start:start + WORD_BYTES], 'big'), '040b')
+        return int.from_bytes(self.buffer[start:start + WORD_BYTES], 'big', signed=True)
+
+    def __setitem__(self, index, word) :
+        if not 0 <= index < self.count :
+            raise IndexError("word address out of range")
+        start = self.offset + index * WORD_BYTES
+        self.buffer[start:start + WORD_BYTES] = (wordValue(word) & WORD_MASK).to_bytes(WORD_BYTES, 'big')
+
+    def __iter__(self) :
+        for index in range(self.count) :
+            yield self[index]
+
+
+
+
+def packSnapshot(registers, instructions, data) :
+    """
+    packs a machine state: header, the REGISTERS words, the instruction words and the data words.
+    registers maps the names in REGISTERS to ints, IBR is None when no right half is pending.
+    """
+    flags = 0 if registers['IBR'] is None else FLAG_IBR
+    values = [registers[name] or 0 for name in REGISTERS]
+    return b''.join([HEADER.pack(SNAPSHOT_MAGIC, VERSION, flags, len(instructions), len(data)),
+                     packWords(values), packWords(instructions), packWords(data)])
+
+
+def unpackSnapshot(buffer, bits=False) :
+    """
+    reads a snapshot without copying it, returns (registers, instructions, data) where both memories are
+    PackedWords views into buffer. instructions read as '0'/'1' strings when bits is True.
+    """
+    magic, version, flags, instructionWords, dataWords = HEADER.unpack_from(buffer, 0)
+    if magic != SNAPSHOT_MAGIC or version != VERSION :
+        raise ValueError("not an IAS snapshot")
+    values = PackedWords(buffer, HEADER.size, len(REGISTERS))
+    registers = dict(zip(REGISTERS, values))
+    registers['IBR'] = registers['IBR'] & 0xFFFFF if flags & FLAG_IBR else None
+    offset = HEADER.size + len(REGISTERS) * WORD_BYTES
+    instructions = PackedWords(buffer, offset, instructionWords, bits)
+    data = PackedWords(buffer, offset + instructionWords * WORD_BYTES, dataWords)
+    return registers, instructions, data
+
+
+def packImage(instructions, data=(), dataWords=DATA_WORDS) :
+    """
+    packs a program image: header, the instruction words and dataWords data words.
+    data is a list of initial words or a {address: value} dict, missing words are zero.
+    """
+    if isinstance(data, dict) :
+        words = [0] * max([dataWords] + [address + 1 for address in data])
+        for address, value in data.items() :
+            words[address] = value
+    else :
+        words = list(data) + [0] * (dataWords - len(data))
+    return b''.join([HEADER.pack(IMAGE_MAGIC, VERSION, 0, len(instructions), len(words)),
+                     packWords(instructions), packWords(words)])
+
+
+def writeImage(path, instructions, data=(), dataWords=DATA_WORDS) :
+    """
+    writes a program image of a string-list program (see packImage) to path
+    """
+    return writeFile(path, packImage(instructions, data, dataWords))
+
+
+def unpackImage(buffer, bits=False) :
+    """
+    reads a program image without copying it, returns (instructions, data) PackedWords views into buffer.
+    instructions read as '0'/'1' strings when bits is True.
+    """
+    magic, version, flags, instructionWords, dataWords = HEADER.unpack_from(buffer, 0)
+    if magic != IMAGE_MAGIC or version != VERSION :
+        raise ValueError("not an IAS program image")
+    instructions = PackedWords(buffer, HEADER.size, instructionWords, bits)
+    data = PackedWords(buffer, HEADER.size + instructionWords * WORD_BYTES, dataWords)
+    return instructions, data
+
+
+def openBuffer(source) :
+    """
+    returns a writable buffer for source: file paths are memory mapped copy-on-write so the file itself
+    never changes, bytes are copied into a bytearray, writable buffers are used as they are.
+    """
+    if isinstance(source, (str, os.PathLike)) :
+        with open(source, 'rb') as handle :
+            return mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_COPY)
+    if isinstance(source, bytes) :
+        return bytearray(source)
+    return source
+
+
+def writeFile(path, payload) :
+    """
+    writes payload to path and returns it
+    """
+    with open(path, 'wb') as handle :
+        handle.write(payload)
+    return payload
+
+
+
+
+
+if __name__ == "__main__":
+    # python IASimage.py program.txt program.iasp converts a text file with one 40 bit instruction per line
+    with open(sys.argv[1]) as handle :
+        writeImage(sys.argv[2], [line.strip() for line in handle if line.strip()])
@@ -0,0 +1,251 @@
+# memory backends for the ias architecture.
+
+from bitstring import BitStream
+from IASopcodes import Memory, ZERO_WORD
+from IASimage import PackedWords, WORD_BYTES, WORD_MASK, wordValue
+
+
+
+PAGE_BITS = 5                                                   #32 words per page
+PAGE_SIZE = 1 << PAGE_BITS
+PAGE_MASK = PAGE_SIZE - 1
+MEMORY_WORDS = 4096                                             #every address a 12 bit address field can name
+FIELD_SHIFTS = (20, 0)                                          #shift of the left / right address field in a word
+
+
+
+class SparseWords :
+    """
+    Sparse copy-on-write word store that can be used as data_memory.
+    Words live in pages of PAGE_SIZE words that are only allocated on the first write, untouched
+    addresses read as zero. snapshot() shares every page with the copy, whichever side writes to a
+    shared page first gets its own copy of that page.
+    """
+
+    def __init__(self, size=1000, zero=0) :
+        self.size = size
+        self.zero = zero                                        #value of untouched words, 0 or a zero BitStream
+        self.pages = [None] * ((size + PAGE_MASK) >> PAGE_BITS)
+        self.owned = [False] * len(self.pages)                  #pages this store may write without copying
+
+    def __len__(self) :
+        return self.size
+
+    def __getitem__(self, address) :
+        if isinstance(address, slice) :
+            return [self[index] for index in range(*address.indices(self.size))]
+        if not 0 <= address < self.size :
+            raise IndexError("data memory address out of range")
+        page = self.pages[address >> PAGE_BITS]
+        if page is None :
+            return self.zero
+        return page[address & PAGE_MASK]
+
+    def __setitem__(self, address, value) :
+        if not 0 <= address < self.size :
+            raise IndexError("data memory address out of range")
+        index = address >> PAGE_BITS
+        if not self.owned[index] :
+            page = self.pages[index]
+            self.pages[index] = [self.zero] * PAGE_SIZE if page is None else list(page)
+            self.owned[index] = True
+        self.pages[index][address & PAGE_MASK] = value
+
+    def __iter__(self) :
+        for address in range(self.size) :
+            yield self[address]
+
+    def snapshot(self) :
+        """
+        returns a copy sharing all pages with this store, only the page table is copied
+        """
+        copy = SparseWords.__new__(SparseWords)
+        copy.size = self.size
+        copy.zero = self.zero
+        copy.pages = list(self.pages)
+        copy.owned = [False] * len(self.pages)
+        self.owned = [False] * len(self.pages)
+        return copy
+
+
+
+
+class SparseMemory(Memory) :
+    """
+    Memory with a SparseWords data_memory, cheap to build and to snapshot.
+    Use zero=0 for FastIAS and the default zero BitStream for IAS.
+    """
+    __slots__ = ()
+
+    def __init__(self, zero=None, size=1000) :
+        self.instructions_memory = []
+        self.data_memory = SparseWords(size, ZERO_WORD if zero is None else zero)
+
+    def setDataMemory(self,elDM) :
+        """
+        loads the words into a fresh SparseWords of len(elDM) words, only pages holding a nonzero word
+        are allocated. with an int zero BitStream words are stored as ints.
+        """
+        zero = self.data_memory.zero
+        words = SparseWords(len(elDM), zero)
+        for address, word in enumerate(elDM) :
+            if isinstance(zero, int) :
+                word = getattr(word, 'int', word)
+            if word != zero :
+                words[address] = word
+        self.data_memory = words
+
+    def snapshot(self) :
+        """
+        copy of this memory for what-if runs: data pages are shared copy-on-write, instructions are copied
+        """
+        copy = SparseMemory.__new__(SparseMemory)
+        copy.instructions_memory = list(self.instructions_memory)
+        copy.data_memory = self.data_memory.snapshot()
+        return copy
+
+    def reset(self) :
+        """
+        empties the instructions and drops every data page
+        """
+        self.instructions_memory = []
+        self.data_memory = SparseWords(self.data_memory.size, self.data_memory.zero)
+
+
+
+
+
+class WordView(PackedWords) :
+    """
+    PackedWords over count words of a UnifiedMemory starting at word base. Writes are reported to the
+    memory, reads return BitStreams when stream is True (data words for IAS).
+    """
+
+    def __init__(self, memory, base, count, bits=False, stream=False) :
+        super().__init__(memory.buffer, base * WORD_BYTES, count, bits)
+        self.memory = memory
+        self.base = base
+        self.stream = stream
+
+    def __getitem__(self, index) :
+        word = PackedWords.__getitem__(self, index)
+        if self.stream and not isinstance(index, slice) :
+            return BitStream(int=word, length=40)
+        return word
+
+    def __setitem__(self, index, word) :
+        PackedWords.__setitem__(self, index, word)
+        self.memory.written(self.base + index)
+
+    def append(self, word) :
+        """
+        adds a word after the last one, used for instructions by appendInstructions
+        """
+        if self.base + self.count >= MEMORY_WORDS :
+            raise IndexError("program does not fit in memory")
+        self.count += 1
+        self[self.count - 1] = word
+
+
+
+
+class UnifiedMemory(Memory) :
+    """
+    Von Neumann memory: code and data share one address space of MEMORY_WORDS words held in a single
+    bytearray of 5 byte words. data_memory is a view of the whole buffer and instructions_memory a view
+    of the program starting at word codeBase, so STOR M(X) can overwrite instructions and a program can
+    LOAD its own words. codeBase=0 is the machine as designed, codeBase=1000 runs programs written for
+    the split memory (data at 0..999) unchanged.
+    Engines register their invalidate with watch(), a data write into the program drops the predecoded
+    word. Use ints=True for FastIAS and BlockIAS, the default gives IAS its '0'/'1' instruction strings
+    and BitStream data words.
+    """
+    __slots__ = ('buffer', 'codeBase', 'ints', 'watchers')
+
+    def __init__(self, codeBase=0, ints=False) :
+        self.buffer = bytearray(MEMORY_WORDS * WORD_BYTES)
+        self.codeBase = codeBase
+        self.ints = ints
+        self.watchers = []
+        self.data_memory = WordView(self, 0, MEMORY_WORDS, stream=not ints)
+        self.instructions_memory = WordView(self, codeBase, 0, bits=not ints)
+
+    def watch(self,invalidate) :
+        self.watchers.append(invalidate)
+
+    def written(self,address) :
+        """
+        called by the views after a write to address, tells the engines when it was an instruction
+        """
+        address -= self.codeBase
+        if 0 <= address < len(self.instructions_memory) :
+            for invalidate in self.watchers :
+                invalidate(address)
+
+    def setInstructionsMemory(self,elIM) :
+        """
+        copies the words into the buffer from codeBase on, instructions_memory becomes a new view
+        so the engines decode the program again
+        """
+        if self.codeBase + len(elIM) > MEMORY_WORDS :
+            raise IndexError("program does not fit in memory")
+        self.instructions_memory = WordView(self, self.codeBase, 0, bits=not self.ints)
+        self.storeWords(self.codeBase, elIM)
+        self.instructions_memory.count = len(elIM)
+
+    def setDataMemory(self,elDM) :
+        """
+        copies the words into the buffer from address 0, they overwrite instructions they overlap
+        """
+        if len(elDM) > MEMORY_WORDS :
+            raise IndexError("data does not fit in memory")
+        self.storeWords(0, elDM)
+        self.data_memory = WordView(self, 0, MEMORY_WORDS, stream=not self.ints)
+        for address in range(max(self.codeBase, 0), min(len(elDM), self.codeBase + len(self.instructions_memory))) :
+            self.written(address)
+
+    def storeWords(self, address, words) :
+        start = address * WORD_BYTES
+        self.buffer[start:start + len(words) * WORD_BYTES] = b''.join(
+            [(wordValue(word) & WORD_MASK).to_bytes(WORD_BYTES, 'big') for word in words])
+
+    def word(self, address) :
+        """
+        writable memoryview of the 5 bytes of a word, changes through it are not reported to the engines
+        """
+        if not 0 <= address < MEMORY_WORDS :
+            raise IndexError("word address out of range")
+        return memoryview(self.buffer)[address * WORD_BYTES:(address + 1) * WORD_BYTES]
+
+    def getAddressField(self, address, half) :
+        """
+        12 bit address field of the left (half 0) or right (half 1) instruction of a word
+        """
+        word = int.from_bytes(self.word(address), 'big')
+        return (word >> FIELD_SHIFTS[half]) & 0xFFF
+
+    def setAddressField(self, address, half, value) :
+        """
+        replaces one address field in place, the rest of the word is kept
+        """
+        view = self.word(address)
+        word = int.from_bytes(view, 'big')
+        shift = FIELD_SHIFTS[half]
+        word = (word & ~(0xFFF << shift)) | ((value & 0xFFF) << shift)
+        view[:] = word.to_bytes(WORD_BYTES, 'big')
+        self.written(address)
+
+    def reset(self) :
+        """
+        zeroes the buffer in place and empties the program, the engines stay registered
+        """
+        self.buffer[:] = bytes(len(self.buffer))
+        self.data_memory = WordView(self, 0, MEMORY_WORDS, stream=not self.ints)
+        self.instructions_memory = WordView(self, self.codeBase, 0, bits=not self.ints)
+
+
+
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,173 @@
+# several ias control units running against one shared data memory.
+
+from collections import namedtuple
+from multiprocessing import shared_memory
+import multiprocessing
+import sys
+import time
+from IASopcodes import HALTED, BUDGET, CHECK_INTERVAL
+from IASfast import FastIAS
+
+
+
+MulticoreResult = namedtuple('MulticoreResult', ['statuses', 'cycles', 'seconds'])
+MulticoreResult.__doc__ = """
+result of a multicore run: HALTED or BUDGET and the cycles run per core, and the wall clock seconds of the run
+"""
+
+
+
+def runCore(engine, program, entry, name, max_cycles, barrier, results, core) :
+    """
+    process side of Multicore.runParallel: one core on the shared memory block name. all cores wait on the
+    barrier so they start together, the result goes to results as (core, status, cycles, (start, end), registers)
+    with start and end taken from the system wide time.monotonic, a failing core puts (core, None, error message) and breaks the barrier so the others give up too.
+    """
+    block = shared_memory.SharedMemory(name=name)
+    words = block.buf.cast('q')
+    machine = None
+    try :
+        machine = engine()
+        machine.memory.setInstructionsMemory(list(program))
+        machine.memory.data_memory = words
+        machine._PC = entry
+        barrier.wait()
+        start = time.monotonic()
+        result = machine.fetch(max_cycles=max_cycles)
+        results.put((core, result.status, result.cycles, (start, time.monotonic()),
+                     (machine._PC, machine._AC, machine._MQ, machine._MBR, machine._IR, machine._MAR)))
+    except Exception as error :
+        barrier.abort()
+        results.put((core, None, "{}: {}".format(type(error).__name__, error), None, None))
+    finally :
+        if machine is not None :
+            machine.memory.data_memory = None               #the view has to go before the block is closed
+        words.release()
+        block.close()
+
+
+
+
+class Multicore :
+    """
+    Multiprocessor IAS: one core per program, each an integer engine (FastIAS, BlockIAS or PeepholeIAS) with
+    its own PC, AC, MQ, IBR and instructions_memory, all of them reading and writing the same data_memory.
+    entries gives the PC each core starts at, so several cores can run one program from different words.
+    run() interleaves the cores deterministically in one process: core after core runs quantum cycles with
+    fetch(max_cycles) until every core halted, so the same programs, inputs and quantum always give the same
+    interleaving and the same memory. A write is seen by the other cores as soon as they run again.
+    runParallel() puts every core in a process of its own over a multiprocessing.shared_memory block of
+    int64 words. The cores run free, the order of their reads and writes is up to the operating system.
+    The IAS has no atomic read-modify-write, two cores updating one word can lose updates in that mode.
+    """
+
+    def __init__(self, programs, entries=None, engine=FastIAS, quantum=CHECK_INTERVAL) :
+        if entries is None :
+            entries = [0] * len(programs)
+        if len(entries) != len(programs) :
+            raise ValueError("one entry point per program is needed")
+        if quantum < 1 :
+            raise ValueError("the quantum has to be at least 1 cycle")
+        self.engine = engine
+        self.quantum = quantum
+        self.programs = [list(program) for program in programs]
+        self.entries = list(entries)
+        self.cores = []
+        for program, entry in zip(self.programs, self.entries) :
+            core = engine()
+            core.memory.setInstructionsMemory(list(program))
+            if self.cores :
+                core.memory.data_memory = self.cores[0].memory.data_memory
+            core._PC = entry
+            self.cores.append(core)
+        self.data_memory = self.cores[0].memory.data_memory if self.cores else None
+
+    def appendInput(self, address, value) :
+        """
+        stores value in the shared data memory, address is a 12 bit string like in IAS.appendInput
+        """
+        self.cores[0].appendInput(address, value)
+
+    def getStoredValue(self, address) :
+        return self.cores[0].getStoredValue(address)
+
+    def run(self, max_cycles=None) :
+        """
+        deterministic round robin until every core halted or ran max_cycles cycles, returns a MulticoreResult
+        """
+        statuses = [None] * len(self.cores)
+        cycles = [0] * len(self.cores)
+        start = time.perf_counter()
+        running = [index for index, core in enumerate(self.cores) if not core.isHalted()]
+        for index, core in enumerate(self.cores) :
+            if core.isHalted() :
+                statuses[index] = HALTED
+        while running :
+            still = []
+            for index in running :
+                budget = self.quantum if max_cycles is None else min(self.quantum, max_cycles - cycles[index])
+                result = self.cores[index].fetch(max_cycles=budget)
+                cycles[index] += result.cycles
+                if result.status == HALTED :
+                    statuses[index] = HALTED
+                elif max_cycles is not None and cycles[index] >= max_cycles :
+                    statuses[index] = BUDGET
+                else :
+                    still.append(index)
+            running = still
+        return MulticoreResult(statuses, cycles, time.perf_counter() - start)
+
+    def runParallel(self, max_cycles=None) :
+        """
+        runs every core in a process of its own over a shared copy of the data memory, from the cores'
+        current PCs. the memory is copied back and the cores get their final registers (the IBR is dropped,
+        so a core stopped by max_cycles in the middle of a word does not resume it). returns a MulticoreResult,
+        its seconds run from the first core starting to the last one finishing, process start up left out.
+        """
+        size = len(self.data_memory)
+        block = shared_memory.SharedMemory(create=True, size=8 * size)
+        words = block.buf.cast('q')
+        try :
+            for address in range(size) :
+                words[address] = self.data_memory[address]
+            barrier = multiprocessing.Barrier(len(self.cores))
+            results = multiprocessing.Queue()
+            processes = [multiprocessing.Process(target=runCore, args=(self.engine, core.memory.instructions_memory,
+                                                 core._PC, block.name, max_cycles, barrier, results, index))
+                         for index, core in enumerate(self.cores)]
+            for process in processes :
+                process.start()
+            finished = [results.get() for process in processes]
+            for process in processes :
+                process.join()
+            for address in range(size) :
+                self.data_memory[address] = words[address]
+        finally :
+            words.release()
+            block.close()
+            block.unlink()
+        failed = sorted(entry for entry in finished if entry[1] is None)
+        if failed :
+            raise RuntimeError("core {} failed: {}".format(failed[0][0], failed[0][2]))
+        statuses = [None] * len(self.cores)
+        cycles = [0] * len(self.cores)
+        for index, status, count, span, registers in finished :
+            statuses[index] = status
+            cycles[index] = count
+            core = self.cores[index]
+            core._PC, core._AC, core._MQ, core._MBR, core._IR, core._MAR = registers
+            core._IBR = None
+        spans = [entry[3] for entry in finished]
+        return MulticoreResult(statuses, cycles, max(end for start, end in spans) - min(start for start, end in spans))
+
+
+
+
+
+if __name__ == "__main__":
+    # python IASmulticore.py program.txt ... runs one core per text file with one 40 bit instruction per line
+    programs = []
+    for path in sys.argv[1:] :
+        with open(path) as handle :
+            programs.append([line.strip() for line in handle if line.strip()])
+    print(Multicore(programs).run())
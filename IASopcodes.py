@@ -1,6 +1,60 @@
 # implementation of the ias architecture.
 
+from collections import namedtuple
+import asyncio
+import time
 from bitstring import BitStream
+from IAStrace import LEFT, RIGHT
+from IASimage import packSnapshot, unpackSnapshot, unpackImage, openBuffer, writeFile, wordValue
+
+
+
+HALTED = 'halted'                                               #ran off the end of the program or executed HALT
+BUDGET = 'budget'                                               #max_cycles used up, fetch can be called again
+TIMEOUT = 'timeout'                                             #deadline passed, fetch can be called again
+CHECK_INTERVAL = 1024                                           #cycles run between two budget / deadline checks
+JUMP_RIGHT = 0b00001110                                         #JUMP M(X,20:39)
+RIGHT_JUMPS = frozenset([JUMP_RIGHT, 0b00010000])               #JUMP M(X,20:39), JUMP+ M(X,20:39): a taken jump fetches word X
+WORD_ENDS = frozenset([0b00000000, 0b00001101, 0b00001111])     #HALT, JUMP M(X,0:19), JUMP+ M(X,0:19): can skip the right half
+
+ZERO_WORD = BitStream(int=0, length=40)                         #shared zero words and registers, handlers never change a BitStream in place
+ZERO_HALF = BitStream(int=0, length=20)
+ZERO_OPCODE = BitStream(int=0, length=8)
+ZERO_ADDRESS = BitStream(int=0, length=12)
+
+RunResult = namedtuple('RunResult', ['status', 'cycles'])
+RunResult.__doc__ = """
+returned by fetch: why it stopped (HALTED, BUDGET or TIMEOUT) and the cycles it ran
+"""
+
+# the below dictionary contains all the operations of the IAS operator with their meanings.
+# the design is implented in such a way that the opcode gets decoded and compsred with the dictionary.
+# if the opcode matches a key-pair value the corresponding function gets implemented.
+# the dispatch tables of the engines (IAS.OPERATIONS, FastIAS.OPERATIONS) are built from it once per class.
+HANDLERS = {
+    '00000001': 'load',                              #00000001 LOAD M(X) Transfer M(X) to the accumulator
+    '00001010': 'loadToAC',                          #00001010 LOAD MQ Transfer contents of register MQ to the accumulator AC
+    '00001001': 'loadToMQ',                          #00001001 LOAD MQ,M(X) Transfer contents of memory location X to MQ
+    '00000010': 'loadNegative',                      #00000010 LOAD -M(X) Transfer -M(X) to the accumulator
+    '00000011': 'loadAbsolute',                      #00000011 LOAD |M(X)| Transfer absolute value of M(X) to the accumulator
+    '00100001': 'store',                             #00100001 STOR M(X) Transfer contents of accumulator to memory location X
+    '00000100': 'loadNegativeAbsolute',              #00000100 LOAD -|M(X)| Transfer -|M(X)| to the accumulator
+    '00000101': 'add',                               #00000101 ADDM(X) Add M(X) to AC; put the result in AC
+    '00000111': 'addAbsolute',                       #00000111 ADD |M(X)| Add |M(X)| to AC; put the result in AC
+    '00000110': 'sub',                               #00000110 SUB M(X) Subtract M(X) from AC; put the result in AC
+    '00001000': 'subAbsolute',                       #00001000 SUB |M(X)| Subtract |M(X)| from AC; put the remainder in AC
+    '00001011': 'multiply',                          #00001011 MUL M(X) Multiply M(X) by MQ; put most significant bits of resultin AC, put least significant bits in MQ
+    '00001100': 'divide',                            #00001100 DIV M(X) Divide AC by M(X); put the quotient in MQ and the remainder in AC
+    '00001101': 'jumpLeftInstruction',               #00001101 JUMP M(X,0:19) Take next instruction from left half of M(X)
+    '00001110': 'jumpRightInstruction',              #00001110 JUMP M(X,20:39) Take next instruction from right half of M(X)
+    '00001111': 'conditionalJumpLeft',               #JUMP+M(X,0:19) If number in the accumulator is nonnegative, take next instruction from left half of M(X)
+    '00010000': 'conditionalJumpRight',              #JUMP+M(X,20:39) If number in the accumulator is nonnegative , take next instruction from right half of M(X)
+    '00010100': 'leftShift',                         #00010100 LSH Multiply accumulator by 2; i.e., shift left one bit position
+    '00010101': 'rightShift',                        #00010101 RSH Divide accumulator by 2; i.e., shift right one position
+    '00010010': 'storeLeft',                         #00010010 STOR M(X,8:19) Replace left address field at M(X) by 12 rightmost bits of AC
+    '00010011': 'storeRight',                        #00010011 STOR M(X,28:39) Replace right address field at M(X) by 12 rightmost bits of AC
+    '00000000': 'halt',                              #00000000 HALT Halt all the ongoing operations
+}
 
 
 
@@ -9,9 +63,12 @@ class Memory :
     Memory class for the IAS Architecture
     """
 
+    __slots__ = ('instructions_memory', 'data_memory')
+    codeBase = None                                             #data address of instruction 0 when code and data share one address space
+
     def __init__(self):
         self.instructions_memory = []
-        self.data_memory = [BitStream(int=0,length=40)] * 1000
+        self.data_memory = [ZERO_WORD] * 1000
     
     def setDataMemory(self,elDM) :
         self.data_memory = elDM
@@ -25,6 +82,19 @@ class Memory :
     def getInstructionsMemory(self) :
         return self.instructions_memory
 
+    def reset(self) :
+        """
+        empties the instructions and zeroes the data words so the memory can be used for a new program
+        """
+        self.instructions_memory = []
+        self.data_memory = [ZERO_WORD] * 1000
+
+    def watch(self,invalidate) :
+        """
+        the engines pass their invalidate here, a memory whose data writes can change instructions
+        (IASmemory.UnifiedMemory) calls it with the instruction address. nothing to do for split memories.
+        """
+
 
 
 
@@ -34,52 +104,50 @@ class IAS :
     Implement the IAS computer (fetch the instruction, decode and execute) 
     Implement any assembly program of your choice to test the design
     '''
-    def __init__(self) -> None :
+    __slots__ = ('memory', '__PC', '__AC', '__MQ', '__MBR', '__IR', '__MAR', '__IBR', '__decoded', '__decodedFor')
+
+    def __init__(self, memory=None) -> None :
         '''
         constructor for : 
         memory, Accumualtor, ProgramCounter, MultiplierQuotient, MBR, MAR, IR and IBR.
+        memory defaults to a new Memory, any Memory (e.g. IASmemory.SparseMemory) can be passed in.
         '''
-        self.memory = Memory()
+        self.memory = Memory() if memory is None else memory
         self.__PC  = 0                                              #Program counter   
-        self.__AC  = BitStream(int=0, length=40)                    #Accumulator         Employed to hold temporarily operands and results of ALU operations.  
-        self.__MQ  = BitStream(int=0, length=40)                    #Multiplier Quotient Employed to hold temporarily operands and results of ALU operations.
-        self.__MBR = BitStream(int=0, length=40)                    #Contains a word to be stored in memory or sent to the I/O unit, or is used to receive a word from memory or from the I/O unit.
-        self.__IR  = BitStream(int=0, length=8)                     #Contains the 8-bit opcode instruction being executed.
-        self.__MAR = BitStream(int=0, length=12)                    #Specifies the address in memory of the word to be written from or read into the MBR.
+        self.__AC  = ZERO_WORD                                      #Accumulator         Employed to hold temporarily operands and results of ALU operations.  
+        self.__MQ  = ZERO_WORD                                      #Multiplier Quotient Employed to hold temporarily operands and results of ALU operations.
+        self.__MBR = ZERO_WORD                                      #Contains a word to be stored in memory or sent to the I/O unit, or is used to receive a word from memory or from the I/O unit.
+        self.__IR  = ZERO_OPCODE                                    #Contains the 8-bit opcode instruction being executed.
+        self.__MAR = ZERO_ADDRESS                                   #Specifies the address in memory of the word to be written from or read into the MBR.
         self.__IBR = ""                                             #Instruction Buffer.
+        self.__decoded = {}                                         #predecoded words by address, see predecode
+        self.__decodedFor = None                                    #instructions_memory the cache was built for
+        self.memory.watch(self.invalidate)
 
-        
-        # the below dictionary contains all the operations of the IAS operator with their meanings.
-        # the design is implented in such a way that the opcode gets decoded and compsred with the dictionary.
-        # if the opcode matches a key-pair value the corresponding function gets implemented.
 
-        
-        self.operations = {
-            '00000001': self.load,                           #00000001 LOAD M(X) Transfer M(X) to the accumulator
-            '00001010': self.loadToAC,                       #00001010 LOAD MQ Transfer contents of register MQ to the accumulator AC
-            '00001001': self.loadToMQ,                       #00001001 LOAD MQ,M(X) Transfer contents of memory location X to MQ 
-            '00000010': self.loadNegative,                   #00000010 LOAD -M(X) Transfer -M(X) to the accumulator
-            '00000011': self.loadAbsolute,                   #00000011 LOAD |M(X)| Transfer absolute value of M(X) to the accumulator
-            '00100001': self.store,                          #00100001 STOR M(X) Transfer contents of accumulator to memory location X
-            '00000100': self.loadNegativeAbsolute,           #00000100 LOAD -|M(X)| Transfer -|M(X)| to the accumulator
-            '00000101': self.add,                            #00000101 ADDM(X) Add M(X) to AC; put the result in AC
-            '00000111': self.addAbsolute,                    #00000111 ADD |M(X)| Add |M(X)| to AC; put the result in AC
-            '00000110': self.sub,                            #00000110 SUB M(X) Subtract M(X) from AC; put the result in AC
-            '00001000': self.subAbsolute,                    #00001000 SUB |M(X)| Subtract |M(X)| from AC; put the remainder in AC
-            '00001011': self.multiply,                       #00001011 MUL M(X) Multiply M(X) by MQ; put most significant bits of resultin AC, put least significant bits in MQ
-            '00001100': self.divide,                         #00001100 DIV M(X) Divide AC by M(X); put the quotient in MQ and the remainder in AC
-            '00001001': self.loadToMQ,                       #LOAD MQ,M(X) Transfer contents of memory location X to MQ
-            '00001010': self.loadToAC,                       #LOAD MQ Transfer contents of address MQ to the accumulator AC
-            '00001101': self.jumpLeftInstruction,            #00001101 JUMP M(X,0:19) Take next instruction from left half of M(X)
-            '00001110': self.jumpRightInstruction,           #00001110 JUMP M(X,20:39) Take next instruction from right half of M(X)
-            '00001111': self.conditionalJumpLeft,            #JUMP+M(X,0:19) If number in the accumulator is nonnegative, take next instruction from left half of M(X)
-            '00010000': self.conditionalJumpRight,           #JUMP+M(X,20:39) If number in the accumulator is nonnegative , take next instruction from right half of M(X)
-            '00010100': self.leftShift,                      #00010100 LSH Multiply accumulator by 2; i.e., shift left one bit position
-            '00010101': self.rightShift,                     #00010101 RSH Divide accumulator by 2; i.e., shift right one position
-            '00010010': self.storeLeft,                      #00010010 STOR M(X,8:19) Replace left address field at M(X) by 12 rightmost bits of AC
-            '00010011': self.storeRight,                     #00010011 STOR M(X,28:39) Replace right address field at M(X) by 12 rightmost bits of AC
-            '00000000': self.halt,                           #00000000 HALT Halt all the ongoing operations
-        }
+    def __init_subclass__(cls, **kwargs) :
+        """
+        gives every subclass its own dispatch table so overridden handlers are used
+        """
+        super().__init_subclass__(**kwargs)
+        cls.OPERATIONS = dispatchTable(cls)
+
+
+    @property
+    def operations(self) :
+        """
+        read only {opcode: bound handler} table of the original API, built on every read.
+        the engine itself dispatches through OPERATIONS and handler()
+        """
+        return {opcode: function.__get__(self) for opcode, function in self.OPERATIONS.items()}
+
+
+    def handler(self,opcode) :
+        """
+        handler of an 8 character opcode bound to this machine, invalid for unknown opcodes
+        """
+        function = self.OPERATIONS.get(opcode)
+        return self.invalid if function is None else function.__get__(self)
 
 
     def appendInstructions(self,inputInstruction) :
@@ -99,55 +167,271 @@ class IAS :
         self.__IR = rightOpCode
         self.__MAR = rightAddress
         self.decode(inputInstruction[20:28],inputInstruction[28:])
+        self.__IBR = ""
         self.__PC += 1                                         #increment program counter after instruction is done.
     
 
 
-    def fetch(self) :
+    def fetch(self,max_cycles=None,deadline=None,trace=None,timing=None,profile=None) :
         """
         Executes the fetch cycle of the IAS implementation wrt the PC and calls the corresponding execute.
         Done wrt to program counter.
-        """
-        flag = 1
-        while self.__PC < len(self.memory.instructions_memory):
-            self.__MAR = self.__PC 
-            self.__MBR = self.memory.instructions_memory[self.__MAR]    
-            self.__PC += 1                          #increment program counter after instruction is done.
-            #print(self.__PC)
-            leftOpCode = self.memory.instructions_memory[self.__MAR][:8]                    
-            rightOpCode = self.memory.instructions_memory[self.__MAR][20:28]    
-            leftAddress = self.memory.instructions_memory[self.__MAR][8:20]    
-            rightAddress = self.memory.instructions_memory[self.__MAR][28:]    
-            #self.__IBR = self.__MBR[20:]
-
-            
-            #Both LHs and RHS there
+        Runs until the program halts, max_cycles cycles have run or time.monotonic() has passed deadline and
+        returns a RunResult. The limits are checked every CHECK_INTERVAL cycles, a stopped machine carries on
+        where it left off on the next call. Every executed half instruction is recorded in trace when an
+        IAStrace.TraceBuffer is given, memory fetches and executed opcodes are counted in timing when an
+        IAStiming.CycleCounter is given, and every half is handed to profile when an IASprofile.Profiler
+        is given (one of the three at a time).
+        """
+        if (trace is not None) + (timing is not None) + (profile is not None) > 1 :
+            raise ValueError("only one of trace, timing and profile can be used in a run")
+        if self.__decodedFor is not self.memory.instructions_memory :
+            self.invalidate()
+        cycles = 0
+        while not self.isHalted() :
+            limit = CHECK_INTERVAL if max_cycles is None else min(CHECK_INTERVAL, max_cycles - cycles)
+            if limit <= 0 :
+                return RunResult(BUDGET, cycles)
+            if deadline is not None and time.monotonic() >= deadline :
+                return RunResult(TIMEOUT, cycles)
+            if trace is not None :
+                cycles += self.traceCycles(limit, trace)
+            elif timing is not None :
+                cycles += self.timedCycles(limit, timing)
+            elif profile is not None :
+                cycles += self.profileCycles(limit, profile)
+            else :
+                cycles += self.runCycles(limit)
+        return RunResult(HALTED, cycles)
+
+
+    def isHalted(self) :
+        """
+        True once the PC is past the program (end reached or HALT) and no right half is pending
+        """
+        return self.__IBR == "" and self.__PC >= len(self.memory.instructions_memory)
+
+
+    def runCycles(self,limit) :
+        """
+        runs at most limit cycles and returns how many ran, one cycle fetches a word and executes it or
+        executes the right half a jump left in the IBR
+        """
+        for cycle in range(limit) :
+            #fetch a new word only when the IBR holds no pending right hand instruction
             if self.__IBR == "" :
-                self.__IBR = self.__MBR[20:]
-                self.__IR = self.__MBR[:8]
-                self.__MAR = self.__MBR[8:20]
-                #print(self.__IBR,self.__IR,self.__MAR)
-                #print(type(self.__IR),type(self.__MAR),type(self.__IBR))
-                # self.__IR = self.__IBR[0:8]
-                # self.__MAR = self.__IBR[8:]
-                # self.__IBR = ""
-                # print(self.__IBR,self.__IR,self.__MAR)
-                # self.decode(self.__IR,self.__MAR)
-                self.decode(self.__IR,self.__MAR)
+                if self.__PC >= len(self.memory.instructions_memory) :
+                    return cycle
+                self.__MAR = self.__PC 
+                entry = self.__decoded.get(self.__MAR) or self.predecode(self.__MAR)
+                self.__MBR = entry[0]
+                self.__PC += 1                          #increment program counter after instruction is done.
+                #print(self.__PC)
+                self.__IBR = entry[2]
+                handler, address = entry[1]
+                handler(address)
                 #print(self.__AC.int)
             
             #only RHS there
             if self.__IBR != "" :
-                self.__IR = self.__IBR[0:8]
-                self.__MAR = self.__IBR[8:]
-                #print(type(self.__IR),type(self.__MAR))
-                #print(self.__IR,self.__MAR)
-                #print(self.__IBR,self.__IR,self.__MAR)
-                #print(type(self.__IR),type(self.__MAR))
-                self.decode(self.__IR,self.__MAR)
-                self.__IBR = ""
+                handler, address, half = self.__IBR
+                self.__IBR = ""                         #cleared before executing so a jump to a right half can refill it
+                handler(address)
                 #print(self.__AC.int)
-            
+        return limit
+
+
+    def traceCycles(self,limit,trace) :
+        """
+        runCycles that also records PC, opcode, operand, AC and MQ of every half in trace, see IAStrace
+        """
+        for cycle in range(limit) :
+            if self.__IBR == "" :
+                if self.__PC >= len(self.memory.instructions_memory) :
+                    return cycle
+                self.__MAR = address = self.__PC
+                entry = self.__decoded.get(self.__MAR) or self.predecode(self.__MAR)
+                self.__MBR = entry[0]
+                self.__PC += 1
+                self.__IBR = entry[2]
+                handler, operand = entry[1]
+                handler(operand)
+                trace.record(address, LEFT, int(entry[0][:8],2), operand, self.__AC.int, self.__MQ.int)
+
+            if self.__IBR != "" :
+                handler, operand, half = self.__IBR
+                self.__IBR = ""
+                address = self.__PC - 1
+                handler(operand)
+                trace.record(address, RIGHT, int(half[:8],2), operand, self.__AC.int, self.__MQ.int)
+        return limit
+
+
+    def timedCycles(self,limit,timing) :
+        """
+        runCycles that counts the words fetched from memory and the halves executed per opcode in timing.
+        a right half runs from the IBR without a fetch, a taken jump to a right half fetches its word.
+        """
+        executed = timing.executed
+        fetched = 0
+        for cycle in range(limit) :
+            if self.__IBR == "" :
+                if self.__PC >= len(self.memory.instructions_memory) :
+                    limit = cycle
+                    break
+                self.__MAR = self.__PC
+                entry = self.__decoded.get(self.__MAR) or self.predecode(self.__MAR)
+                self.__MBR = entry[0]
+                self.__PC += 1
+                self.__IBR = entry[2]
+                handler, address = entry[1]
+                handler(address)
+                opcode = int(entry[0][:8],2)
+                executed[opcode] += 1
+                fetched += 1 + (opcode in RIGHT_JUMPS and (opcode == JUMP_RIGHT or self.__AC.int >= 0))
+
+            if self.__IBR != "" :
+                handler, address, half = self.__IBR
+                self.__IBR = ""
+                handler(address)
+                opcode = int(half[:8],2)
+                executed[opcode] += 1
+                fetched += opcode in RIGHT_JUMPS and (opcode == JUMP_RIGHT or self.__AC.int >= 0)
+        timing.fetched += fetched
+        return limit
+
+
+    def profileCycles(self,limit,profile) :
+        """
+        runCycles that hands every half to profile.execute with its position and the sign of AC before it ran
+        """
+        execute = profile.execute
+        for cycle in range(limit) :
+            if self.__IBR == "" :
+                if self.__PC >= len(self.memory.instructions_memory) :
+                    return cycle
+                self.__MAR = address = self.__PC
+                entry = self.__decoded.get(self.__MAR) or self.predecode(self.__MAR)
+                self.__MBR = entry[0]
+                self.__PC += 1
+                self.__IBR = entry[2]
+                handler, operand = entry[1]
+                execute(handler, operand, (address, 'L'), self.__AC.int >= 0)
+
+            if self.__IBR != "" :
+                handler, operand, half = self.__IBR
+                self.__IBR = ""
+                execute(handler, operand, (self.__PC - 1, 'R'), self.__AC.int >= 0)
+        return limit
+
+
+    async def run(self,yield_every=CHECK_INTERVAL,max_cycles=None) :
+        """
+        asyncio version of fetch, gives the event loop a turn every yield_every cycles so other
+        coroutines (and other machines) are not starved by a long program. returns a RunResult.
+        """
+        if yield_every < 1 :
+            raise ValueError("yield_every has to be at least 1 cycle")
+        cycles = 0
+        while True :
+            budget = yield_every if max_cycles is None else min(yield_every, max_cycles - cycles)
+            result = self.fetch(max_cycles=budget)
+            cycles += result.cycles
+            if result.status == HALTED :
+                return RunResult(HALTED, cycles)
+            if max_cycles is not None and cycles >= max_cycles :
+                return RunResult(BUDGET, cycles)
+            await asyncio.sleep(0)
+
+
+    def reset(self,program=None) :
+        """
+        puts the machine back in the state of a new one, the Memory object is kept and cleared.
+        program (a list of 40 bit instructions) is loaded into the cleared memory when given.
+        """
+        self.memory.reset()
+        self.__PC  = 0
+        self.__AC  = ZERO_WORD
+        self.__MQ  = ZERO_WORD
+        self.__MBR = ZERO_WORD
+        self.__IR  = ZERO_OPCODE
+        self.__MAR = ZERO_ADDRESS
+        self.__IBR = ""
+        if program is not None :
+            self.memory.setInstructionsMemory(list(program))
+        self.invalidate()
+
+
+
+    def predecode(self,address) :
+        """
+        decodes the word at address once into its word and a (handler, operand) pair per half and caches it,
+        the right half also keeps its 20 bits so it can be parked in the IBR as it is.
+        fetch looks words up in the cache, storeLeft and storeRight drop the entry of the word they modify.
+        """
+        word = self.memory.instructions_memory[address]
+        entry = (word,
+                 (self.handler(word[:8]), int(word[8:20],2)),
+                 (self.handler(word[20:28]), int(word[28:40],2), word[20:40]))
+        self.__decoded[address] = entry
+        return entry
+
+
+    def invalidate(self,address=None) :
+        """
+        drops the predecoded entry of one address, or all of them when no address is given.
+        needed when instructions_memory is changed from outside the machine.
+        """
+        if address is None :
+            self.__decoded = {}
+            self.__decodedFor = self.memory.instructions_memory
+        else :
+            self.__decoded.pop(address, None)
+
+
+
+    def snapshot(self,path=None) :
+        """
+        packs PC, AC, MQ, MBR, MAR, IR, IBR and both memories into the IASimage snapshot format (5 bytes per word).
+        the snapshot is returned and also written to path when one is given.
+        """
+        registers = {'PC': self.__PC, 'AC': self.__AC.int, 'MQ': self.__MQ.int, 'MBR': wordValue(self.__MBR),
+                     'MAR': wordValue(self.__MAR), 'IR': wordValue(self.__IR),
+                     'IBR': None if self.__IBR == "" else int(self.__IBR[2], 2)}
+        payload = packSnapshot(registers, self.memory.instructions_memory, self.memory.data_memory)
+        return payload if path is None else writeFile(path, payload)
+
+
+    def restore(self,source) :
+        """
+        restores a state written by snapshot, source is the snapshot bytes or a file path.
+        the BitStream engine copies both memories into lists, FastIAS.restore keeps them packed.
+        """
+        registers, instructions, data = unpackSnapshot(openBuffer(source), bits=True)
+        self.memory.setInstructionsMemory(list(instructions))
+        self.memory.setDataMemory([BitStream(int=value, length=40) for value in data])
+        self.invalidate()
+        self.__PC = registers['PC']
+        self.__AC = BitStream(int=registers['AC'], length=40)
+        self.__MQ = BitStream(int=registers['MQ'], length=40)
+        self.__MBR = format(registers['MBR'] & ((1 << 40) - 1), '040b')
+        self.__MAR = registers['MAR']
+        self.__IR = format(registers['IR'] & 0xFF, '08b')
+        self.__IBR = ""
+        if registers['IBR'] is not None :
+            half = format(registers['IBR'], '020b')
+            self.__IBR = (self.handler(half[:8]), int(half[8:], 2), half)
+
+
+
+    def loadImage(self,source) :
+        """
+        loads a program image written by IASimage.writeImage, source is the image bytes or a file path.
+        """
+        instructions, data = unpackImage(openBuffer(source), bits=True)
+        self.memory.setInstructionsMemory(list(instructions))
+        self.memory.setDataMemory([BitStream(int=value, length=40) for value in data])
+        self.invalidate()
 
 
 
@@ -195,9 +479,16 @@ class IAS :
         """
         #self.operations[opcode](int(address,2))
         #self.operations[opcode](address.int)
-        self.operations.get(opcode, lambda: 'Invalid')(int(address,2))
+        self.handler(opcode)(int(address,2))
 
     
+    def invalid(self) :
+        """
+        stands in for opcodes missing from OPERATIONS, takes no address so calling it raises like decode does
+        """
+        return 'Invalid'
+
+
     def loadToAC(self,address) :
         """
         Transfer contents of register MQ to the accumulator AC
@@ -245,7 +536,7 @@ class IAS :
         """
         Transfer -|M(X)| to the accumulator
         """
-        self.AC = BitStream(int = -abs(self.memory.data_memory[address].int),length=40)
+        self.__AC = BitStream(int = -abs(self.memory.data_memory[address].int),length=40)
 
 
     def add(self,address) :
@@ -308,7 +599,7 @@ class IAS :
         """
         Take next instruction from right half of M(X)
         """
-        self.decode(self.memory.instructions_memory[address][20:28],(self.memory.instructions_memory[address][28:]))
+        self.__IBR = self.predecode(address)[2]
         self.__PC = address + 1
 
 
@@ -321,7 +612,7 @@ class IAS :
 
     def conditionalJumpRight(self,address) :
         if(self.__AC.int >= 0) :
-            self.decode(self.memory.instructions_memory[address][20:28],(self.memory.instructions_memory[address][28:]))
+            self.__IBR = self.predecode(address)[2]
             self.__PC = address + 1
 
     
@@ -329,28 +620,32 @@ class IAS :
         """
         Multiply accumulator by 2; i.e., shift left one bit position
         """
-        self.__AC <<= 1
+        self.__AC = self.__AC << 1
 
 
     def rightShift(self, address) :
         """
         Divide accumulator by 2; i.e., shift right one position
         """ 
-        self.__AC >>= 1
+        self.__AC = self.__AC >> 1
 
 
     def storeLeft(self, address) :   
         """
         Replace left address field at M(X) by 12 rightmost bits of AC
         """
-        self.memory.instructions_memory[address][8:20] = self.__AC[28:]
+        word = self.memory.instructions_memory[address]
+        self.memory.instructions_memory[address] = word[:8] + self.__AC[28:].bin + word[20:]
+        self.invalidate(address)
 
 
     def storeRight(self, address) : 
         """
         Replace right address field at M(X) by 12 rightmost bits of AC
         """
-        self.memory.instructions_memory[address][28:] = self.__AC[28:]
+        word = self.memory.instructions_memory[address]
+        self.memory.instructions_memory[address] = word[:28] + self.__AC[28:].bin
+        self.invalidate(address)
 
     
     def getAccumulator(self) :
@@ -396,17 +691,29 @@ class IAS :
         """
         Halt all the ongoing operations
         """
-        self.__AC = BitStream(int=0, length=40) 
-        self.__MQ = BitStream(int=0, length=40) 
+        self.__AC = ZERO_WORD
+        self.__MQ = ZERO_WORD
         self.__PC = len(self.memory.instructions_memory) + 63            # I like 63(Roll number) hence the number.Basically used to break loop
         self.__IBR = "" 
-        self.__IR = BitStream(int=0, length=8) 
-        self.__MAR = BitStream(int=0, length=12) 
-        self.__MBR = BitStream(int=0, length=20) 
+        self.__IR = ZERO_OPCODE
+        self.__MAR = ZERO_ADDRESS
+        self.__MBR = ZERO_HALF
         
 
 
 
+def dispatchTable(cls) :
+    """
+    {8 character opcode: handler function} of an engine class, bound to a machine by IAS.handler
+    """
+    return {opcode: getattr(cls, name) for opcode, name in HANDLERS.items()}
+
+
+IAS.OPERATIONS = dispatchTable(IAS)
+
+
+
+
 
 if __name__ == "__main__":
     pass 
@@ -0,0 +1,83 @@
+# runs many independent ias jobs on a process pool.
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+import os
+from IASfast import FastIAS
+
+
+
+def runJob(engine,instructions,inputs,outputs) :
+    """
+    runs one job on a fresh machine and returns {address: value} for every address in outputs.
+    inputs maps addresses to values, addresses are 12 bit strings like in IAS.appendInput.
+    """
+    machine = engine()
+    for address, value in inputs.items() :
+        machine.appendInput(address, value)
+    machine.memory.setInstructionsMemory(list(instructions))
+    machine.fetch()
+    return {address: machine.getStoredValue(address) for address in outputs}
+
+
+def runChunk(engine,programs,chunk) :
+    """
+    worker side of run_many, chunk holds (program index, inputs, outputs) so every program is pickled once per chunk
+    """
+    return [runJob(engine, programs[index], inputs, outputs) for index, inputs, outputs in chunk]
+
+
+def packChunk(jobs) :
+    """
+    splits a list of (instructions, inputs, outputs) jobs into the distinct programs and the jobs referring to them
+    """
+    programs = []
+    seen = {}
+    chunk = []
+    for instructions, inputs, outputs in jobs :
+        key = id(instructions)
+        if key not in seen :
+            seen[key] = len(programs)
+            programs.append(tuple(instructions))
+        chunk.append((seen[key], dict(inputs), tuple(outputs)))
+    return programs, chunk
+
+
+def run_many(jobs,workers=None,chunksize=64,ordered=True,engine=FastIAS) :
+    """
+    runs (instructions, inputs, outputs) jobs on a ProcessPoolExecutor with workers processes.
+    Jobs are sent in chunks of chunksize and at most two chunks per worker are in flight, so jobs can be a generator.
+    Yields the {address: value} result of every job, in submission order when ordered is True,
+    otherwise (job index, result) pairs as soon as their chunk is done.
+    """
+    workers = workers or os.cpu_count() or 1
+    jobs = iter(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool :
+        pending = deque()
+        start = 0
+        while True :
+            while len(pending) < 2 * workers :
+                chunk = list(islice(jobs, chunksize))
+                if not chunk :
+                    break
+                pending.append((start, pool.submit(runChunk, engine, *packChunk(chunk))))
+                start += len(chunk)
+            if not pending :
+                return
+            if ordered :
+                first, future = pending.popleft()
+                yield from future.result()
+                continue
+            done, waiting = wait([future for first, future in pending], return_when=FIRST_COMPLETED)
+            for first, future in [entry for entry in pending if entry[1] in done] :
+                pending.remove((first, future))
+                for offset, result in enumerate(future.result()) :
+                    yield first + offset, result
+
+
+
+
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,146 @@
+# peephole optimizer and superinstructions for the integer ias engine.
+
+from collections import namedtuple
+import sys
+import types
+from IASfast import FastIAS, parseWord, ADDRESS_MASK
+from IASblocks import TEMPLATES
+from IASanalysis import modifiedWords
+
+
+
+LOADS_AC = frozenset([0b00000001, 0b00000010, 0b00000011, 0b00000100])   #set AC from M(X) without reading AC or MQ
+LOAD = 0b00000001
+LOAD_MQ = 0b00001001                                            #LOAD MQ,M(X)
+STORE = 0b00100001
+NAMES = {opcode: handler.__name__ for opcode, handler in enumerate(FastIAS.OPERATIONS)}
+SUPERINSTRUCTIONS = {}                                          #opcode tuple -> compiled handler, shared by all machines
+
+PeepholeReport = namedtuple('PeepholeReport', ['words', 'fused', 'dropped'])
+PeepholeReport.__doc__ = """
+static effect of the optimizer on a program: words, words running as one superinstruction and
+halves dropped as no-ops
+"""
+
+
+
+def simplify(left, right, dataWords) :
+    """
+    peephole rules for the two straight line halves of a word, given as (opcode, operand) pairs.
+    returns the halves that still have to run:
+        STOR M(X) ; LOAD M(X)            the LOAD reads back the AC it just stored
+        STOR M(X) ; STOR M(X)            the second store writes the same value again
+        LOAD ... M(X) ; LOAD ... M(Y)    the first AC load is overwritten before anything uses it
+        LOAD MQ,M(X) ; LOAD MQ,M(Y)      same for MQ
+    a half is only dropped when its address is inside the data memory, so a bad address still raises.
+    """
+    (leftOpcode, leftOperand), (rightOpcode, rightOperand) = left, right
+    if leftOpcode == STORE and rightOperand == leftOperand and rightOpcode in (LOAD, STORE) :
+        return [left]
+    if leftOperand < dataWords and ((leftOpcode in LOADS_AC and rightOpcode in LOADS_AC) or
+                                    (leftOpcode == LOAD_MQ and rightOpcode == LOAD_MQ)) :
+        return [right]
+    return [left, right]
+
+
+def superinstruction(opcodes) :
+    """
+    compiled handler running the straight line opcodes one after the other from the BlockIAS templates.
+    it takes the machine and a tuple with one operand per opcode, clears the IBR so the fetch loop does
+    not run the right half again, and is compiled once per opcode sequence.
+    """
+    handler = SUPERINSTRUCTIONS.get(opcodes)
+    if handler is None :
+        name = "_".join(NAMES[opcode] for opcode in opcodes)
+        lines = ["def %s(self, operands) :" % name,
+                 "    %s, = operands" % ", ".join("X%d" % index for index in range(len(opcodes))),
+                 "    M = self.memory.data_memory",
+                 "    AC = self._AC",
+                 "    MQ = self._MQ"]
+        for index, opcode in enumerate(opcodes) :
+            lines.extend("    " + line.format(X="X%d" % index) for line in TEMPLATES[opcode])
+        lines.extend(["    self._AC = AC",
+                      "    self._MQ = MQ",
+                      "    self._IBR = None"])
+        namespace = {}
+        exec(compile("\n".join(lines), "<IAS superinstruction %s>" % name, "exec"), namespace)
+        handler = SUPERINSTRUCTIONS[opcodes] = namespace[name]
+    return handler
+
+
+def optimizeWord(word, dataWords) :
+    """
+    (opcodes, operands) of the superinstruction replacing word, or None when a half is not straight line code
+    """
+    word = parseWord(word)
+    left = ((word >> 32) & 0xFF, (word >> 20) & ADDRESS_MASK)
+    right = ((word >> 12) & 0xFF, word & ADDRESS_MASK)
+    if left[0] not in TEMPLATES or right[0] not in TEMPLATES :
+        return None
+    halves = simplify(left, right, dataWords)
+    return tuple(opcode for opcode, operand in halves), tuple(operand for opcode, operand in halves)
+
+
+def report(instructions, dataWords=1000) :
+    """
+    PeepholeReport of instructions, counted over the program text
+    """
+    fused = dropped = 0
+    for word in instructions :
+        optimized = optimizeWord(word, dataWords)
+        if optimized is not None :
+            fused += 1
+            dropped += 2 - len(optimized[0])
+    return PeepholeReport(len(instructions), fused, dropped)
+
+
+
+
+class PeepholeIAS(FastIAS) :
+    '''
+    FastIAS that rewrites every predecoded word whose two halves are straight line code into one
+    superinstruction: the peephole rules of simplify drop no-op halves and both halves run in one
+    compiled handler instead of two dispatches. Words still take one cycle each and PC, IBR, MBR and
+    memory go through the same states as in FastIAS after every word. Traces and profiles of a
+    PeepholeIAS run show a superinstruction as one left half.
+    A jump to the right half of a fused word gets the original right half. Words rewritten by storeLeft /
+    storeRight (IASanalysis.modifiedWords) are left alone, they would be fused again after every rewrite.
+    '''
+    __slots__ = ('_modified',)
+    def __init__(self, memory=None) -> None :
+        super().__init__(memory)
+        self._modified = set()                                      #words rewritten by the program, never fused
+
+
+    def predecode(self,address) :
+        """
+        FastIAS.predecode with the left handler replaced by a superinstruction where one applies,
+        the right half triple is kept for jumps to the right half.
+        """
+        entry = super().predecode(address)
+        if address in self._modified :
+            return entry
+        optimized = optimizeWord(entry[0], len(self.memory.data_memory))
+        if optimized is not None :
+            opcodes, operands = optimized
+            entry = (entry[0], types.MethodType(superinstruction(opcodes), self), operands, entry[3])
+            self._decoded[address] = entry
+        return entry
+
+
+    def invalidate(self,address=None) :
+        """
+        FastIAS.invalidate, a new program also gets its rewritten words looked up
+        """
+        super().invalidate(address)
+        if address is None :
+            self._modified = modifiedWords(self.memory.instructions_memory, self.memory.codeBase)
+
+
+
+
+
+if __name__ == "__main__":
+    # python IASpeephole.py program.txt prints what the optimizer does to a text file with one 40 bit instruction per line
+    with open(sys.argv[1]) as handle :
+        print(report([line.strip() for line in handle if line.strip()]))
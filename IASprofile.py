@@ -0,0 +1,100 @@
+# per opcode and per address profiling of ias programs.
+
+from collections import Counter, defaultdict
+import json
+import time
+
+
+
+CONDITIONAL_JUMPS = ('conditionalJumpLeft', 'conditionalJumpRight')
+
+
+
+class Profiler :
+    """
+    Profiles an IAS or FastIAS run: executions per opcode and per half word, taken / not taken counts of the
+    conditional jumps and wall time spent in every handler.
+    Profiling is switched on by calling profiler.run(machine) instead of machine.fetch(), or fetch(profile=profiler).
+    The engines run it in their own copy of the fetch loop (profileCycles) so the normal loop stays free of any checks.
+    """
+
+    def __init__(self) :
+        self.opcodes = Counter()                                #handler name -> executions
+        self.seconds = Counter()                                #handler name -> wall time in the handler
+        self.addresses = Counter()                              #(word address, 'L' or 'R') -> executions
+        self.handlers = {}                                      #(word address, 'L' or 'R') -> handler name
+        self.branches = defaultdict(lambda: [0, 0])             #(word address, 'L' or 'R') -> [taken, not taken]
+        self.wallTime = 0.0
+
+
+    def run(self, machine, max_cycles=None) :
+        """
+        runs machine like fetch and records every executed half instruction, returns the RunResult
+        """
+        started = time.perf_counter()
+        result = machine.fetch(max_cycles=max_cycles, profile=self)
+        self.wallTime += time.perf_counter() - started
+        return result
+
+
+    def execute(self, handler, operand, position, nonNegative) :
+        """
+        executes one half instruction for profileCycles and records it, nonNegative is AC >= 0 before it ran
+        """
+        name = handler.__name__
+        if name in CONDITIONAL_JUMPS :
+            self.branches[position][0 if nonNegative else 1] += 1
+        start = time.perf_counter()
+        handler(operand)
+        self.seconds[name] += time.perf_counter() - start
+        self.opcodes[name] += 1
+        self.addresses[position] += 1
+        self.handlers[position] = name
+
+
+    def report(self) :
+        """
+        the profile as a dict that can be written with json
+        """
+        return {
+            'instructions' : sum(self.opcodes.values()),
+            'wallTime' : self.wallTime,
+            'opcodes' : {name: {'count': count, 'seconds': self.seconds[name]} for name, count in self.opcodes.most_common()},
+            'addresses' : {'%d%s' % position: count for position, count in self.addresses.most_common()},
+            'branches' : {'%d%s' % position: {'taken': taken, 'notTaken': notTaken}
+                          for position, (taken, notTaken) in sorted(self.branches.items())},
+        }
+
+
+    def writeJSON(self, path) :
+        """
+        writes report() to path
+        """
+        with open(path, 'w') as handle :
+            json.dump(self.report(), handle, indent=2)
+
+
+    def table(self, top=10) :
+        """
+        readable hot spot table: the most executed half words and the opcodes taking the most time
+        """
+        total = sum(self.opcodes.values()) or 1
+        lines = ["{:>8} {:>10} {:>7}  {}".format('address', 'count', 'share', 'instruction')]
+        for position, count in self.addresses.most_common(top) :
+            name = self.handlers[position]
+            if position in self.branches :
+                taken, notTaken = self.branches[position]
+                name += ' (taken {}, not taken {})'.format(taken, notTaken)
+            lines.append("{:>7}{} {:>10} {:>6.1f}%  {}".format(position[0], position[1], count, 100.0 * count / total, name))
+        lines.append("")
+        lines.append("{:<24} {:>10} {:>12}".format('opcode', 'count', 'seconds'))
+        for name, seconds in self.seconds.most_common(top) :
+            lines.append("{:<24} {:>10} {:>12.6f}".format(name, self.opcodes[name], seconds))
+        return "\n".join(lines)
+
+
+
+
+
+if __name__ == "__main__":
+    pass
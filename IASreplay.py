@@ -0,0 +1,208 @@
+# time travel over recorded ias runs: periodic checkpoints, seek and step back.
+
+from bisect import bisect_right
+from collections import namedtuple
+import copy
+import sys
+from IASopcodes import RunResult, HALTED, BUDGET
+from IASfast import FastIAS
+
+
+
+INTERVAL = 4096                                                 #cycles between checkpoints at the start of a recording
+BUDGET_WORDS = 1 << 20                                          #words the checkpoints may hold by default
+REGISTER_WORDS = 8                                              #words counted for the registers of a checkpoint
+DIFF_CHUNK = 64                                                 #words compared at once when looking for changed words
+
+Checkpoint = namedtuple('Checkpoint', ['cycle', 'registers', 'data', 'code'])
+Checkpoint.__doc__ = """
+state of a recorded run after cycle cycles: (PC, AC, MQ, MBR, IR, MAR, IBR) and {address: (before, after)}
+of the data words and instruction words changed since the checkpoint before it
+"""
+
+
+
+def mergeDeltas(first, second) :
+    """
+    one delta doing first and then second, words that end up unchanged are left out
+    """
+    merged = dict(first)
+    for address, (before, after) in second.items() :
+        if address in merged :
+            before = merged[address][0]
+        if before == after :
+            merged.pop(address, None)
+        else :
+            merged[address] = (before, after)
+    return merged
+
+
+def diffWords(words, previous) :
+    """
+    {address: (before, after)} of the words that differ from previous, previous is brought up to date.
+    slices of DIFF_CHUNK words are compared first, only a chunk that differs is compared word by word.
+    """
+    changed = {}
+    for start in range(0, len(words), DIFF_CHUNK) :
+        if words[start:start + DIFF_CHUNK] != previous[start:start + DIFF_CHUNK] :
+            for address in range(start, min(start + DIFF_CHUNK, len(words))) :
+                if words[address] != previous[address] :
+                    changed[address] = (previous[address], words[address])
+                    previous[address] = words[address]
+    return changed
+
+
+
+
+class Recorder :
+    """
+    Records a run of an integer engine (FastIAS, BlockIAS or PeepholeIAS) so any cycle of it can be
+    revisited. record() runs the machine and takes a checkpoint every interval cycles: the registers and
+    the data and instruction words changed since the checkpoint before, with their old and new values.
+    seek(cycle) walks a materialized copy of the memory along those deltas to the nearest checkpoint at or
+    before cycle, copies it into the machine and runs forward from there, so a seek re-executes less than
+    interval cycles. step_back() is seek one cycle back.
+    The checkpoints are counted in words, REGISTER_WORDS for the registers and two per changed word, with
+    the memory copy on top. Once they go over budget every other checkpoint is merged into the next one
+    and the interval doubles, so long runs keep fewer, coarser checkpoints within the budget.
+    Cycles are fetch cycles as counted by fetch: a word, or a right half left in the IBR by a jump.
+    seek replays from a checkpoint with the FastIAS loop, so it relies on the engine counting its cycles
+    exactly like FastIAS, which its subclasses do. Other engines are rejected with a TypeError.
+    """
+
+    def __init__(self, machine, interval=INTERVAL, budget=BUDGET_WORDS) :
+        if not isinstance(machine, FastIAS) :
+            raise TypeError("only FastIAS and its subclasses can be recorded, not {}".format(type(machine).__name__))
+        if interval < 1 :
+            raise ValueError("the interval has to be at least 1 cycle")
+        self.machine = machine
+        self.interval = interval
+        self.budget = budget
+        self.data = copy.copy(machine.memory.data_memory)      #memory at checkpoint self.at
+        self.code = list(machine.memory.instructions_memory)
+        self.checkpoints = [Checkpoint(0, self.registers(), {}, {})]
+        self.cycles = [0]                                       #cycle of every checkpoint, for bisect
+        self.at = 0
+        self.cycle = 0                                          #cycle the machine is at
+        self.end = 0                                            #cycles recorded
+        self.words = len(self.data) + len(self.code) + REGISTER_WORDS
+
+    def registers(self) :
+        machine = self.machine
+        return (machine._PC, machine._AC, machine._MQ, machine._MBR, machine._IR, machine._MAR, machine._IBR)
+
+    def record(self, max_cycles=None) :
+        """
+        runs the machine on from the end of the recording until it halts or ran max_cycles cycles,
+        taking checkpoints on the way. returns a RunResult of this part of the run.
+        """
+        if self.cycle != self.end :
+            self.seek(self.end)
+        self.walk(len(self.checkpoints) - 1)
+        cycles = 0
+        while True :
+            limit = self.interval if max_cycles is None else min(self.interval, max_cycles - cycles)
+            if limit <= 0 :
+                return RunResult(BUDGET, cycles)
+            result = self.machine.fetch(max_cycles=limit)
+            cycles += result.cycles
+            self.cycle = self.end = self.end + result.cycles
+            if result.cycles :
+                self.checkpoint()
+            if result.status == HALTED :
+                return RunResult(HALTED, cycles)
+
+    def checkpoint(self) :
+        """
+        appends a checkpoint of the machine at the end of the recording and thins the checkpoints out
+        while they are over budget
+        """
+        memory = self.machine.memory
+        if len(memory.instructions_memory) != len(self.code) :
+            raise ValueError("the program changed its length while it was recorded")
+        data = diffWords(memory.data_memory, self.data)
+        code = diffWords(memory.instructions_memory, self.code)
+        self.checkpoints.append(Checkpoint(self.end, self.registers(), data, code))
+        self.cycles.append(self.end)
+        self.at = len(self.checkpoints) - 1
+        self.words += REGISTER_WORDS + 2 * (len(data) + len(code))
+        while self.words > self.budget and len(self.checkpoints) > 2 :
+            self.thin()
+
+    def thin(self) :
+        """
+        merges every odd checkpoint into the one after it, the first and the last checkpoint stay
+        """
+        kept = [self.checkpoints[0]]
+        for index in range(1, len(self.checkpoints), 2) :
+            if index + 1 == len(self.checkpoints) :
+                kept.append(self.checkpoints[index])
+                break
+            first, second = self.checkpoints[index], self.checkpoints[index + 1]
+            kept.append(second._replace(data=mergeDeltas(first.data, second.data), code=mergeDeltas(first.code, second.code)))
+        self.checkpoints = kept
+        self.cycles = [checkpoint.cycle for checkpoint in kept]
+        self.at = len(kept) - 1
+        self.words = len(self.data) + len(self.code) + sum(REGISTER_WORDS + 2 * (len(checkpoint.data) + len(checkpoint.code))
+                                                           for checkpoint in kept)
+        self.interval *= 2
+
+    def walk(self, index) :
+        """
+        moves the memory copy to checkpoint index, applying the deltas in between forwards or backwards
+        """
+        while self.at < index :
+            self.at += 1
+            checkpoint = self.checkpoints[self.at]
+            for words, delta in ((self.data, checkpoint.data), (self.code, checkpoint.code)) :
+                for address, (before, after) in delta.items() :
+                    words[address] = after
+        while self.at > index :
+            checkpoint = self.checkpoints[self.at]
+            for words, delta in ((self.data, checkpoint.data), (self.code, checkpoint.code)) :
+                for address, (before, after) in delta.items() :
+                    words[address] = before
+            self.at -= 1
+
+    def seek(self, cycle) :
+        """
+        puts the machine in its state after cycle cycles of the recorded run, returns cycle
+        """
+        if not 0 <= cycle <= self.end :
+            raise ValueError("cycle {} is not in the recorded run, cycles 0..{} are".format(cycle, self.end))
+        index = bisect_right(self.cycles, cycle) - 1
+        self.walk(index)
+        machine = self.machine
+        machine.memory.data_memory[:] = self.data
+        machine.memory.instructions_memory[:] = self.code
+        machine._PC, machine._AC, machine._MQ, machine._MBR, machine._IR, machine._MAR, machine._IBR = self.checkpoints[index].registers
+        machine.invalidate()
+        remaining = cycle - self.checkpoints[index].cycle
+        while remaining :
+            ran = FastIAS.runCycles(machine, remaining)      #one word per cycle, a compiled block could overshoot
+            if not ran :
+                break
+            remaining -= ran
+        self.cycle = cycle
+        return cycle
+
+    def step_back(self, cycles=1) :
+        """
+        goes back cycles cycles, not past the start of the run, and returns the cycle reached
+        """
+        return self.seek(max(0, self.cycle - cycles))
+
+
+
+
+
+if __name__ == "__main__":
+    # python IASreplay.py program.txt cycle runs a text file with one 40 bit instruction per line and goes back to cycle
+    with open(sys.argv[1]) as handle :
+        program = [line.strip() for line in handle if line.strip()]
+    machine = FastIAS()
+    machine.memory.setInstructionsMemory(program)
+    recorder = Recorder(machine)
+    print(recorder.record())
+    recorder.seek(int(sys.argv[2]))
+    print("PC {} AC {} MQ {}".format(machine._PC, machine._AC, machine._MQ))
@@ -0,0 +1,141 @@
+# cooperative asyncio scheduling of many ias machines in one process.
+
+from collections import deque, namedtuple
+from contextlib import contextmanager
+import asyncio
+import heapq
+from itertools import count
+from IASopcodes import HALTED, BUDGET, CHECK_INTERVAL
+from IASfast import FastIAS
+
+
+
+JobResult = namedtuple('JobResult', ['job', 'status', 'cycles', 'outputs'])
+JobResult.__doc__ = """
+finished job: its id from submit, HALTED or BUDGET, the cycles it ran and {address: value} of its outputs
+"""
+
+
+
+class MachinePool :
+    """
+    Keeps finished machines for reuse, release() resets a machine (registers, memory and predecoded words)
+    instead of letting it go, acquire() hands out a kept one before building a new one.
+    checkout() does both around a with block.
+    """
+
+    def __init__(self, engine=FastIAS, limit=1024) :
+        self.engine = engine
+        self.limit = limit                                      #machines kept at most
+        self.free = []
+
+    def acquire(self, program=None) :
+        """
+        a machine in power-on state, program is loaded into it when given
+        """
+        machine = self.free.pop() if self.free else self.engine()
+        if program is not None :
+            machine.memory.setInstructionsMemory(list(program))
+        return machine
+
+    def release(self, machine) :
+        if len(self.free) < self.limit :
+            machine.reset()
+            self.free.append(machine)
+
+    @contextmanager
+    def checkout(self, program=None) :
+        """
+        with pool.checkout(program) as machine: runs the block on an acquired machine and releases it afterwards
+        """
+        machine = self.acquire(program)
+        try :
+            yield machine
+        finally :
+            self.release(machine)
+
+
+
+
+class Scheduler :
+    """
+    Runs jobs on up to slots machines at once in a weighted round robin: every turn a machine runs
+    quantum * priority cycles with fetch(max_cycles) and the event loop gets a turn before the next machine,
+    so a long program slows the others down but never blocks them. Waiting jobs start by priority, then in
+    submission order. Jobs can be submitted while results() is being iterated.
+    """
+
+    def __init__(self, engine=FastIAS, slots=256, quantum=CHECK_INTERVAL, pool=None) :
+        self.slots = slots
+        self.quantum = quantum
+        self.pool = MachinePool(engine) if pool is None else pool
+        self.waiting = []                                       #heap of (-priority, job id, job)
+        self.running = deque()                                  #(job id, job, machine, cycles so far)
+        self.ids = count()
+
+    def submit(self, instructions, inputs=None, outputs=(), priority=1, max_cycles=None) :
+        """
+        queues a job and returns its id. inputs maps 12 bit address strings to values like IAS.appendInput,
+        outputs are the addresses read back when it finishes. a job still running after max_cycles cycles
+        is stopped and reported with status BUDGET.
+        """
+        if priority < 1 :
+            raise ValueError("priority has to be at least 1")
+        job = next(self.ids)
+        heapq.heappush(self.waiting, (-priority, job, (instructions, dict(inputs or {}), tuple(outputs), priority, max_cycles)))
+        return job
+
+    def start(self) :
+        """
+        moves waiting jobs onto free slots
+        """
+        while self.waiting and len(self.running) < self.slots :
+            priority, job, (instructions, inputs, outputs, weight, max_cycles) = heapq.heappop(self.waiting)
+            machine = self.pool.acquire(instructions)
+            for address, value in inputs.items() :
+                machine.appendInput(address, value)
+            self.running.append((job, (outputs, weight, max_cycles), machine, 0))
+
+    def turn(self) :
+        """
+        gives the machine at the head of the round one quantum, returns its JobResult when it finished
+        """
+        job, (outputs, weight, max_cycles), machine, cycles = self.running.popleft()
+        budget = self.quantum * weight
+        if max_cycles is not None :
+            budget = min(budget, max_cycles - cycles)
+        result = machine.fetch(max_cycles=budget)
+        cycles += result.cycles
+        if result.status != HALTED and (max_cycles is None or cycles < max_cycles) :
+            self.running.append((job, (outputs, weight, max_cycles), machine, cycles))
+            return None
+        finished = JobResult(job, result.status if result.status == HALTED else BUDGET, cycles,
+                             {address: machine.getStoredValue(address) for address in outputs})
+        self.pool.release(machine)
+        return finished
+
+    async def results(self) :
+        """
+        runs every submitted job and yields their JobResults as they finish, ends when nothing is left
+        """
+        while True :
+            self.start()
+            if not self.running :
+                return
+            finished = self.turn()
+            if finished is not None :
+                yield finished
+            await asyncio.sleep(0)
+
+    async def runAll(self) :
+        """
+        runs every submitted job and returns {job id: JobResult}
+        """
+        return {result.job: result async for result in self.results()}
+
+
+
+
+
+if __name__ == "__main__":
+    pass
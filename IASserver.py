@@ -0,0 +1,281 @@
+# long running local simulation server, batches of jobs over json lines on a unix socket or localhost tcp.
+
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+from IASfast import FastIAS
+from IASscheduler import MachinePool
+
+
+
+CHUNK = 32                                                      #jobs of a request sent to a worker at a time
+LIMIT = 1 << 24                                                 #longest request line accepted, in bytes
+MAX_CYCLES = 1 << 24                                            #cycles a job may run by default, a few seconds on FastIAS
+POOLS = {}                                                      #engine -> MachinePool of warm machines, one set per worker process
+
+
+
+def warm(engine) :
+    """
+    MachinePool of engine in this process, holding one machine from the first call on
+    """
+    pool = POOLS.get(engine)
+    if pool is None :
+        pool = POOLS[engine] = MachinePool(engine)
+        pool.release(engine())
+    return pool
+
+
+def runChunk(engine, programs, chunk) :
+    """
+    worker side of the server: runs (job index, program index, inputs, outputs, max_cycles) jobs on warm
+    machines of the process and returns one response dict per job. a job that fails is answered with its error.
+    """
+    pool = warm(engine)
+    responses = []
+    for job, program, inputs, outputs, max_cycles in chunk :
+        try :
+            with pool.checkout(programs[program]) as machine :
+                for address, value in inputs :
+                    machine.appendInput(address, value)
+                result = machine.fetch(max_cycles=max_cycles)
+                responses.append({'job': job, 'status': result.status, 'cycles': result.cycles,
+                                  'outputs': [machine.getStoredValue(address) for address in outputs]})
+        except Exception as error :
+            responses.append({'job': job, 'error': "{}: {}".format(type(error).__name__, error)})
+    return responses
+
+
+def addressOf(address) :
+    """
+    12 bit address string of an address given as an int, a 12 bit '0'/'1' string or a decimal string
+    (json object keys are strings)
+    """
+    if isinstance(address, str) and len(address) == 12 and not address.strip('01') :
+        return address
+    address = int(address)
+    if not 0 <= address < 4096 :
+        raise ValueError("address {} does not fit in 12 bits".format(address))
+    return format(address, '012b')
+
+
+def parseRequest(request, max_cycles=None) :
+    """
+    (programs, jobs) of a decoded request line, jobs as the runChunk tuples. a job runs at most max_cycles
+    cycles whatever it asks for, None leaves jobs without max_cycles unlimited. raises ValueError when the
+    request is malformed, before any of its jobs runs.
+    """
+    if not isinstance(request, dict) :
+        raise ValueError("a request has to be a json object")
+    programs = [tuple(program) for program in request.get('programs', [])]
+    jobs = []
+    for job, entry in enumerate(request.get('jobs', [])) :
+        program = entry.get('program', 0)
+        if not isinstance(program, int) or not 0 <= program < len(programs) :
+            raise ValueError("job {} names program {}, the request has {}".format(job, program, len(programs)))
+        inputs = entry.get('inputs', {})
+        inputs = inputs.items() if isinstance(inputs, dict) else inputs
+        cycles = entry.get('max_cycles')
+        if cycles is None or (max_cycles is not None and cycles > max_cycles) :
+            cycles = max_cycles
+        jobs.append((job, program, tuple((addressOf(address), value) for address, value in inputs),
+                     tuple(addressOf(address) for address in entry.get('outputs', ())), cycles))
+    return programs, jobs
+
+
+
+
+class Server :
+    """
+    Runs batches of jobs for clients that can not import the simulator. Every request is one json line:
+        {"id": 7, "programs": [[word, ...], ...],
+         "jobs": [{"program": 0, "inputs": {"3": 56}, "outputs": [4], "max_cycles": 100000}, ...]}
+    words are 40 bit ints or '0'/'1' strings, addresses ints or 12 bit strings, a job defaults to program 0.
+    The jobs go to a pool of worker processes in chunks of chunk jobs. Every worker keeps a MachinePool, so
+    imports and machines are paid for once per worker and not once per job. Each chunk is answered as soon
+    as it is done, one line per job:
+        {"id": 7, "job": 0, "status": "halted", "cycles": 12, "outputs": [91]}
+    or {"id": 7, "job": 0, "error": "..."}, followed by {"id": 7, "done": 2} once all jobs of the request
+    are answered. A malformed request gets a single {"id": ..., "error": "..."} line. Requests on one
+    connection run concurrently, responses carry the id of their request.
+    workers=0 runs the chunks in the server process itself, which blocks other connections while a chunk runs.
+    No job runs more than max_cycles cycles, a job asking for more or for no limit stops there with status
+    'budget', so a looping program can not hold a worker (or the server with workers=0) for good.
+    max_cycles=None lifts the cap.
+    """
+
+    def __init__(self, engine=FastIAS, workers=None, chunk=CHUNK, max_cycles=MAX_CYCLES) :
+        self.engine = engine
+        self.chunk = chunk
+        self.max_cycles = max_cycles
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.executor = ProcessPoolExecutor(self.workers) if self.workers else None
+        self.server = None
+        self.requests = 0                                       #requests answered, malformed ones included
+        self.jobs = 0
+
+    async def start(self, address) :
+        """
+        starts the workers and listens on address, 'host:port' for tcp (port 0 picks a free one) or the path
+        of a unix socket. returns the address actually bound.
+        """
+        if self.executor is not None :
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[loop.run_in_executor(self.executor, warm, self.engine) for worker in range(self.workers)])
+        if isinstance(address, str) and ':' not in address :
+            self.server = await asyncio.start_unix_server(self.connection, address, limit=LIMIT)
+            return address
+        host, port = address.rsplit(':', 1) if isinstance(address, str) else address
+        self.server = await asyncio.start_server(self.connection, host, int(port), limit=LIMIT)
+        return "{}:{}".format(*self.server.sockets[0].getsockname()[:2])
+
+    async def serve(self, address) :
+        """
+        listens on address until cancelled
+        """
+        await self.start(address)
+        async with self.server :
+            await self.server.serve_forever()
+
+    def close(self) :
+        if self.server is not None :
+            self.server.close()
+        if self.executor is not None :
+            self.executor.shutdown(cancel_futures=True)
+
+    async def connection(self, reader, writer) :
+        """
+        reads request lines until the client hangs up, each request is handled in a task of its own
+        """
+        lock = asyncio.Lock()
+        tasks = set()
+        try :
+            while True :
+                try :
+                    line = await reader.readline()
+                except ValueError :
+                    await self.send(writer, lock, [{'id': None, 'error': "request longer than {} bytes".format(LIMIT)}])
+                    break
+                if not line :
+                    break
+                if line.strip() :
+                    task = asyncio.ensure_future(self.handle(line, writer, lock))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+            if tasks :
+                await asyncio.gather(*tasks)
+        except (ConnectionError, asyncio.CancelledError) :        #client gone or server shutting down, the connection just ends
+            pass
+        finally :
+            for task in list(tasks) :
+                task.cancel()
+            writer.close()
+
+    async def handle(self, line, writer, lock) :
+        """
+        runs the jobs of one request line and streams their responses back
+        """
+        self.requests += 1
+        request = None
+        try :
+            request = json.loads(line)
+            programs, jobs = parseRequest(request, self.max_cycles)
+        except (ValueError, TypeError, AttributeError) as error :
+            identifier = request.get('id') if isinstance(request, dict) else None
+            await self.send(writer, lock, [{'id': identifier, 'error': "{}: {}".format(type(error).__name__, error)}])
+            return
+        identifier = request.get('id')
+        loop = asyncio.get_running_loop()
+        pending = []
+        for start in range(0, len(jobs), self.chunk) :
+            chunk = jobs[start:start + self.chunk]
+            if self.executor is None :
+                await self.send(writer, lock, self.tag(identifier, runChunk(self.engine, programs, chunk)))
+                await asyncio.sleep(0)
+            else :
+                used = sorted(set(job[1] for job in chunk))     #only the programs of the chunk are pickled
+                renumbered = {program: index for index, program in enumerate(used)}
+                chunk = [(job, renumbered[program]) + tuple(rest) for job, program, *rest in chunk]
+                pending.append(loop.run_in_executor(self.executor, runChunk, self.engine,
+                                                    [programs[program] for program in used], chunk))
+        try :
+            for responses in asyncio.as_completed(pending) :
+                await self.send(writer, lock, self.tag(identifier, await responses))
+        except ConnectionError :
+            raise
+        except Exception as error :                             #a worker died, the other chunks are not waited for
+            await self.send(writer, lock, [{'id': identifier, 'error': "{}: {}".format(type(error).__name__, error)}])
+            return
+        self.jobs += len(jobs)
+        await self.send(writer, lock, [{'id': identifier, 'done': len(jobs)}])
+
+    def tag(self, identifier, responses) :
+        for response in responses :
+            response['id'] = identifier
+        return responses
+
+    async def send(self, writer, lock, responses) :
+        """
+        writes responses as json lines, the lock keeps the lines of concurrent requests whole
+        """
+        async with lock :
+            writer.write("".join(json.dumps(response, separators=(',', ':')) + "\n" for response in responses).encode())
+            await writer.drain()
+
+
+
+
+
+def startThread(server, address='127.0.0.1:0') :
+    """
+    runs server on an event loop of its own in a daemon thread, for tests and in-process load tests.
+    returns the bound address and a function that stops the loop and closes the server.
+    """
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    bound = asyncio.run_coroutine_threadsafe(server.start(address), loop).result()
+
+    def stop() :
+        async def shutdown() :
+            server.server.close()
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks :
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        asyncio.run_coroutine_threadsafe(shutdown(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+        server.close()
+    return bound, stop
+
+
+
+def main(arguments) :
+    parser = argparse.ArgumentParser(description="local IAS simulation server, json lines over tcp or a unix socket")
+    parser.add_argument('address', nargs='?', default='127.0.0.1:8642', help="host:port or the path of a unix socket")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes, 0 runs jobs in the server process")
+    parser.add_argument('--chunk', type=int, default=CHUNK, help="jobs sent to a worker at a time")
+    parser.add_argument('--max-cycles', type=int, default=MAX_CYCLES, help="most cycles a job may run, 0 for no limit")
+    options = parser.parse_args(arguments)
+
+    server = Server(workers=options.workers, chunk=options.chunk, max_cycles=options.max_cycles or None)
+    try :
+        asyncio.run(server.serve(options.address))
+    except KeyboardInterrupt :
+        pass
+    finally :
+        server.close()
+    return 0
+
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,198 @@
+# runs ias programs streamed from an iterator through a bounded instruction window.
+
+from itertools import islice
+import os
+import sys
+from IASfast import FastIAS
+from IASmemory import MEMORY_WORDS
+
+
+
+WINDOW = 4096                                                   #words kept by default, lookahead included
+LOOKAHEAD = 256                                                 #words read from the stream at a time
+
+
+
+class WindowError(IndexError) :
+    """
+    raised when a jump or a STOR M(X,8:19) / STOR M(X,28:39) names a word that already left the window
+    """
+
+
+
+
+def readWords(source) :
+    """
+    40 bit words of source one at a time: a path to a text file with one instruction per line,
+    an open text file or any iterable of '0'/'1' strings or ints. blank lines are skipped.
+    """
+    if isinstance(source, (str, os.PathLike)) :
+        with open(source) as handle :
+            yield from readWords(handle)
+        return
+    for word in source :
+        if isinstance(word, str) :
+            word = word.strip()
+            if not word :
+                continue
+        yield word
+
+
+
+
+class StreamWords :
+    """
+    instructions_memory over a stream: the last window words read are kept in a ring, older ones are
+    dropped and reported to evicted (the engine's invalidate) so predecoded words go with them.
+    len() is the number of words read so far, fill() reads on in batches of lookahead words, so
+    backward jumps reach at least window - lookahead words behind the newest word.
+    """
+
+    def __init__(self, source, window=WINDOW, lookahead=LOOKAHEAD, evicted=None) :
+        if not 0 < lookahead <= window :
+            raise ValueError("lookahead has to be between 1 and the window")
+        self.words = readWords(source)
+        self.window = window
+        self.lookahead = lookahead
+        self.ring = [None] * window
+        self.start = 0                                          #oldest word still held
+        self.end = 0                                            #words read so far
+        self.exhausted = False
+        self.evicted = evicted
+
+    def __len__(self) :
+        return self.end
+
+    def __getitem__(self, address) :
+        self.check(address)
+        return self.ring[address % self.window]
+
+    def __setitem__(self, address, word) :
+        self.check(address)
+        self.ring[address % self.window] = word
+
+    def check(self, address) :
+        if address < self.start :
+            raise WindowError("word {} has left the instruction window, words {}..{} are kept (window {})".format(
+                              address, self.start, self.end - 1, self.window))
+        if address >= self.end :
+            raise IndexError("word {} has not been read from the stream".format(address))
+
+    def fill(self, address) :
+        """
+        reads words until address is held or the stream ends, True when address has been read
+        """
+        while address >= self.end and not self.exhausted :
+            self.read(max(self.lookahead, address - self.end + 1))
+        return address < self.end
+
+    def read(self, count) :
+        read = 0
+        for word in islice(self.words, count) :
+            if self.end - self.start == self.window :
+                self.ring[self.start % self.window] = None
+                if self.evicted is not None :
+                    self.evicted(self.start)
+                self.start += 1
+            self.ring[self.end % self.window] = word
+            self.end += 1
+            read += 1
+        if read < count :
+            self.exhausted = True
+
+    def close(self) :
+        """
+        stops reading, the rest of the stream is never consumed and a file being read is closed
+        """
+        self.exhausted = True
+        self.words.close()
+
+
+
+
+class StreamIAS(FastIAS) :
+    '''
+    FastIAS that runs a program from an iterator, generator or file through a StreamWords window, so
+    memory stays flat for streams of any length. Words are read as the PC reaches them, HALT stops reading.
+    Address fields are 12 bits, so past the first MEMORY_WORDS words a jump or address field store goes to
+    the word nearest to the running one whose position has the same 12 low bits (at most 2048 words back
+    or ahead). A target that already left the window raises WindowError.
+    '''
+    __slots__ = ()
+
+    def feed(self,source,window=WINDOW,lookahead=LOOKAHEAD) :
+        """
+        makes source the program, nothing is read until fetch
+        """
+        self.memory.setInstructionsMemory(StreamWords(source, window, lookahead, self.invalidate))
+        self.invalidate()
+
+
+    def isHalted(self) :
+        """
+        FastIAS.isHalted after reading the stream up to the PC
+        """
+        instructions = self.memory.instructions_memory
+        if self._IBR is None and isinstance(instructions, StreamWords) :
+            instructions.fill(self._PC)
+        return super().isHalted()
+
+
+    def target(self,address) :
+        """
+        stream position of the word a 12 bit address field names, see the class comment
+        """
+        here = self._PC - 1
+        if here < MEMORY_WORDS :
+            return address
+        return here + (address - here + MEMORY_WORDS // 2) % MEMORY_WORDS - MEMORY_WORDS // 2
+
+
+    def predecode(self,address) :
+        """
+        FastIAS.predecode, reading on first when a jump goes past the words read so far
+        """
+        instructions = self.memory.instructions_memory
+        if isinstance(instructions, StreamWords) :
+            instructions.fill(address)
+        return super().predecode(address)
+
+
+    def jumpLeftInstruction(self,address) :
+        super().jumpLeftInstruction(self.target(address))
+
+
+    def jumpRightInstruction(self,address) :
+        super().jumpRightInstruction(self.target(address))
+
+
+    def conditionalJumpLeft(self,address) :
+        super().conditionalJumpLeft(self.target(address))
+
+
+    def storeLeft(self,address) :
+        super().storeLeft(self.target(address))
+
+
+    def storeRight(self,address) :
+        super().storeRight(self.target(address))
+
+
+    def halt(self,address) :
+        """
+        FastIAS.halt, the rest of the stream is not read
+        """
+        instructions = self.memory.instructions_memory
+        if isinstance(instructions, StreamWords) :
+            instructions.close()
+        super().halt(address)
+
+
+
+
+
+if __name__ == "__main__":
+    # python IASstream.py program.txt streams a text file with one 40 bit instruction per line
+    machine = StreamIAS()
+    machine.feed(sys.argv[1])
+    print(machine.fetch())
@@ -0,0 +1,104 @@
+# cycle counts of ias runs from per opcode cost tables.
+
+from collections import namedtuple
+import argparse
+import sys
+from IASanalysis import READS, WRITES, MODIFIES
+from IASfast import FastIAS
+
+
+
+MULTIPLY = 0b00001011
+DIVIDE = 0b00001100
+EXECUTE_CYCLES = {MULTIPLY: 39, DIVIDE: 39}                     #one add or subtract and shift per magnitude bit, every other opcode takes 1
+
+Timing = namedtuple('Timing', ['cycles', 'fetch', 'decode', 'execute', 'memory', 'words', 'halves', 'ibrHalves'])
+Timing.__doc__ = """
+machine cycles of a run on the modelled hardware: the total and the cycles spent fetching words, decoding
+halves, executing them and accessing their operands in memory, then the words fetched, the halves executed
+and the right halves that ran from the IBR without a fetch of their own
+"""
+
+
+
+class TimingModel :
+    """
+    Costs of the IAS stages in machine cycles. Fetching a word costs fetchCycles plus a memory read,
+    every half is decoded in decodeCycles and executed in its EXECUTE_CYCLES (execute overrides them per
+    opcode), a half reading M(X) pays a memory read, STOR M(X) a write and STOR M(X,8:19) / STOR M(X,28:39)
+    both. The costs are folded into one table per stage when the model is built.
+    """
+
+    def __init__(self, readLatency=1, writeLatency=1, fetchCycles=1, decodeCycles=1, execute=None) :
+        executeCycles = dict(EXECUTE_CYCLES)
+        executeCycles.update(execute or {})
+        self.fetchCost = fetchCycles + readLatency
+        self.decodeCost = decodeCycles
+        self.executeCosts = [executeCycles.get(opcode, 1) for opcode in range(256)]
+        self.memoryCosts = [readLatency * (opcode in READS or opcode in MODIFIES) +
+                            writeLatency * (opcode in WRITES or opcode in MODIFIES) for opcode in range(256)]
+
+    def timing(self, counter) :
+        """
+        Timing of the fetches and executed halves counted in a CycleCounter
+        """
+        halves = sum(counter.executed)
+        fetch = counter.fetched * self.fetchCost
+        decode = halves * self.decodeCost
+        execute = sum([count * cost for count, cost in zip(counter.executed, self.executeCosts) if count])
+        memory = sum([count * cost for count, cost in zip(counter.executed, self.memoryCosts) if count])
+        return Timing(fetch + decode + execute + memory, fetch, decode, execute, memory,
+                      counter.fetched, halves, halves - counter.fetched)
+
+
+
+
+class CycleCounter :
+    """
+    Pass it to fetch(timing=...) of IAS, FastIAS or BlockIAS: the run counts the words it fetches and the
+    halves it executes per opcode, cycles are only worked out by timing(). The counts add up over runs,
+    so one counter can time a whole batch of jobs.
+    """
+
+    def __init__(self, model=None) :
+        self.model = TimingModel() if model is None else model
+        self.fetched = 0                                        #words read from memory by the fetch stage
+        self.executed = [0] * 256                               #halves executed per opcode
+
+    def timing(self) :
+        return self.model.timing(self)
+
+    def clear(self) :
+        self.fetched = 0
+        self.executed = [0] * 256
+
+
+
+
+
+def main(arguments) :
+    parser = argparse.ArgumentParser(description="machine cycles of an IAS program")
+    parser.add_argument('program', help="text file with one 40 bit instruction per line")
+    parser.add_argument('--input', action='append', default=[], metavar='ADDRESS=VALUE')
+    parser.add_argument('--read-latency', type=int, default=1)
+    parser.add_argument('--write-latency', type=int, default=1)
+    options = parser.parse_args(arguments)
+
+    with open(options.program) as handle :
+        program = [line.strip() for line in handle if line.strip()]
+    machine = FastIAS()
+    for address, value in [entry.split('=') for entry in options.input] :
+        machine.appendInput(format(int(address, 0), '012b'), int(value, 0))
+    machine.memory.setInstructionsMemory(program)
+    counter = CycleCounter(TimingModel(options.read_latency, options.write_latency))
+    machine.fetch(timing=counter)
+    for name, value in counter.timing()._asdict().items() :
+        print("{:<10}{:>12}".format(name, value))
+    return 0
+
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
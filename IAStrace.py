@@ -0,0 +1,196 @@
+# execution traces of ias runs kept in a fixed size ring buffer.
+
+from collections import namedtuple
+import argparse
+import struct
+import sys
+
+
+
+RECORD = struct.Struct('<iqqq')                                 #PC (-(PC + 1) for a right half), instruction bits, AC, MQ
+RECORDS = struct.Struct('<iqqqiqqq')                            #two RECORDs back to back, both halves of a word at once
+TRACE_HEADER = struct.Struct('<4sIQ')                           #magic, capacity, records written
+TRACE_MAGIC = b'IAST'
+LEFT = 0
+RIGHT = 1
+SPARE = 2                                                       #records after the ring that take the overflow of a traced cycle
+
+TraceRecord = namedtuple('TraceRecord', ['step', 'pc', 'half', 'opcode', 'operand', 'ac', 'mq'])
+TraceRecord.__doc__ = """
+one executed half instruction: its step number in the run, the address of its word, LEFT or RIGHT,
+opcode and operand, and AC / MQ after it ran
+"""
+
+
+
+class TraceBuffer :
+    """
+    Ring buffer of the last capacity half instructions of a run, packed as RECORD structs into one
+    preallocated bytearray. Recording writes into the buffer with pack_into and allocates nothing,
+    TraceRecords are only built when the trace is read. A left half record holds its whole word and
+    a right half record its 20 bits, so the engines can pack what they already have at hand.
+    Pass it to fetch(trace=...) of IAS, FastIAS or BlockIAS, a traced run uses its own copy of the
+    fetch loop so untraced runs pay nothing.
+    """
+
+    def __init__(self, capacity=1 << 16) :
+        self.capacity = capacity
+        self.buffer = bytearray((capacity + SPARE) * RECORD.size)
+        self.count = 0                                          #records written since the start, the next step number
+
+    def __len__(self) :
+        return min(self.count, self.capacity)
+
+    def first(self) :
+        """
+        step number of the oldest record still in the buffer
+        """
+        return self.count - len(self)
+
+    def __getitem__(self, step) :
+        if not self.first() <= step < self.count :
+            raise IndexError("step {} is not in the trace".format(step))
+        pc, bits, ac, mq = RECORD.unpack_from(self.buffer, (step % self.capacity) * RECORD.size)
+        if pc < 0 :
+            return TraceRecord(step, -pc - 1, RIGHT, (bits >> 12) & 0xFF, bits & 0xFFF, ac, mq)
+        return TraceRecord(step, pc, LEFT, (bits >> 32) & 0xFF, (bits >> 20) & 0xFFF, ac, mq)
+
+    def __iter__(self) :
+        for step in range(self.first(), self.count) :
+            yield self[step]
+
+    def record(self, pc, half, opcode, operand, ac, mq) :
+        """
+        appends one record, the engines inline this in their traced loops
+        """
+        bits = (opcode << 12) | operand
+        RECORD.pack_into(self.buffer, (self.count % self.capacity) * RECORD.size,
+                         -pc - 1 if half == RIGHT else pc, bits if half == RIGHT else bits << 20, ac, mq)
+        self.count += 1
+
+    def clear(self) :
+        self.count = 0
+
+    def save(self, path) :
+        """
+        writes the header and the raw ring buffer to path
+        """
+        with open(path, 'wb') as handle :
+            handle.write(TRACE_HEADER.pack(TRACE_MAGIC, self.capacity, self.count))
+            handle.write(memoryview(self.buffer)[:self.capacity * RECORD.size])
+
+    @classmethod
+    def load(cls, path) :
+        """
+        reads a trace written by save
+        """
+        with open(path, 'rb') as handle :
+            magic, capacity, count = TRACE_HEADER.unpack(handle.read(TRACE_HEADER.size))
+            if magic != TRACE_MAGIC :
+                raise ValueError("not an IAS trace")
+            trace = cls(capacity)
+            trace.count = count
+            handle.readinto(memoryview(trace.buffer)[:capacity * RECORD.size])
+        return trace
+
+
+
+
+def firstDivergence(first, second) :
+    """
+    compares two traces of the same program step by step over the steps both still hold and returns
+    (step, record of first, record of second) for the first step that differs, a record is None when
+    that trace does not hold the step, e.g. because it ended before the other. returns None when the
+    traces agree.
+    """
+    for step in range(max(first.first(), second.first()), min(first.count, second.count)) :
+        if first[step] != second[step] :
+            return step, first[step], second[step]
+    if first.count != second.count :
+        step = min(first.count, second.count)
+        return step, recordAt(first, step), recordAt(second, step)
+    return None
+
+
+def recordAt(trace, step) :
+    """
+    trace[step], or None when the step is not in the trace
+    """
+    return trace[step] if trace.first() <= step < trace.count else None
+
+
+def formatRecord(record) :
+    """
+    one line description of a TraceRecord
+    """
+    if record is None :
+        return "<trace ended>"
+    return "step {:>8}  PC {:>4}{}  opcode {:08b}  operand {:>4}  AC {:>14}  MQ {:>14}".format(
+        record.step, record.pc, 'LR'[record.half], record.opcode, record.operand, record.ac, record.mq)
+
+
+
+
+
+def traceRuns(program, inputs, engines, capacity=1 << 16) :
+    """
+    runs program with inputs ({address: value}) on every engine class and returns their TraceBuffers
+    """
+    traces = []
+    for engine in engines :
+        machine = engine()
+        for address, value in inputs.items() :
+            machine.appendInput(format(address, '012b'), value)
+        machine.memory.setInstructionsMemory(list(program))
+        trace = TraceBuffer(capacity)
+        machine.fetch(trace=trace)
+        traces.append(trace)
+    return traces
+
+
+def main(arguments) :
+    # the engines import this module, so they are only imported once the command line is used
+    from IASopcodes import IAS
+    from IASfast import FastIAS
+    from IASblocks import BlockIAS
+    engines = {'IAS': IAS, 'FastIAS': FastIAS, 'BlockIAS': BlockIAS}
+
+    parser = argparse.ArgumentParser(description="record and compare IAS execution traces")
+    commands = parser.add_subparsers(dest='command', required=True)
+    diff = commands.add_parser('diff', help="first divergence of two saved traces")
+    diff.add_argument('first')
+    diff.add_argument('second')
+    run = commands.add_parser('run', help="trace a program on two engines and compare them")
+    run.add_argument('program', help="text file with one 40 bit instruction per line")
+    run.add_argument('--input', action='append', default=[], metavar='ADDRESS=VALUE')
+    run.add_argument('--engines', nargs=2, default=['IAS', 'FastIAS'], choices=list(engines))
+    run.add_argument('--capacity', type=int, default=1 << 16)
+    run.add_argument('--save', nargs=2, metavar='PATH', help="also write both traces to these files")
+    options = parser.parse_args(arguments)
+
+    if options.command == 'diff' :
+        first, second = TraceBuffer.load(options.first), TraceBuffer.load(options.second)
+    else :
+        with open(options.program) as handle :
+            program = [line.strip() for line in handle if line.strip()]
+        inputs = {int(address, 0): int(value, 0) for address, value in [entry.split('=') for entry in options.input]}
+        first, second = traceRuns(program, inputs, [engines[name] for name in options.engines], options.capacity)
+        if options.save :
+            first.save(options.save[0])
+            second.save(options.save[1])
+    divergence = firstDivergence(first, second)
+    if divergence is None :
+        print("traces agree over {} steps".format(min(first.count, second.count)))
+        return 0
+    step, left, right = divergence
+    print("first divergence at step {}".format(step))
+    print("  " + formatRecord(left))
+    print("  " + formatRecord(right))
+    return 1
+
+
+
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))